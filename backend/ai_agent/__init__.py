@@ -20,16 +20,37 @@ Author  : Member 1 (Backend Lead)
 Project : Talk2Tables — Diploma Final Year Project
 """
 
-from .graph import run_agent, get_agent
+from .graph import run_agent, astream_agent, get_agent
 from .state import AgentState, ChatMessage, ValidationResult
-from .llm_provider import get_llm_provider, LLMProvider
-from .schema_manager import get_schema_context, get_doc_context, detect_dialect, get_table_list
+from .llm_provider import (
+    get_llm_provider, LLMProvider, FailoverLLMProvider, aclose_llm_clients, get_hedging_stats,
+    get_llm_usage_stats,
+)
+from .offline_providers import MockLLMProvider, CassetteLLMProvider
+from .circuit_breaker import get_breaker_states
+from .rate_limiter import get_rate_limit_stats
+from .schema_manager import (
+    get_schema_context, get_doc_context, detect_dialect, get_table_list,
+    load_schema_snapshot, aload_schema_snapshot, render_schema_context,
+    shutdown_reflection_executor, table_page, schema_etag,
+    invalidate_schema_cache, get_schema_cache_stats,
+)
 from .sql_validator import validate_sql, validate_confirmed_write
+from .engine_registry import get_engine, dispose_all_engines, get_pool_stats
+from .doc_index import get_doc_cache_stats, invalidate_doc_cache
+from .query_cache import get_query_cache_stats, invalidate_query_cache
+from .fast_path import get_fast_path_stats
+from .sql_repair import get_sql_repair_stats
+from .tracing import (
+    KIND_SERVER, bind_request_id, span, stage_timings, shutdown_tracing, get_tracing_stats,
+)
+from .schema_warmer import start_schema_warmer, stop_schema_warmer, get_warmer_status
 from .prompts import build_system_prompt
 
 __all__ = [
     # Main entry point
     "run_agent",
+    "astream_agent",
     "get_agent",
     # State types
     "AgentState",
@@ -38,14 +59,50 @@ __all__ = [
     # LLM providers
     "get_llm_provider",
     "LLMProvider",
+    "FailoverLLMProvider",
+    "MockLLMProvider",
+    "CassetteLLMProvider",
+    "aclose_llm_clients",
+    "get_breaker_states",
+    "get_hedging_stats",
+    "get_llm_usage_stats",
+    "get_rate_limit_stats",
     # Schema utilities
     "get_schema_context",
     "get_doc_context",
     "detect_dialect",
     "get_table_list",
+    "table_page",
+    "schema_etag",
+    "load_schema_snapshot",
+    "aload_schema_snapshot",
+    "shutdown_reflection_executor",
+    "render_schema_context",
+    "invalidate_schema_cache",
+    "get_schema_cache_stats",
+    "get_doc_cache_stats",
+    "invalidate_doc_cache",
+    "get_query_cache_stats",
+    "invalidate_query_cache",
+    "get_fast_path_stats",
+    "get_sql_repair_stats",
+    "start_schema_warmer",
+    "stop_schema_warmer",
+    "get_warmer_status",
+    # Tracing
+    "KIND_SERVER",
+    "bind_request_id",
+    "span",
+    "stage_timings",
+    "shutdown_tracing",
+    "get_tracing_stats",
     # SQL validation
     "validate_sql",
     "validate_confirmed_write",
+    # Target DB engines
+    "get_engine",
+    "dispose_all_engines",
+    "get_pool_stats",
     # Prompts
     "build_system_prompt",
 ]
\ No newline at end of file
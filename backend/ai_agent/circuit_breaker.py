@@ -0,0 +1,164 @@
+"""
+Talk2Tables — LLM Provider Circuit Breakers
+============================================
+One circuit breaker per LLM provider, used by FailoverLLMProvider
+(llm_provider.py) to route each call to the first healthy provider in the
+openrouter → groq → gemini → ollama chain.
+
+  - CLOSED    : calls flow; outcomes of the last LLM_BREAKER_WINDOW calls are
+                kept. Once at least LLM_BREAKER_MIN_CALLS are recorded, the
+                breaker opens if the failure rate reaches
+                LLM_BREAKER_ERROR_RATE or the share of calls slower than
+                LLM_BREAKER_SLOW_CALL_S reaches LLM_BREAKER_SLOW_RATE.
+  - OPEN      : calls are skipped for LLM_BREAKER_OPEN_S seconds.
+  - HALF_OPEN : one probe call is let through; success closes the breaker,
+                failure (or a slow call) re-opens it.
+
+State is per process; get_breaker_states() is shown on GET /health.
+
+Author  : Member 1 (Backend Lead)
+Project : Talk2Tables — Diploma Final Year Project
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------------
+LLM_BREAKER_WINDOW      = int(os.environ.get("LLM_BREAKER_WINDOW", "20"))
+LLM_BREAKER_MIN_CALLS   = int(os.environ.get("LLM_BREAKER_MIN_CALLS", "5"))
+LLM_BREAKER_ERROR_RATE  = float(os.environ.get("LLM_BREAKER_ERROR_RATE", "0.5"))
+LLM_BREAKER_SLOW_CALL_S = float(os.environ.get("LLM_BREAKER_SLOW_CALL_S", "15"))
+LLM_BREAKER_SLOW_RATE   = float(os.environ.get("LLM_BREAKER_SLOW_RATE", "0.8"))
+LLM_BREAKER_OPEN_S      = float(os.environ.get("LLM_BREAKER_OPEN_S", "30"))
+
+CLOSED    = "closed"
+OPEN      = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Error-rate + slow-call-rate breaker with a single half-open probe."""
+
+    def __init__(self, name: str):
+        self.name       = name
+        self.state      = CLOSED
+        self.opened_at  = 0.0
+        self.open_count = 0
+        self._outcomes: deque[tuple[bool, float]] = deque(maxlen=max(LLM_BREAKER_WINDOW, 1))
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        """True if a call may be sent now. In HALF_OPEN, only one probe is allowed at a time."""
+        with self._lock:
+            if self.state == OPEN:
+                if time.monotonic() - self.opened_at < LLM_BREAKER_OPEN_S:
+                    return False
+                self.state = HALF_OPEN
+                self._probe_in_flight = False
+                logger.info(f"[CircuitBreaker] {self.name} half-open — probing")
+            if self.state == HALF_OPEN:
+                if self._probe_in_flight:
+                    return False
+                self._probe_in_flight = True
+            return True
+
+    def record_success(self, latency_s: float) -> None:
+        slow = latency_s >= LLM_BREAKER_SLOW_CALL_S
+        with self._lock:
+            if self.state == HALF_OPEN:
+                if slow:
+                    self._trip("slow probe")
+                else:
+                    self.state = CLOSED
+                    self._outcomes.clear()
+                    self._probe_in_flight = False
+                    logger.info(f"[CircuitBreaker] {self.name} closed — probe succeeded in {latency_s:.1f}s")
+                return
+            self._outcomes.append((True, latency_s))
+            self._evaluate()
+
+    def record_failure(self, latency_s: float = 0.0) -> None:
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._trip("probe failed")
+                return
+            self._outcomes.append((False, latency_s))
+            self._evaluate()
+
+    def release_probe(self) -> None:
+        """Give back a half-open probe slot that was granted but never used (e.g. cancelled call)."""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probe_in_flight = False
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            calls    = len(self._outcomes)
+            failures = sum(1 for ok, _ in self._outcomes if not ok)
+            slow     = sum(1 for _, latency in self._outcomes if latency >= LLM_BREAKER_SLOW_CALL_S)
+            retry_in = (
+                max(0.0, LLM_BREAKER_OPEN_S - (time.monotonic() - self.opened_at))
+                if self.state == OPEN else None
+            )
+            return {
+                "provider":     self.name,
+                "state":        self.state,
+                "window_calls": calls,
+                "error_rate":   round(failures / calls, 2) if calls else 0.0,
+                "slow_rate":    round(slow / calls, 2) if calls else 0.0,
+                "times_opened": self.open_count,
+                "retry_in_s":   round(retry_in, 1) if retry_in is not None else None,
+            }
+
+    # ── Internals (call with _lock held) ──────────────────────────────────
+    def _evaluate(self) -> None:
+        calls = len(self._outcomes)
+        if calls < LLM_BREAKER_MIN_CALLS:
+            return
+        error_rate = sum(1 for ok, _ in self._outcomes if not ok) / calls
+        slow_rate  = sum(1 for _, latency in self._outcomes if latency >= LLM_BREAKER_SLOW_CALL_S) / calls
+        if error_rate >= LLM_BREAKER_ERROR_RATE:
+            self._trip(f"error rate {error_rate:.0%}")
+        elif slow_rate >= LLM_BREAKER_SLOW_RATE:
+            self._trip(f"slow-call rate {slow_rate:.0%}")
+
+    def _trip(self, reason: str) -> None:
+        self.state      = OPEN
+        self.opened_at  = time.monotonic()
+        self.open_count += 1
+        self._outcomes.clear()
+        self._probe_in_flight = False
+        logger.warning(f"[CircuitBreaker] {self.name} opened ({reason}) for {LLM_BREAKER_OPEN_S:.0f}s")
+
+
+# ---------------------------------------------------------------------------
+# Registry — one breaker per provider name, shared by all requests
+# ---------------------------------------------------------------------------
+_breakers: dict[str, CircuitBreaker] = {}
+_registry_lock = threading.Lock()
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    with _registry_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = _breakers[name] = CircuitBreaker(name)
+        return breaker
+
+
+def get_breaker_states() -> list[dict[str, Any]]:
+    """Snapshot of every provider's breaker, for GET /health."""
+    with _registry_lock:
+        breakers = list(_breakers.values())
+    return [breaker.snapshot() for breaker in breakers]
@@ -0,0 +1,242 @@
+"""
+Talk2Tables — Schema Doc Chunk Index
+=====================================
+Chunks the extracted text of uploaded schema docs (PDF / Word / Excel
+manuals) once per connection, caches the chunks with a BM25 index, and
+selects the chunks relevant to each question — instead of concatenating
+every doc newest-first and cutting the result at MAX_DOC_CONTEXT_CHARS.
+
+  - Chunking  : paragraphs (blank-line separated) packed into chunks of at
+                most DOC_CHUNK_CHARS; oversized paragraphs are split on lines,
+                then sentences, then hard-cut
+  - Cache     : one DocCorpus per connection_id, tagged with a cheap version
+                (document count + latest uploaded_at) that the caller
+                re-reads on every query; a different version rebuilds it
+  - Selection : BM25 over chunk tokens (schema_index.tokenize); the best
+                chunks are emitted in document order under their
+                "--- From: file ---" headers, and the rendered text — headers
+                and the "excerpts omitted" note included — stays within
+                DOC_CONTEXT_BUDGET_CHARS
+
+No database access happens here — schema_manager.get_doc_context() runs the
+version probe and the full fetch.
+
+Author  : Member 1 (Backend Lead)
+Project : Talk2Tables — Diploma Final Year Project
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from typing_extensions import TypedDict
+
+from .schema_index import BM25Index, tokenize
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------------
+DOC_CHUNK_CHARS          = int(os.environ.get("DOC_CHUNK_CHARS", "800"))
+DOC_CONTEXT_BUDGET_CHARS = int(os.environ.get("DOC_CONTEXT_BUDGET_CHARS", "8000"))
+DOC_CONTEXT_TOP_K        = int(os.environ.get("DOC_CONTEXT_TOP_K", "6"))
+DOC_CACHE_TTL_S          = int(os.environ.get("DOC_CACHE_TTL_S", "3600"))
+DOC_CACHE_MAX_ENTRIES    = int(os.environ.get("DOC_CACHE_MAX_ENTRIES", "64"))
+
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+_LINE_BREAK      = re.compile(r"\n")
+_SENTENCE_END    = re.compile(r"(?<=[.!?])\s+")
+
+
+class DocChunk(TypedDict):
+    filename: str
+    doc_pos:  int   # Position of the document (0 = newest upload)
+    text:     str
+
+
+# ---------------------------------------------------------------------------
+# Chunking
+# ---------------------------------------------------------------------------
+
+def chunk_text(text: str, max_chars: int = DOC_CHUNK_CHARS) -> list[str]:
+    """Split one document into chunks of at most max_chars, on natural boundaries."""
+    pieces: list[str] = []
+    for paragraph in _PARAGRAPH_BREAK.split(text.strip()):
+        paragraph = paragraph.strip()
+        if paragraph:
+            pieces.extend(_split_oversized(paragraph, max_chars))
+
+    chunks:  list[str] = []
+    current: list[str] = []
+    size = 0
+    for piece in pieces:
+        if current and size + len(piece) + 2 > max_chars:
+            chunks.append("\n\n".join(current))
+            current, size = [], 0
+        current.append(piece)
+        size += len(piece) + 2
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def _split_oversized(paragraph: str, max_chars: int) -> list[str]:
+    """Lines first, then sentences, then a hard cut — whatever brings pieces under max_chars."""
+    if len(paragraph) <= max_chars:
+        return [paragraph]
+    for pattern in (_LINE_BREAK, _SENTENCE_END):
+        parts = [part.strip() for part in pattern.split(paragraph) if part.strip()]
+        if len(parts) > 1:
+            return [piece for part in parts for piece in _split_oversized(part, max_chars)]
+    return [paragraph[i:i + max_chars] for i in range(0, len(paragraph), max_chars)]
+
+
+# ---------------------------------------------------------------------------
+# Corpus — chunks + BM25 index for one connection
+# ---------------------------------------------------------------------------
+class DocCorpus:
+    """All chunks of one connection's schema docs, with a BM25 index over them."""
+
+    def __init__(self, documents: list[tuple[str, str]], version: Any):
+        """
+        Args:
+            documents : [(filename, extracted_text), ...] newest upload first
+            version   : Opaque version tag (doc count, latest uploaded_at)
+        """
+        self.version    = version
+        self.doc_count  = len(documents)
+        self.loaded_at  = time.monotonic()
+        self.chunks: list[DocChunk] = [
+            DocChunk(filename=filename, doc_pos=pos, text=chunk)
+            for pos, (filename, extracted_text) in enumerate(documents)
+            for chunk in chunk_text(extracted_text)
+        ]
+        self.total_chars = sum(len(chunk["text"]) for chunk in self.chunks)
+        # Identifies the corpus text (e.g. as the schema index cache key)
+        self.digest      = hashlib.sha256(
+            "\x1f".join(chunk["text"] for chunk in self.chunks).encode("utf-8")
+        ).hexdigest()[:16]
+        self._bm25 = BM25Index([tokenize(chunk["text"]) for chunk in self.chunks])
+
+    def full_text(self) -> str:
+        """Every chunk of every document, in order — e.g. for mining table synonyms."""
+        return "\n\n".join(chunk["text"] for chunk in self.chunks)
+
+    def select(self, question: Optional[str], budget_chars: int) -> str:
+        """
+        Render the chunks for one question within budget_chars.
+
+        Small corpora are returned whole (byte-stable prompt). Otherwise the
+        top DOC_CONTEXT_TOP_K chunks by BM25 score are kept; if nothing in
+        the question matches, the newest chunks are used as before.
+        """
+        indices = list(range(len(self.chunks)))
+        if question and self.total_chars > budget_chars:
+            scores = self._bm25.scores(tokenize(question))
+            ranked = sorted(
+                (i for i in indices if scores[i] > 0), key=lambda i: scores[i], reverse=True
+            )[:max(DOC_CONTEXT_TOP_K, 1)]
+            if ranked:
+                indices = ranked
+
+        chosen: list[int] = []
+        used = 0
+        for i in indices:
+            size = len(self.chunks[i]["text"]) + 2
+            if chosen and used + size > budget_chars:
+                continue  # A smaller chunk further down may still fit
+            chosen.append(i)
+            used += size
+
+        # Headers and the omitted-excerpts note are not in the estimate above:
+        # drop the lowest-ranked chunks until the rendered text fits
+        while True:
+            rendered = self._render(sorted(chosen), budget_chars)
+            if len(rendered) <= budget_chars or len(chosen) == 1:
+                return rendered
+            chosen.pop()
+
+    def _render(self, chosen: list[int], budget_chars: int) -> str:
+        parts: list[str] = []
+        current_doc = None
+        for i in chosen:
+            chunk = self.chunks[i]
+            if chunk["doc_pos"] != current_doc:
+                current_doc = chunk["doc_pos"]
+                parts.append(f"--- From: {chunk['filename']} ---\n{chunk['text']}")
+            else:
+                parts.append(chunk["text"])
+        combined = "\n\n".join(parts)
+        note     = ""
+        if len(chosen) < len(self.chunks):
+            note = f"\n\n... [{len(self.chunks) - len(chosen)} less relevant doc excerpts omitted]"
+        if len(combined) + len(note) > budget_chars:  # A single chunk larger than a tiny budget
+            combined = combined[:max(budget_chars - len(note), 0)]
+        return combined + note
+
+
+# ---------------------------------------------------------------------------
+# Per-connection corpus cache
+# ---------------------------------------------------------------------------
+_corpus_cache: "OrderedDict[str, DocCorpus]" = OrderedDict()
+_cache_lock = threading.Lock()
+_stats = {"hits": 0, "rebuilds": 0}
+
+
+def get_cached_corpus(connection_id: str, version: Any) -> Optional[DocCorpus]:
+    """The cached corpus for a connection if its version matches and it is within DOC_CACHE_TTL_S."""
+    with _cache_lock:
+        corpus = _corpus_cache.get(connection_id)
+        if (
+            corpus is None
+            or corpus.version != version
+            or time.monotonic() - corpus.loaded_at > DOC_CACHE_TTL_S
+        ):
+            return None
+        _corpus_cache.move_to_end(connection_id)
+        _stats["hits"] += 1
+        return corpus
+
+
+def peek_corpus(connection_id: str) -> Optional[DocCorpus]:
+    """The cached corpus for a connection whatever its age, or None (no version check, no counters)."""
+    with _cache_lock:
+        return _corpus_cache.get(connection_id)
+
+
+def build_corpus(connection_id: str, documents: list[tuple[str, str]], version: Any) -> DocCorpus:
+    """Chunk and index a connection's docs and cache the result."""
+    corpus = DocCorpus(documents, version)
+    with _cache_lock:
+        _corpus_cache[connection_id] = corpus
+        _corpus_cache.move_to_end(connection_id)
+        while len(_corpus_cache) > max(DOC_CACHE_MAX_ENTRIES, 1):
+            _corpus_cache.popitem(last=False)
+        _stats["rebuilds"] += 1
+    logger.info(
+        f"[DocIndex] Indexed {corpus.doc_count} doc(s) into {len(corpus.chunks)} chunks "
+        f"({corpus.total_chars} chars) for connection_id={connection_id}"
+    )
+    return corpus
+
+
+def invalidate_doc_cache(connection_id: Optional[str] = None) -> None:
+    """Drop one connection's cached corpus, or all of them."""
+    with _cache_lock:
+        if connection_id is None:
+            _corpus_cache.clear()
+        else:
+            _corpus_cache.pop(connection_id, None)
+
+
+def get_doc_cache_stats() -> dict[str, Any]:
+    with _cache_lock:
+        return {**_stats, "entries": len(_corpus_cache)}
@@ -0,0 +1,236 @@
+"""
+Talk2Tables — Engine Registry
+==============================
+Process-wide cache of SQLAlchemy engines for TARGET databases, keyed by
+connection string.
+
+Every code path that talks to a target database — schema reflection,
+SELECT execution, write-preview row estimation and confirmed write
+execution — goes through get_engine(), so one connection reuses a single
+connection pool instead of paying a fresh TCP/TLS handshake per request.
+
+  - Pool sizing : DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_RECYCLE_S, DB_POOL_TIMEOUT_S
+  - Eviction    : LRU, at most DB_ENGINE_CACHE_SIZE engines are kept; engines
+                  idle for longer than DB_ENGINE_IDLE_TTL_S are disposed
+  - Teardown    : dispose_all_engines() is called from main.lifespan on shutdown
+  - Stats       : get_pool_stats() is exposed on GET /health for pool sizing
+
+Author  : Member 1 (Backend Lead)
+Project : Talk2Tables — Diploma Final Year Project
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine, make_url
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------------
+POOL_SIZE         = int(os.environ.get("DB_POOL_SIZE", "5"))
+MAX_OVERFLOW      = int(os.environ.get("DB_MAX_OVERFLOW", "10"))
+POOL_RECYCLE_S    = int(os.environ.get("DB_POOL_RECYCLE_S", "1800"))  # Beat MySQL wait_timeout / LB idle cuts
+POOL_TIMEOUT_S    = int(os.environ.get("DB_POOL_TIMEOUT_S", "30"))
+ENGINE_CACHE_SIZE = int(os.environ.get("DB_ENGINE_CACHE_SIZE", "32"))
+ENGINE_IDLE_TTL_S = int(os.environ.get("DB_ENGINE_IDLE_TTL_S", "3600"))
+
+# connection_string → Engine, least recently used first
+_engines:   "OrderedDict[str, Engine]" = OrderedDict()
+_last_used: dict[str, float]           = {}
+_lock = threading.Lock()  # Engines are requested from worker threads as well as the event loop
+
+
+# ---------------------------------------------------------------------------
+# Public API
+# ---------------------------------------------------------------------------
+
+def get_engine(connection_string: str) -> Engine:
+    """
+    Return the shared engine for a target database, creating it on first use.
+
+    Args:
+        connection_string : SQLAlchemy URL (e.g. mysql+pymysql://user:pw@host/db)
+
+    Returns:
+        A pooled SQLAlchemy Engine. Callers must NOT dispose it — the
+        registry owns its lifecycle.
+    """
+    now = time.monotonic()
+    evicted: list[tuple[str, Engine]] = []
+
+    with _lock:
+        engine = _engines.get(connection_string)
+        if engine is not None:
+            _engines.move_to_end(connection_string)
+        else:
+            engine = create_engine(connection_string, **_engine_kwargs(connection_string))
+            _engines[connection_string] = engine
+            logger.info(f"[EngineRegistry] Created engine for {redact_connection_string(connection_string)}")
+        _last_used[connection_string] = now
+
+        evicted = _collect_evictions(now, keep=connection_string)
+
+    # Dispose outside the lock — closing pooled sockets can block on the network
+    for key, old_engine in evicted:
+        _dispose(key, old_engine)
+
+    return engine
+
+
+def dispose_engine(connection_string: str) -> bool:
+    """
+    Dispose and forget the engine for one connection (e.g. after its
+    credentials are rotated). Returns True if an engine was registered.
+    """
+    with _lock:
+        engine = _engines.pop(connection_string, None)
+        _last_used.pop(connection_string, None)
+    if engine is None:
+        return False
+    _dispose(connection_string, engine)
+    return True
+
+
+def dispose_all_engines() -> int:
+    """
+    Dispose every registered engine. Called from main.lifespan on shutdown.
+
+    Returns:
+        Number of engines disposed.
+    """
+    with _lock:
+        items = list(_engines.items())
+        _engines.clear()
+        _last_used.clear()
+    for key, engine in items:
+        _dispose(key, engine)
+    return len(items)
+
+
+def get_pool_stats() -> dict[str, Any]:
+    """
+    Snapshot of registry and per-pool usage, for sizing DB_POOL_SIZE /
+    DB_MAX_OVERFLOW. Passwords are masked in connection strings.
+
+    Returns:
+        {
+          "engines": 2, "capacity": 32, "pool_size": 5, "max_overflow": 10,
+          "pools": [{ "connection": "mysql+pymysql://u:***@h/db", "pool": "QueuePool",
+                      "size": 5, "checkedin": 1, "checkedout": 0, "overflow": -4,
+                      "idle_s": 12.3 }, ...]
+        }
+    """
+    now = time.monotonic()
+    with _lock:
+        items = [(key, engine, _last_used.get(key, now)) for key, engine in _engines.items()]
+
+    pools = []
+    for key, engine, last_used in items:
+        pool  = engine.pool
+        entry: dict[str, Any] = {
+            "connection": redact_connection_string(key),
+            "pool":       type(pool).__name__,
+            "idle_s":     round(now - last_used, 1),
+        }
+        # QueuePool exposes all four; SingletonThreadPool / NullPool expose fewer
+        for attr in ("size", "checkedin", "checkedout", "overflow"):
+            method = getattr(pool, attr, None)
+            if callable(method):
+                try:
+                    entry[attr] = method()
+                except Exception:
+                    pass
+        pools.append(entry)
+
+    return {
+        "engines":      len(pools),
+        "capacity":     ENGINE_CACHE_SIZE,
+        "pool_size":    POOL_SIZE,
+        "max_overflow": MAX_OVERFLOW,
+        "pools":        pools,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Internal helpers
+# ---------------------------------------------------------------------------
+
+def _engine_kwargs(connection_string: str) -> dict[str, Any]:
+    """Build create_engine() keyword arguments appropriate for the backend."""
+    kwargs: dict[str, Any] = {
+        "pool_pre_ping": True,   # Transparently replace connections dropped by the server
+        "pool_recycle":  POOL_RECYCLE_S,
+        "echo":          False,
+    }
+    try:
+        backend = make_url(connection_string).get_backend_name()
+    except Exception:
+        backend = ""
+    # SQLite uses SingletonThreadPool / QueuePool defaults that reject overflow settings
+    if backend != "sqlite":
+        kwargs.update(
+            pool_size    = POOL_SIZE,
+            max_overflow = MAX_OVERFLOW,
+            pool_timeout = POOL_TIMEOUT_S,
+        )
+    return kwargs
+
+
+def _collect_evictions(now: float, keep: str) -> list[tuple[str, Engine]]:
+    """
+    Pop engines that are idle past ENGINE_IDLE_TTL_S or beyond LRU capacity.
+    Engines with checked-out connections are never evicted for idleness.
+    Must be called with _lock held.
+    """
+    evicted: list[tuple[str, Engine]] = []
+
+    for key in list(_engines.keys()):
+        if key == keep:
+            continue
+        idle_s = now - _last_used.get(key, now)
+        if idle_s > ENGINE_IDLE_TTL_S and _checked_out(_engines[key]) == 0:
+            evicted.append((key, _engines.pop(key)))
+            _last_used.pop(key, None)
+
+    while len(_engines) > max(ENGINE_CACHE_SIZE, 1):
+        key, engine = _engines.popitem(last=False)
+        if key == keep:  # Never evict the engine we are about to hand out
+            _engines[key] = engine
+            continue
+        _last_used.pop(key, None)
+        evicted.append((key, engine))
+
+    return evicted
+
+
+def _checked_out(engine: Engine) -> int:
+    method = getattr(engine.pool, "checkedout", None)
+    try:
+        return int(method()) if callable(method) else 0
+    except Exception:
+        return 0
+
+
+def _dispose(connection_string: str, engine: Engine) -> None:
+    try:
+        engine.dispose()
+        logger.info(f"[EngineRegistry] Disposed engine for {redact_connection_string(connection_string)}")
+    except Exception as exc:
+        logger.warning(f"[EngineRegistry] Dispose failed for {redact_connection_string(connection_string)}: {exc}")
+
+
+def redact_connection_string(connection_string: str) -> str:
+    """Render a connection string with its password masked, for logs and /health."""
+    try:
+        return make_url(connection_string).render_as_string(hide_password=True)
+    except Exception:
+        return connection_string.split("@")[-1][:60]
@@ -0,0 +1,294 @@
+"""
+Talk2Tables — Template Fast Path (no LLM)
+==========================================
+Deterministic SQL for the question shapes that make up much of the
+traffic, resolved against the reflected schema instead of an LLM call:
+
+  Rule            Example                                   SQL
+  ─────────────── ───────────────────────────────────────── ───────────────────────────────
+  select_all      "show all sensors"                        SELECT * FROM sensors
+  select_where    "list sensors where zone is 'B'"          … WHERE zone = 'B'
+  select_ordered  "show technicians sorted by name desc"    … ORDER BY name DESC
+  latest_n        "latest 10 sensor readings"               … ORDER BY recorded_at DESC, first 10
+  count           "how many calibrations are there"         SELECT COUNT(*) AS total FROM …
+  count_by        "count sensors by zone"                   SELECT zone, COUNT(*) … GROUP BY zone
+
+Slots (table, column) must resolve to exactly one reflected table / column:
+every word of the phrase (schema_index.tokenize with nothing dropped —
+lower-cased, lightly stemmed, stopwords and single letters kept) must equal
+the identifier's words, so "sensor readings" matches sensor_readings but
+"readings" alone, or "sensors in A", does not. Anything less certain
+returns None and the question goes to the LLM as before.
+
+graph.node_load_schema tries the fast path after a query-cache miss; a
+match is tagged sql_source="fast_path" (llm_provider "fast_path/<rule>")
+and still goes through classify_and_validate (validate_sql) before it runs.
+
+Author  : Member 1 (Backend Lead)
+Project : Talk2Tables — Diploma Final Year Project
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import re
+import threading
+from collections import Counter
+from typing import Any, Optional
+
+from typing_extensions import TypedDict
+
+from .schema_cache import SchemaSnapshot
+from .schema_index import tokenize
+from .sql_validator import DEFAULT_SELECT_LIMIT
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------------
+FAST_PATH_ENABLED  = os.environ.get("FAST_PATH_ENABLED", "true").lower() == "true"
+FAST_PATH_LATEST_N = int(os.environ.get("FAST_PATH_LATEST_N", "10"))   # "latest readings" without a number
+
+_ASK    = r"(?:please\s+)?(?:(?:can|could)\s+you\s+)?(?:show|list|display|get|give|fetch|find|return|see)(?:\s+me)?\s+"
+_ALL    = r"(?:all\s+)?(?:of\s+)?(?:the\s+)?"
+_COUNT  = r"(?:count(?:\s+(?:of\s+)?(?:the|all))?|how\s+many|(?:the\s+)?(?:total\s+)?number\s+of)\s+"
+_TAIL   = r"(?:\s+(?:are\s+there|do\s+we\s+have|exist|in\s+total|records|rows|entries|data))?"
+
+# (rule, pattern) — first match wins; every pattern must match the whole question
+_RULES: tuple[tuple[str, re.Pattern], ...] = tuple(
+    (rule, re.compile(pattern, re.IGNORECASE)) for rule, pattern in (
+        ("count_by",       rf"^{_COUNT}(?P<table>.+?){_TAIL}\s+(?:by|per|for\s+each|grouped\s+by)\s+(?P<column>.+)$"),
+        ("count",          rf"^{_COUNT}(?P<table>.+?){_TAIL}$"),
+        ("latest_n",       rf"^(?:{_ASK})?(?:the\s+)?(?P<order>latest|newest|most\s+recent|recent|last|oldest|earliest|first)"
+                           rf"\s+(?:(?P<n>\d{{1,4}})\s+)?(?P<table>.+?){_TAIL}$"),
+        ("select_where",   rf"^{_ASK}{_ALL}(?P<table>.+?)\s+(?:where|with|whose)\s+(?P<column>.+?)\s+"
+                           rf"(?:is|=|equals|is\s+equal\s+to)\s+(?P<value>.+)$"),
+        ("select_ordered", rf"^{_ASK}{_ALL}(?P<table>.+?)\s+(?:sorted|ordered)\s+by\s+(?P<column>.+?)"
+                           rf"(?:\s+(?P<direction>asc|ascending|desc|descending))?$"),
+        ("select_all",     rf"^{_ASK}{_ALL}(?P<table>.+?){_TAIL}$"),
+    )
+)
+
+_WHITESPACE     = re.compile(r"\s+")
+_TRAILING_PUNCT = re.compile(r"[\s?.!;,]+$")
+_NUMBER         = re.compile(r"-?\d+(?:\.\d+)?")
+_QUOTED         = re.compile(r"""^(?:'(?P<single>[^']*)'|"(?P<double>[^"]*)")$""")
+_VALUE_TOKEN    = re.compile(r"[\w.:/-]+")
+_PLAIN_IDENT    = re.compile(r"[a-z_][a-z0-9_]*")
+_RESERVED       = frozenset(
+    "order group user select table from where limit desc asc by key values check default index".split()
+)
+_TIME_COLUMN_HINTS = ("created", "recorded", "timestamp", "updated", "logged", "time", "date", "_at")
+# Unquoted values that are really comparisons, ranges or lists — left to the LLM
+_OPERATOR_WORDS    = frozenset((
+    "above below over under least most higher lower greater less more fewer than before after since "
+    "until between like in not no null none any or and equal equals"
+).split())
+
+
+class FastPathMatch(TypedDict):
+    rule: str
+    sql:  str
+
+
+# ---------------------------------------------------------------------------
+# Matching
+# ---------------------------------------------------------------------------
+
+def match_fast_path(
+    natural_language_query: str,
+    snapshot:               SchemaSnapshot,
+    db_dialect:             str,
+) -> Optional[FastPathMatch]:
+    """
+    SQL for a template-shaped question, or None when no rule matches confidently.
+
+    Args:
+        natural_language_query : The user's question
+        snapshot               : Reflected schema of the target database
+        db_dialect             : mysql, postgresql, sqlite, mssql, oracle
+    """
+    question = _TRAILING_PUNCT.sub("", _WHITESPACE.sub(" ", natural_language_query).strip())
+    if not question or not snapshot["tables"]:
+        return None
+
+    for rule, pattern in _RULES:
+        found = pattern.match(question)
+        if found is None:
+            continue
+        sql = _build(rule, found, snapshot, db_dialect)
+        if sql is not None:
+            with _lock:
+                _stats[rule] += 1
+            logger.info(f"[FastPath] {rule} matched — SQL built without the LLM")
+            return FastPathMatch(rule=rule, sql=sql)
+        # A more specific rule matched the wording but not the schema; try the broader ones
+
+    with _lock:
+        _stats["misses"] += 1
+    return None
+
+
+def _build(rule: str, found: re.Match, snapshot: SchemaSnapshot, dialect: str) -> Optional[str]:
+    table = _resolve_table(found["table"], snapshot)
+    if table is None:
+        return None
+    meta   = snapshot["tables"][table]
+    source = _quote(table, dialect)
+
+    if rule == "count":
+        return f"SELECT COUNT(*) AS total FROM {source}"  # One row — no row limit needed
+
+    if rule == "select_all":
+        return _limited(f"* FROM {source}", DEFAULT_SELECT_LIMIT, dialect)
+
+    if rule == "latest_n":
+        column = _recency_column(meta)
+        if column is None:
+            return None
+        order = found["order"].lower()
+        if order in ("first", "last") and not found["n"]:
+            return None  # "the first sensor" — one row or ten? Leave it to the LLM
+        direction = "ASC" if order in ("oldest", "earliest", "first") else "DESC"
+        limit     = int(found["n"]) if found["n"] else FAST_PATH_LATEST_N
+        return _limited(
+            f"* FROM {source} ORDER BY {_quote(column, dialect)} {direction}", max(limit, 1), dialect
+        )
+
+    column = _resolve_column(found["column"], meta)
+    if column is None:
+        return None
+    target = _quote(column, dialect)
+
+    if rule == "count_by":
+        return _limited(
+            f"{target}, COUNT(*) AS total FROM {source} GROUP BY {target} ORDER BY total DESC",
+            DEFAULT_SELECT_LIMIT, dialect,
+        )
+
+    if rule == "select_ordered":
+        direction = "DESC" if (found["direction"] or "").lower().startswith("desc") else "ASC"
+        return _limited(f"* FROM {source} ORDER BY {target} {direction}", DEFAULT_SELECT_LIMIT, dialect)
+
+    if rule == "select_where":
+        literal = _literal(found["value"])
+        if literal is None:
+            return None
+        return _limited(f"* FROM {source} WHERE {target} = {literal}", DEFAULT_SELECT_LIMIT, dialect)
+
+    return None
+
+
+# ---------------------------------------------------------------------------
+# Slot resolution
+# ---------------------------------------------------------------------------
+
+def _resolve_table(phrase: str, snapshot: SchemaSnapshot) -> Optional[str]:
+    """The one table whose name words equal all of the phrase's words; None if none or several."""
+    wanted = tokenize(phrase, drop_stopwords=False)
+    if not wanted:
+        return None
+    matches = [name for name in snapshot["table_names"] if tokenize(name, drop_stopwords=False) == wanted]
+    return matches[0] if len(matches) == 1 else None
+
+
+def _resolve_column(phrase: str, meta: Any) -> Optional[str]:
+    wanted = tokenize(phrase, drop_stopwords=False)
+    if not wanted or not meta["columns"]:
+        return None
+    matches = [
+        col["name"] for col in meta["columns"] if tokenize(col["name"], drop_stopwords=False) == wanted
+    ]
+    return matches[0] if len(matches) == 1 else None
+
+
+def _recency_column(meta: Any) -> Optional[str]:
+    """Best column for "latest": a date/time column (preferring created/recorded-style names), else an integer PK."""
+    if not meta["columns"]:
+        return None
+    temporal = [
+        col["name"] for col in meta["columns"]
+        if any(kind in col["type"].upper() for kind in ("DATE", "TIME"))
+    ]
+    for hint in _TIME_COLUMN_HINTS:
+        for name in temporal:
+            if hint in name.lower():
+                return name
+    if temporal:
+        return temporal[0]
+    if len(meta["pk"]) == 1:
+        pk_type = next((col["type"].upper() for col in meta["columns"] if col["name"] == meta["pk"][0]), "")
+        if "INT" in pk_type:
+            return meta["pk"][0]
+    return None
+
+
+def _literal(value: str) -> Optional[str]:
+    """
+    A SQL literal for a filter value: numbers as-is, text single-quoted with
+    quotes doubled. Only a quoted string, a number or a single plain token
+    qualifies — "above 50", "at least 50" or "active or inactive" are not
+    equality and are left to the LLM.
+    """
+    value  = value.strip()
+    quoted = _QUOTED.match(value)
+    if quoted:
+        text = quoted.group("single") if quoted.group("single") is not None else quoted.group("double")
+        return "'" + text.replace("'", "''") + "'"
+    if _NUMBER.fullmatch(value):
+        return value
+    if not _VALUE_TOKEN.fullmatch(value) or value.lower() in _OPERATOR_WORDS:
+        return None
+    return "'" + value.replace("'", "''") + "'"
+
+
+# ---------------------------------------------------------------------------
+# SQL helpers
+# ---------------------------------------------------------------------------
+
+def _quote(identifier: str, dialect: str) -> str:
+    """Quote an identifier only when it needs it (mixed case, spaces, reserved words)."""
+    if _PLAIN_IDENT.fullmatch(identifier) and identifier not in _RESERVED:
+        return identifier
+    if dialect == "mysql":
+        return "`" + identifier.replace("`", "``") + "`"
+    if dialect == "mssql":
+        return "[" + identifier.replace("]", "]]") + "]"
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def _limited(select_body: str, limit: int, dialect: str) -> str:
+    """SELECT <body> with the dialect's row-limit syntax."""
+    if dialect == "mssql":
+        return f"SELECT TOP {limit} {select_body}"
+    if dialect == "oracle":
+        return f"SELECT {select_body} FETCH FIRST {limit} ROWS ONLY"
+    return f"SELECT {select_body} LIMIT {limit}"
+
+
+# ---------------------------------------------------------------------------
+# Statistics (per process, shown on GET /health)
+# ---------------------------------------------------------------------------
+_stats: Counter = Counter()
+_lock  = threading.Lock()
+
+
+def get_fast_path_stats() -> dict[str, Any]:
+    """
+    Returns:
+        { "enabled": True, "hits": 42, "misses": 80, "hit_rate": 0.344,
+          "rules": { "count": 20, "select_all": 15, ... } }
+    """
+    with _lock:
+        rules  = {rule: _stats[rule] for rule, _ in _RULES if _stats[rule]}
+        misses = _stats["misses"]
+    hits = sum(rules.values())
+    return {
+        "enabled":  FAST_PATH_ENABLED,
+        "hits":     hits,
+        "misses":   misses,
+        "hit_rate": round(hits / (hits + misses), 3) if hits + misses else 0.0,
+        "rules":    rules,
+    }
@@ -7,15 +7,17 @@ Implemented as a LangGraph StateGraph — a state machine where each node
 performs one step of the query lifecycle and edges encode conditional routing.
 
 Node flow:
-  load_schema
-      │
-  generate_sql
-      │
-  classify_and_validate
-      ├── CLARIFY   → return_clarification
-      ├── WRITE_OP  → return_preview
-      ├── INVALID   → retry_generate (max 2 retries, then error)
+  load_schema ── cache / fast path ────┐
+      │                                │
+  generate_sql                         │
+      │                                │
+  classify_and_validate ◄──────────────┘◄── repaired ──┐
+      ├── CLARIFY   → return_clarification             │
+      ├── WRITE_OP  → return_preview                   │
+      ├── INVALID   → repair_sql (local, once per SQL) ┤
+      │                └── not repairable → retry_generate (max 2 retries, then error)
       └── SELECT    → execute_query → format_results → END
+                          └── error → repair_sql (wrong-dialect LIMIT/TOP) or END
 
 Author  : Member 1 (Backend Lead)
 Project : Talk2Tables — Diploma Final Year Project
@@ -23,18 +25,33 @@ Project : Talk2Tables — Diploma Final Year Project
 
 from __future__ import annotations
 
+import asyncio
 import logging
+import os
 import time
-from typing import Any, Literal, Optional
+from typing import Any, AsyncIterator, Literal, Optional
 
 from langchain_core.runnables import RunnableConfig
 from langgraph.graph import StateGraph, START, END
 
 from .state import AgentState, ChatMessage, ValidationResult
-from .llm_provider import get_llm_provider
-from .schema_manager import get_schema_context, get_doc_context, detect_dialect
+from .llm_provider import get_llm_provider, ProgressCallback
+from .schema_manager import (
+    aload_schema_snapshot, render_schema_context, get_doc_context, detect_dialect,
+)
+from .doc_index import peek_corpus
+from .engine_registry import get_engine
+from .schema_warmer import remember_connection
 from .sql_validator import validate_sql
-from .prompts import build_system_prompt, build_retry_user_message
+from .query_cache import (
+    QUERY_CACHE_ENABLED, make_cache_key, make_scope_key, get_cached_sql, find_similar_sql,
+    store_sql, drop_cached_sql,
+)
+from .fast_path import FAST_PATH_ENABLED, match_fast_path
+from .sql_repair import SQL_REPAIR_ENABLED, repair_sql
+from .prompts import build_retry_user_message
+from .token_budget import plan_prompt
+from .tracing import TRACE_TIMINGS_IN_RESPONSE, span, stage_timings, traced, traced_node
 
 logger = logging.getLogger(__name__)
 
@@ -43,6 +60,13 @@ logger = logging.getLogger(__name__)
 # ---------------------------------------------------------------------------
 MAX_RETRIES = 2  # Max SQL generation retries on validation failure
 
+# node_load_schema fans out reflection and the doc fetch; each has its own limit
+SCHEMA_LOAD_TIMEOUT_S = float(os.environ.get("SCHEMA_LOAD_TIMEOUT_S", "30"))
+DOC_CONTEXT_TIMEOUT_S = float(os.environ.get("DOC_CONTEXT_TIMEOUT_S", "5"))
+
+# astream_agent() sends SELECT results in chunks of this many rows
+STREAM_ROW_CHUNK = int(os.environ.get("STREAM_ROW_CHUNK", "200"))
+
 
 # ===========================================================================
 # GRAPH NODES
@@ -53,10 +77,19 @@ MAX_RETRIES = 2  # Max SQL generation retries on validation failure
 # ---------------------------------------------------------------------------
 async def node_load_schema(state: AgentState, config: RunnableConfig) -> AgentState:
     """
-    Load the live database schema via SQLAlchemy reflection.
-    Also fetches schema doc context from connection_schema_docs table.
-
-    Populates: state.schema_context, state.doc_context, state.db_dialect
+    Load the live database schema via SQLAlchemy reflection (cached).
+    Also fetches schema doc context from connection_schema_docs table —
+    concurrently with reflection, each under its own timeout
+    (SCHEMA_LOAD_TIMEOUT_S, DOC_CONTEXT_TIMEOUT_S; a doc timeout is
+    non-fatal) — then prunes large schemas to the tables relevant to the
+    question. Finally
+    looks the question up in the NL→SQL query cache (exact, then paraphrase)
+    and, on a miss, the template fast path (fast_path.py); on a hit the SQL
+    goes straight to classify_and_validate without an LLM call.
+
+    Populates: state.schema_context, state.doc_context, state.db_dialect,
+               state.sql_cache_key (+ generated_sql / sql_source on a cache
+               or fast-path hit)
     """
     logger.info(f"[node_load_schema] Loading schema for connection_id={state['connection_id']}")
 
@@ -66,56 +99,156 @@ async def node_load_schema(state: AgentState, config: RunnableConfig) -> AgentSt
     if state.get("db_dialect"):
         dialect = state["db_dialect"]
 
-    # ── Reflect live schema ───────────────────────────────────────────────
-    try:
-        schema_ctx = get_schema_context(state["db_connection_string"], dialect)
-    except RuntimeError as exc:
-        logger.error(f"[node_load_schema] Schema load failed: {exc}")
+    # ── Reflect live schema + fetch doc context, concurrently ─────────────
+    # Reflection runs on the reflection thread pool (cached, single-flight)
+    # against the target DB; docs come from the system DB on the async
+    # session. Wall time is max(schema, docs) instead of the sum.
+    # system_db_session is injected via RunnableConfig configurable fields
+    system_db_session = config.get("configurable", {}).get("system_db_session")
+    start = time.perf_counter()
+    snapshot, doc_ctx = await asyncio.gather(
+        traced("schema.load", asyncio.wait_for(
+            aload_schema_snapshot(state["db_connection_string"], dialect), SCHEMA_LOAD_TIMEOUT_S
+        ), **{"db.system": dialect}),
+        traced("schema.doc_context", _load_doc_context(
+            state["connection_id"], system_db_session, state["natural_language_query"]
+        )),
+        return_exceptions=True,
+    )
+    logger.info(f"[node_load_schema] Schema + docs fetched in {(time.perf_counter() - start) * 1000:.0f}ms")
+
+    if isinstance(doc_ctx, Exception):
+        logger.warning(f"[node_load_schema] Doc context fetch failed (non-fatal): {doc_ctx}")
+        doc_ctx = None
+    if isinstance(snapshot, asyncio.TimeoutError):
+        snapshot = RuntimeError(f"Schema load timed out after {SCHEMA_LOAD_TIMEOUT_S:g}s")
+    if isinstance(snapshot, BaseException):
+        if not isinstance(snapshot, RuntimeError):
+            raise snapshot
+        logger.error(f"[node_load_schema] Schema load failed: {snapshot}")
         return {
             **state,
             "db_dialect":    dialect,
-            "schema_context": f"ERROR: {exc}",
+            "schema_context": f"ERROR: {snapshot}",
             "doc_context":    None,
-            "error_message":  str(exc),
+            "error_message":  str(snapshot),
             "response_type":  "error",
-            "final_response": {"error_message": str(exc), "retry_count": 0},
+            "final_response": {"error_message": str(snapshot), "retry_count": 0},
         }
 
-    # ── Fetch schema doc context ──────────────────────────────────────────
-    doc_ctx: Optional[str] = None
-    # system_db_session is injected via RunnableConfig configurable fields
-    system_db_session = config.get("configurable", {}).get("system_db_session")
-    if system_db_session:
-        try:
-            doc_ctx = await get_doc_context(state["connection_id"], system_db_session)
-        except Exception as exc:
-            logger.warning(f"[node_load_schema] Doc context fetch failed (non-fatal): {exc}")
-            doc_ctx = None
+    remember_connection(state["db_connection_string"], dialect)  # Keep it warm from now on
+
+    # ── Select the tables relevant to this question ───────────────────────
+    # Synonyms come from the connection's whole doc corpus (one cached index per
+    # corpus version); doc_ctx is only this question's excerpt for the prompt
+    doc_corpus = peek_corpus(state["connection_id"]) if doc_ctx else None
+    schema_ctx = render_schema_context(snapshot, state["natural_language_query"], doc_corpus=doc_corpus)
 
     logger.info(
         f"[node_load_schema] Schema loaded: {len(schema_ctx)} chars | "
         f"doc_context={'yes' if doc_ctx else 'no'} | dialect={dialect}"
     )
 
-    return {
+    loaded = {
         **state,
-        "db_dialect":     dialect,
-        "schema_context": schema_ctx,
-        "doc_context":    doc_ctx,
-        "retry_count":    state.get("retry_count", 0),
-        "error_message":  None,
+        "db_dialect":        dialect,
+        "schema_context":    schema_ctx,
+        "doc_context":       doc_ctx,
+        "retry_count":       state.get("retry_count", 0),
+        "error_message":     None,
+        "sql_cache_key":     None,
+        "sql_cache_scope":   None,
+        "sql_cache_hit_key": None,
     }
 
+    # ── NL→SQL query cache ────────────────────────────────────────────────
+    if QUERY_CACHE_ENABLED:
+        cache_key = make_cache_key(
+            natural_language_query = state["natural_language_query"],
+            schema_hash            = snapshot["content_hash"],
+            doc_context            = doc_ctx,
+            db_dialect             = dialect,
+            user_role              = state.get("user_role", "viewer"),
+            chat_history           = state.get("chat_history", []),
+        )
+        cache_scope = make_scope_key(
+            connection_id = state["connection_id"],
+            schema_hash   = snapshot["content_hash"],
+            db_dialect    = dialect,
+            user_role     = state.get("user_role", "viewer"),
+            chat_history  = state.get("chat_history", []),
+        )
+        loaded["sql_cache_key"]   = cache_key
+        loaded["sql_cache_scope"] = cache_scope
+
+        hit_key, source = cache_key, "cache"
+        cached = get_cached_sql(cache_key)
+        if cached is None:
+            similar = find_similar_sql(cache_scope, state["natural_language_query"], state["user_id"])
+            if similar is not None:
+                hit_key, cached, score = similar
+                source = "semantic_cache"
+                logger.info(f"[node_load_schema] Paraphrase matched {cached['question']!r} (score {score:.3f})")
+        if cached is not None:
+            logger.info(f"[node_load_schema] Query cache hit — skipping LLM (originally {cached['llm_provider']})")
+            loaded.update({
+                "generated_sql":     cached["sql"],
+                "llm_provider_used": cached["llm_provider"],
+                "sql_source":        source,
+                "sql_cache_hit_key": hit_key,
+            })
+
+    # ── Template fast path — deterministic SQL, no LLM call ───────────────
+    if FAST_PATH_ENABLED and loaded.get("sql_source") not in ("cache", "semantic_cache"):
+        fast = match_fast_path(state["natural_language_query"], snapshot, dialect)
+        if fast is not None:
+            loaded.update({
+                "generated_sql":     fast["sql"],
+                "llm_provider_used": f"fast_path/{fast['rule']}",
+                "sql_source":        "fast_path",
+            })
+
+    return loaded
+
+
+async def _load_doc_context(
+    connection_id:          str,
+    system_db_session,
+    natural_language_query: str,
+) -> Optional[str]:
+    """Doc context within DOC_CONTEXT_TIMEOUT_S; None without a session or on timeout."""
+    if not system_db_session:
+        return None
+    try:
+        return await asyncio.wait_for(
+            get_doc_context(connection_id, system_db_session, natural_language_query),
+            DOC_CONTEXT_TIMEOUT_S,
+        )
+    except asyncio.TimeoutError:
+        logger.warning(
+            f"[node_load_schema] Doc context fetch exceeded {DOC_CONTEXT_TIMEOUT_S:g}s — continuing without docs"
+        )
+        try:
+            await system_db_session.rollback()  # The cancelled query may have left the transaction unusable
+        except Exception:
+            pass
+        return None
+
 
 # ---------------------------------------------------------------------------
 # Node 2: generate_sql
 # ---------------------------------------------------------------------------
-async def node_generate_sql(state: AgentState) -> AgentState:
+async def node_generate_sql(state: AgentState, config: RunnableConfig) -> AgentState:
     """
     Call the active LLM provider to generate SQL from the natural language query.
     On retries, injects error context to guide the LLM toward a correct response.
+    With LLM_STREAMING on, tokens are forwarded to the optional on_progress
+    callback in RunnableConfig configurable fields.
+
+    The prompt is assembled by token_budget.plan_prompt() so that it fits the
+    provider's context window (older history, docs, then schema are trimmed).
 
-    Populates: state.generated_sql, state.llm_provider_used
+    Populates: state.generated_sql, state.llm_provider_used, state.prompt_tokens
     """
     retry_count = state.get("retry_count", 0)
     logger.info(
@@ -123,13 +256,6 @@ async def node_generate_sql(state: AgentState) -> AgentState:
         f"retry={retry_count} | user='{state['user_id']}'"
     )
 
-    # ── Build system prompt ───────────────────────────────────────────────
-    system_prompt = build_system_prompt(
-        db_dialect     = state.get("db_dialect", "mysql"),
-        schema_context = state.get("schema_context", ""),
-        doc_context    = state.get("doc_context"),
-    )
-
     # ── Determine user message (handle retry context) ─────────────────────
     if retry_count > 0 and state.get("retry_error_context") and state.get("generated_sql"):
         user_message = build_retry_user_message(
@@ -152,12 +278,32 @@ async def node_generate_sql(state: AgentState) -> AgentState:
             "final_response": {"error_message": str(exc), "retry_count": retry_count},
         }
 
+    # ── Assemble the prompt within the provider's token budget ────────────
+    plan = plan_prompt(
+        db_dialect     = state.get("db_dialect", "mysql"),
+        schema_context = state.get("schema_context") or "",
+        doc_context    = state.get("doc_context"),
+        chat_history   = state.get("chat_history", []),
+        user_message   = user_message,
+        model          = provider.model,
+        context_tokens = provider.context_tokens,
+    )
+    tokens = plan["tokens"]
+    logger.info(
+        f"[node_generate_sql] Prompt {tokens['total']}/{plan['budget']} tokens | "
+        f"rules={tokens['rules']} schema={tokens['schema']} docs={tokens['docs']} "
+        f"history={tokens['history']} question={tokens['question']}"
+        + (f" | trimmed: {', '.join(plan['trimmed'])}" if plan["trimmed"] else "")
+    )
+
     # ── Call LLM ──────────────────────────────────────────────────────────
     try:
-        generated_sql, provider_name = provider.generate_sql(
-            system_prompt = system_prompt,
+        generated_sql, provider_name = await provider.agenerate_sql(
+            system_prompt = plan["system_prompt"],
             user_query    = user_message,
-            chat_history  = state.get("chat_history", []),
+            chat_history  = plan["chat_history"],
+            on_progress   = config.get("configurable", {}).get("on_progress"),
+            db_dialect    = state.get("db_dialect", "mysql"),
         )
     except Exception as exc:
         logger.error(f"[node_generate_sql] LLM call failed: {exc}")
@@ -178,9 +324,13 @@ async def node_generate_sql(state: AgentState) -> AgentState:
 
     return {
         **state,
-        "generated_sql":      generated_sql,
-        "llm_provider_used":  provider_name,
-        "error_message":      None,
+        "generated_sql":        generated_sql,
+        "llm_provider_used":    provider_name,
+        "sql_source":           "llm",
+        "sql_cache_hit_key":    None,
+        "sql_repair_attempted": False,
+        "prompt_tokens":        tokens["total"],
+        "error_message":        None,
     }
 
 
@@ -225,7 +375,7 @@ async def node_classify_and_validate(state: AgentState) -> AgentState:
 async def node_execute_query(state: AgentState, config: RunnableConfig) -> AgentState:
     """
     Execute the validated SELECT query against the target database.
-    Uses SQLAlchemy with connection pooling; enforces 10,000 row cap.
+    Uses the shared pooled engine from engine_registry; enforces 10,000 row cap.
 
     Populates: state.query_results, state.column_metadata, state.execution_time_ms
     """
@@ -235,8 +385,8 @@ async def node_execute_query(state: AgentState, config: RunnableConfig) -> Agent
     logger.info(f"[node_execute_query] Executing SELECT | user={state['user_id']}")
 
     try:
-        from sqlalchemy import create_engine, text as sa_text
-        engine = create_engine(conn_str, pool_pre_ping=True, echo=False)
+        from sqlalchemy import text as sa_text
+        engine = get_engine(conn_str)
 
         t_start = time.perf_counter()
         with engine.connect() as conn:
@@ -270,6 +420,8 @@ async def node_execute_query(state: AgentState, config: RunnableConfig) -> Agent
 
     except Exception as exc:
         logger.error(f"[node_execute_query] Query execution failed: {exc}")
+        if state.get("sql_cache_hit_key"):
+            drop_cached_sql(state["sql_cache_hit_key"])  # Never serve a failing SQL twice
         return {
             **state,
             "error_message":  f"Query execution error: {exc}",
@@ -313,9 +465,22 @@ async def node_format_results(state: AgentState) -> AgentState:
         "row_count":      row_count,
         "execution_time": f"{elapsed_ms:.0f}ms",
         "llm_provider":   provider_name,
+        "sql_source":     state.get("sql_source"),
+        "prompt_tokens":  state.get("prompt_tokens"),
         "is_truncated":   row_count >= 10_000,
     }
 
+    # ── Cache the SQL: it validated and executed successfully ─────────────
+    # (a paraphrase hit is stored under its own wording too, for exact hits next time)
+    if state.get("sql_source") in ("llm", "semantic_cache") and state.get("sql_cache_key"):
+        store_sql(
+            key                    = state["sql_cache_key"],
+            sql                    = state["generated_sql"],
+            llm_provider           = provider_name,
+            natural_language_query = state["natural_language_query"],
+            scope                  = state.get("sql_cache_scope"),
+        )
+
     # ── Append assistant turn to conversation history ─────────────────────
     updated_history = list(state.get("chat_history", []))
     updated_history.append(ChatMessage(role="user",      content=state["natural_language_query"]))
@@ -402,7 +567,49 @@ async def node_return_clarification(state: AgentState) -> AgentState:
 
 
 # ---------------------------------------------------------------------------
-# Node 7: retry_generate
+# Node 7: repair_sql
+# ---------------------------------------------------------------------------
+async def node_repair_sql(state: AgentState) -> AgentState:
+    """
+    Try the deterministic fixes in sql_repair.py (code fences, prose around
+    the SQL, wrong-dialect LIMIT/TOP) before spending an LLM retry. Runs at
+    most once per generated SQL — after a validation failure, or after an
+    execution failure of SQL that passed validation.
+
+    On success the repaired SQL replaces generated_sql and goes back through
+    classify_and_validate; otherwise the state is left as it was and the
+    router falls back to retry_generate (validation) or END (execution).
+    """
+    failed_at = "execution" if state.get("response_type") == "error" else "validation"
+    failed    = state["validation_result"]
+    raw_sql   = (failed["sanitized_sql"] if failed_at == "execution" else None) or state.get("generated_sql") or ""
+
+    repaired = repair_sql(
+        raw_sql    = raw_sql,
+        db_dialect = state.get("db_dialect", "mysql"),
+        user_role  = state.get("user_role", "viewer"),
+        origin     = failed_at,
+    )
+    if repaired is None:
+        return {**state, "sql_repair_attempted": True}
+
+    logger.info(
+        f"[node_repair_sql] Repaired after {failed_at} failure ({', '.join(repaired['fixes'])}) — "
+        f"no LLM retry needed"
+    )
+    return {
+        **state,
+        "generated_sql":        repaired["sql"],
+        "sql_repair_attempted": True,
+        "validation_result":    None,
+        "response_type":        None,
+        "final_response":       None,
+        "error_message":        None,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Node 8: retry_generate
 # ---------------------------------------------------------------------------
 async def node_retry_generate(state: AgentState) -> AgentState:
     """
@@ -412,6 +619,9 @@ async def node_retry_generate(state: AgentState) -> AgentState:
     new_retry_count = state.get("retry_count", 0) + 1
     error_reason    = state["validation_result"]["error"]
 
+    if state.get("sql_cache_hit_key"):
+        drop_cached_sql(state["sql_cache_hit_key"])
+
     logger.warning(
         f"[node_retry_generate] Retry #{new_retry_count} | reason: {error_reason}"
     )
@@ -428,9 +638,11 @@ async def node_retry_generate(state: AgentState) -> AgentState:
 # ===========================================================================
 
 def route_after_schema_load(state: AgentState) -> str:
-    """After load_schema: go to generate_sql unless a critical error occurred."""
+    """After load_schema: skip generate_sql on a query cache or fast-path hit; END on a critical error."""
     if state.get("response_type") == "error":
         return END
+    if state.get("sql_source") in ("cache", "semantic_cache", "fast_path"):
+        return "classify_and_validate"
     return "generate_sql"
 
 
@@ -446,7 +658,7 @@ def route_after_validation(state: AgentState) -> str:
     Core routing decision after validation:
       - CLARIFY   → return_clarification
       - WRITE_OP  → return_preview
-      - INVALID   → retry (up to MAX_RETRIES) → then error
+      - INVALID   → repair_sql (once per SQL) → retry (up to MAX_RETRIES) → then error
       - SELECT    → execute_query
       - error     → END
     """
@@ -465,6 +677,8 @@ def route_after_validation(state: AgentState) -> str:
         return "return_preview"
 
     if not is_valid:
+        if SQL_REPAIR_ENABLED and not state.get("sql_repair_attempted"):
+            return "repair_sql"
         retry_count = state.get("retry_count", 0)
         if retry_count < MAX_RETRIES:
             return "retry_generate"
@@ -474,20 +688,31 @@ def route_after_validation(state: AgentState) -> str:
                 f"[Router] Max retries ({MAX_RETRIES}) exceeded. "
                 f"Last error: {result.get('error')}"
             )
-            return END  # Final response was set in validate node
+            return END  # _agent_result() reports the last validation error
 
     # Valid SELECT (or INSERT/UPDATE/DELETE that somehow slipped past — shouldn't happen)
     return "execute_query"
 
 
+def route_after_repair(state: AgentState) -> str:
+    """After repair_sql: re-validate repaired SQL; otherwise the LLM retry (or END after an execution error)."""
+    if state.get("validation_result") is None:
+        return "classify_and_validate"
+    if state.get("response_type") == "error":
+        return END
+    return route_after_validation(state)
+
+
 def route_after_retry(state: AgentState) -> str:
     """After retry_generate: always go back to generate_sql."""
     return "generate_sql"
 
 
 def route_after_execute(state: AgentState) -> str:
-    """After execute_query: go to format_results unless execution error."""
+    """After execute_query: go to format_results; on an execution error try repair_sql once, else END."""
     if state.get("response_type") == "error":
+        if SQL_REPAIR_ENABLED and not state.get("sql_repair_attempted"):
+            return "repair_sql"
         return END
     return "format_results"
 
@@ -506,22 +731,24 @@ def build_agent_graph() -> Any:
     graph = StateGraph(AgentState)
 
     # ── Register nodes ────────────────────────────────────────────────────
-    graph.add_node("load_schema",           node_load_schema)
-    graph.add_node("generate_sql",          node_generate_sql)
-    graph.add_node("classify_and_validate", node_classify_and_validate)
-    graph.add_node("execute_query",         node_execute_query)
-    graph.add_node("format_results",        node_format_results)
-    graph.add_node("return_preview",        node_return_preview)
-    graph.add_node("return_clarification",  node_return_clarification)
-    graph.add_node("retry_generate",        node_retry_generate)
+    graph.add_node("load_schema",           traced_node("load_schema", node_load_schema))
+    graph.add_node("generate_sql",          traced_node("generate_sql", node_generate_sql))
+    graph.add_node("classify_and_validate", traced_node("classify_and_validate", node_classify_and_validate))
+    graph.add_node("execute_query",         traced_node("execute_query", node_execute_query))
+    graph.add_node("format_results",        traced_node("format_results", node_format_results))
+    graph.add_node("return_preview",        traced_node("return_preview", node_return_preview))
+    graph.add_node("return_clarification",  traced_node("return_clarification", node_return_clarification))
+    graph.add_node("repair_sql",            traced_node("repair_sql", node_repair_sql))
+    graph.add_node("retry_generate",        traced_node("retry_generate", node_retry_generate))
 
     # ── Entry point ───────────────────────────────────────────────────────
     graph.add_edge(START, "load_schema")
 
     # ── Conditional edges ─────────────────────────────────────────────────
     graph.add_conditional_edges("load_schema",           route_after_schema_load, {
-        "generate_sql": "generate_sql",
-        END:             END,
+        "generate_sql":          "generate_sql",
+        "classify_and_validate": "classify_and_validate",
+        END:                      END,
     })
     graph.add_conditional_edges("generate_sql",          route_after_generate, {
         "classify_and_validate": "classify_and_validate",
@@ -531,14 +758,21 @@ def build_agent_graph() -> Any:
         "execute_query":          "execute_query",
         "return_preview":         "return_preview",
         "return_clarification":   "return_clarification",
+        "repair_sql":             "repair_sql",
         "retry_generate":         "retry_generate",
         END:                       END,
     })
+    graph.add_conditional_edges("repair_sql",            route_after_repair, {
+        "classify_and_validate": "classify_and_validate",
+        "retry_generate":        "retry_generate",
+        END:                      END,
+    })
     graph.add_conditional_edges("retry_generate",        route_after_retry, {
         "generate_sql": "generate_sql",
     })
     graph.add_conditional_edges("execute_query",         route_after_execute, {
         "format_results": "format_results",
+        "repair_sql":     "repair_sql",
         END:               END,
     })
 
@@ -578,6 +812,8 @@ async def run_agent(
     chat_history:           list[ChatMessage],
     db_dialect:             Optional[str] = None,
     system_db_session       = None,
+    on_progress:            Optional[ProgressCallback] = None,
+    include_timings:        Optional[bool] = None,
 ) -> dict[str, Any]:
     """
     Main entry point: run the full NL2SQL agent pipeline.
@@ -593,17 +829,138 @@ async def run_agent(
         chat_history           : Previous conversation turns for multi-turn context
         db_dialect             : Optional dialect override; auto-detected if None
         system_db_session      : SQLAlchemy async session for system DB (for doc context)
+        on_progress            : Optional callback for LLM streaming events (LLM_STREAMING)
+        include_timings        : Add a per-stage "timings_ms" breakdown to final_response
+                                 (default: TRACE_TIMINGS_IN_RESPONSE)
 
     Returns:
         final_response dict with keys depending on response_type:
-          results       → sql, results, columns, summary, row_count, execution_time, llm_provider
+          results       → sql, results, columns, summary, row_count, execution_time, llm_provider,
+                          sql_source ("llm", "cache", "semantic_cache" or "fast_path"), prompt_tokens
           preview       → sql, operation_type, affected_rows, risk_level, warning_message
           clarification → question
           error         → error_message, retry_count
+        Every run is traced (tracing.py): one span per graph node and LLM call,
+        under the request's X-Request-ID.
     """
     agent = get_agent()
+    initial_state = _initial_state(
+        natural_language_query, db_connection_string, connection_id, user_id, user_role,
+        chat_history, db_dialect,
+    )
+    config = RunnableConfig(
+        configurable={"system_db_session": system_db_session, "on_progress": on_progress}
+    )
+
+    with span("agent.run", **{"db.system": db_dialect, "enduser.role": user_role}) as run_span:
+        try:
+            final_state = await agent.ainvoke(initial_state, config=config)
+        except Exception as exc:
+            logger.error(f"[run_agent] Unhandled agent error: {exc}", exc_info=True)
+            return _internal_error(exc)
+        return _agent_result(final_state, chat_history, run_span, include_timings)
+
+
+async def astream_agent(
+    natural_language_query: str,
+    db_connection_string:   str,
+    connection_id:          str,
+    user_id:                str,
+    user_role:              str,
+    chat_history:           list[ChatMessage],
+    db_dialect:             Optional[str] = None,
+    system_db_session       = None,
+    include_timings:        Optional[bool] = None,
+) -> AsyncIterator[dict[str, Any]]:
+    """
+    Streaming variant of run_agent() for POST /api/query/stream (SSE).
+
+    Runs the same graph with agent.astream(stream_mode="updates") and yields
+    {"event": <name>, "data": {...}} as the run progresses:
+
+      stage    — after each node: {"stage", "message", "elapsed_ms", ...details}
+                 (e.g. "Schema loaded", "SQL generated", "Executing query")
+      sql      — the validated SQL, before it runs: {"sql", "operation_type", "sql_source", "llm_provider"}
+      llm_*    — LLM progress from on_progress (llm_started / llm_token / llm_complete …)
+                 when LLM_STREAMING is on
+      columns  — column metadata of a SELECT result
+      rows     — the result rows in chunks of STREAM_ROW_CHUNK: {"offset", "rows"}
+      result   — run_agent()'s return value; for "results" without the rows
+                 (already sent), otherwise the full final_response
+      done     — {"response_type"}; always the last event
+
+    Rows are only sent once format_results has run, so a failing run never
+    streams partial results.
+    """
+    agent  = get_agent()
+    loop   = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue()
+    t0     = time.perf_counter()
+
+    def emit(event: str, data: dict[str, Any]) -> None:
+        events.put_nowait({"event": event, "data": data})
+
+    def on_progress(progress: dict[str, Any]) -> None:
+        item = {"event": progress.get("event", "llm_progress"), "data": progress}
+        loop.call_soon_threadsafe(events.put_nowait, item)  # Safe from provider threads too
+
+    initial_state = _initial_state(
+        natural_language_query, db_connection_string, connection_id, user_id, user_role,
+        chat_history, db_dialect,
+    )
+    config = RunnableConfig(
+        configurable={"system_db_session": system_db_session, "on_progress": on_progress}
+    )
 
-    initial_state: AgentState = {
+    async def produce() -> None:
+        attributes = {"db.system": db_dialect, "enduser.role": user_role, "agent.streaming": True}
+        try:
+            with span("agent.run", **attributes) as run_span:
+                try:
+                    state = dict(initial_state)
+                    async for update in agent.astream(initial_state, config=config, stream_mode="updates"):
+                        for node, node_state in update.items():
+                            state.update(node_state or {})
+                            for event, data in _stage_events(node, state):
+                                emit(event, {**data, "elapsed_ms": round((time.perf_counter() - t0) * 1000)})
+                    result = _agent_result(state, chat_history, run_span, include_timings)
+                except Exception as exc:
+                    logger.error(f"[astream_agent] Unhandled agent error: {exc}", exc_info=True)
+                    result = _internal_error(exc)
+
+            final_response = result["final_response"]
+            if result["response_type"] == "results":
+                rows = final_response.get("results") or []
+                emit("columns", {"columns": final_response.get("columns", [])})
+                for offset in range(0, len(rows), STREAM_ROW_CHUNK):
+                    emit("rows", {"offset": offset, "rows": rows[offset:offset + STREAM_ROW_CHUNK]})
+                result = {**result, "final_response": {k: v for k, v in final_response.items() if k != "results"}}
+            emit("result", result)
+            emit("done", {"response_type": result["response_type"]})
+        finally:
+            events.put_nowait(None)
+
+    task = asyncio.create_task(produce())
+    try:
+        while (item := await events.get()) is not None:
+            yield item
+        await task
+    finally:
+        if not task.done():
+            task.cancel()  # Client went away — stop the graph (and any LLM call) as well
+
+
+def _initial_state(
+    natural_language_query: str,
+    db_connection_string:   str,
+    connection_id:          str,
+    user_id:                str,
+    user_role:              str,
+    chat_history:           list[ChatMessage],
+    db_dialect:             Optional[str],
+) -> AgentState:
+    """The AgentState every run starts from."""
+    return {
         # Input
         "natural_language_query": natural_language_query,
         "db_connection_string":   db_connection_string,
@@ -620,8 +977,14 @@ async def run_agent(
         "generated_sql":          None,
         "llm_provider_used":      None,
         "clarification_question": None,
+        "sql_source":             None,
+        "sql_cache_key":          None,
+        "sql_cache_scope":        None,
+        "sql_cache_hit_key":      None,
+        "prompt_tokens":          None,
         # Validation
         "validation_result":      None,
+        "sql_repair_attempted":   False,
         "retry_count":            0,
         "retry_error_context":    None,
         # Execution
@@ -635,30 +998,107 @@ async def run_agent(
         "error_message":          None,
     }
 
-    config = RunnableConfig(
-        configurable={"system_db_session": system_db_session}
-    )
 
-    try:
-        final_state = await agent.ainvoke(initial_state, config=config)
-    except Exception as exc:
-        logger.error(f"[run_agent] Unhandled agent error: {exc}", exc_info=True)
-        return {
-            "response_type":  "error",
-            "final_response": {
-                "error_message": f"Internal agent error: {exc}",
-                "retry_count":   0,
-            },
+def _agent_result(
+    final_state:     dict[str, Any],
+    chat_history:    list[ChatMessage],
+    run_span:        Any,
+    include_timings: Optional[bool],
+) -> dict[str, Any]:
+    """run_agent()'s return value; records the outcome on the agent.run span."""
+    run_span.set_attribute("agent.sql_source", final_state.get("sql_source"))
+    run_span.set_attribute("agent.retry_count", final_state.get("retry_count", 0))
+
+    response_type  = final_state.get("response_type")
+    final_response = final_state.get("final_response") or {}
+    if response_type is None:
+        # The graph ended on a validation failure after MAX_RETRIES
+        failed         = final_state.get("validation_result") or {}
+        response_type  = "error"
+        final_response = {
+            "error_message": failed.get("error") or "Could not generate a valid SQL query.",
+            "retry_count":   final_state.get("retry_count", 0),
         }
-
+    if include_timings is None:
+        include_timings = TRACE_TIMINGS_IN_RESPONSE
+    if include_timings:
+        timings = stage_timings(run_span)
+        if timings is not None:
+            final_response = {**final_response, "timings_ms": timings}
+
+    run_span.set_attribute("agent.response_type", response_type)
     return {
-        "response_type":    final_state.get("response_type", "error"),
-        "final_response":   final_state.get("final_response", {}),
+        "response_type":    response_type,
+        "final_response":   final_response,
         "chat_history":     final_state.get("chat_history", chat_history),
         "llm_provider":     final_state.get("llm_provider_used"),
+        "sql_source":       final_state.get("sql_source"),
+        "prompt_tokens":    final_state.get("prompt_tokens"),
     }
 
 
+def _internal_error(exc: Exception) -> dict[str, Any]:
+    return {
+        "response_type":  "error",
+        "final_response": {
+            "error_message": f"Internal agent error: {exc}",
+            "retry_count":   0,
+        },
+    }
+
+
+# Progress messages per node for astream_agent()
+_STAGE_MESSAGES = {
+    "load_schema":           "Schema loaded",
+    "generate_sql":          "SQL generated",
+    "classify_and_validate": "SQL validated",
+    "repair_sql":            "Repairing SQL",
+    "retry_generate":        "Retrying SQL generation",
+    "execute_query":         "Query executed",
+    "format_results":        "Results ready",
+    "return_preview":        "Write preview ready",
+    "return_clarification":  "Clarification needed",
+}
+
+
+def _stage_events(node: str, state: dict[str, Any]) -> list[tuple[str, dict[str, Any]]]:
+    """The SSE events for one completed node (see astream_agent)."""
+    stage: dict[str, Any] = {"stage": node, "message": _STAGE_MESSAGES.get(node, node)}
+    result = state.get("validation_result") or {}
+    extra:  list[tuple[str, dict[str, Any]]] = []
+
+    if node == "repair_sql":
+        stage["repaired"] = state.get("validation_result") is None
+    elif state.get("response_type") == "error":
+        stage["error"] = state.get("error_message")
+    elif node == "load_schema":
+        stage.update(dialect=state.get("db_dialect"), sql_source=state.get("sql_source"))
+    elif node == "generate_sql":
+        stage.update(llm_provider=state.get("llm_provider_used"), prompt_tokens=state.get("prompt_tokens"))
+    elif node == "classify_and_validate":
+        stage.update(operation_type=result.get("operation_type"), is_valid=result.get("is_valid"))
+        if result.get("is_valid") and result.get("operation_type") == "SELECT":
+            extra = [
+                ("sql", {
+                    "sql":            result.get("sanitized_sql"),
+                    "operation_type": "SELECT",
+                    "sql_source":     state.get("sql_source"),
+                    "llm_provider":   state.get("llm_provider_used"),
+                }),
+                ("stage", {"stage": "executing", "message": "Executing query"}),
+            ]
+        elif not result.get("is_valid"):
+            stage["error"] = result.get("error")
+    elif node == "retry_generate":
+        stage.update(retry_count=state.get("retry_count"), reason=state.get("retry_error_context"))
+    elif node == "execute_query":
+        stage.update(
+            row_count         = len(state.get("query_results") or []),
+            execution_time_ms = round(state.get("execution_time_ms") or 0, 1),
+        )
+    return [("stage", stage), *extra]
+
+
 # ===========================================================================
 # Internal utilities
 # ===========================================================================
@@ -709,7 +1149,7 @@ def _estimate_affected_rows(
     Returns 0 if estimation fails (non-critical — preview still shown).
     """
     import re
-    from sqlalchemy import create_engine, text as sa_text
+    from sqlalchemy import text as sa_text
 
     try:
         # Extract WHERE clause for estimation
@@ -731,7 +1171,7 @@ def _estimate_affected_rows(
         else:
             return 0
 
-        engine = create_engine(conn_str, pool_pre_ping=True)
+        engine = get_engine(conn_str)
         with engine.connect() as conn:
             result = conn.execute(sa_text(count_sql))
             count  = result.scalar()
@@ -10,20 +10,68 @@ Implements a clean provider abstraction with:
 Priority order: openrouter → groq → gemini → ollama
 Controlled by: LLM_PROVIDER env var (no code changes needed to switch)
 
+Failover happens at call time: get_llm_provider() returns a
+FailoverLLMProvider over every configured provider, which skips providers
+whose circuit breaker is open (circuit_breaker.py) and moves to the next
+one when a call errors or times out. With LLM_HEDGING on, a slow primary
+is raced against the next provider (see FailoverLLMProvider._ahedged).
+
+The graph calls the native coroutine agenerate_sql(). HTTP providers share
+one long-lived httpx.AsyncClient each (keep-alive pool, HTTP/2 when the
+`h2` package is installed), so concurrent questions on one worker reuse
+warm TLS connections instead of blocking the event loop on a fresh
+handshake. aclose_llm_clients() is called from main.lifespan on shutdown.
+
+Every HTTP call first passes the provider's rate limiter (rate_limiter.py):
+a token bucket plus concurrency cap with a bounded FIFO wait. A 429 pauses
+the provider for Retry-After and the call is retried within that budget,
+so a burst on a free tier becomes a short delay instead of an error. Each
+call is an llm.call trace span (tracing.py) carrying its queue wait, 429
+retries and token usage.
+
+With LLM_STREAMING on, the async path streams the completion instead
+(SSE for OpenAI-compatible APIs and Gemini, NDJSON for Ollama): a
+CLARIFY: / WRITE_OP: directive is recognised from the first tokens, the
+stream is closed as soon as the SQL statement is complete (top-level `;`
+or closing code fence) — which also stops generation on Ollama — and
+every delta is passed to the optional on_progress callback.
+
+Prompt-prefix caching: prompts.build_system_prompt() puts the static rules
+first and the per-connection schema second, so providers that cache
+prompt prefixes (OpenRouter → Anthropic / Gemini / OpenAI / DeepSeek, Groq)
+can reuse them. OpenRouter additionally gets explicit cache_control
+breakpoints. Prompt and cached-token counts reported by each provider are
+logged per call and summed in get_llm_usage_stats() (GET /health).
+
 Author  : Member 1 (Backend Lead)
 Project : Talk2Tables — Diploma Final Year Project
 """
 
 from __future__ import annotations
 
+import asyncio
+import contextvars
+import importlib.util
 import json
 import logging
 import os
+import re
 import time
 from abc import ABC, abstractmethod
-from typing import Optional
+from collections import Counter, defaultdict, deque
+from contextlib import nullcontext
+from typing import Any, Callable, Iterator, Optional
 
 import httpx
+from typing_extensions import TypedDict
+
+from .circuit_breaker import CircuitBreaker, get_breaker
+from .rate_limiter import (
+    LLM_QUEUE_MAX_WAIT_S, LLM_RATE_LIMIT_RETRIES, LLMThrottled, ProviderLimiter, get_rate_limiter,
+)
+from .prompts import cache_segments
+from .tracing import KIND_CLIENT, current_span, span
+from .sql_validator import validate_sql
 
 logger = logging.getLogger(__name__)
 
@@ -33,6 +81,40 @@ logger = logging.getLogger(__name__)
 DEFAULT_MAX_TOKENS = 1024
 REQUEST_TIMEOUT_S  = 30  # seconds — generous for slower models
 
+# Shared async HTTP clients (one per provider)
+LLM_HTTP_MAX_CONNECTIONS    = int(os.environ.get("LLM_HTTP_MAX_CONNECTIONS", "20"))
+LLM_HTTP_MAX_KEEPALIVE      = int(os.environ.get("LLM_HTTP_MAX_KEEPALIVE", "10"))
+LLM_HTTP_KEEPALIVE_EXPIRY_S = float(os.environ.get("LLM_HTTP_KEEPALIVE_EXPIRY_S", "60"))
+LLM_HTTP2_ENABLED           = (
+    os.environ.get("LLM_HTTP2", "true").lower() == "true"
+    and importlib.util.find_spec("h2") is not None  # httpx needs the optional h2 package
+)
+
+# Route calls to the next healthy provider when one fails (see FailoverLLMProvider)
+LLM_FAILOVER_ENABLED = os.environ.get("LLM_FAILOVER", "true").lower() == "true"
+
+# Opt-in hedging: if the primary is slower than this percentile of its own
+# recent latency, race the same prompt on the next provider
+LLM_HEDGING_ENABLED       = os.environ.get("LLM_HEDGING", "false").lower() == "true"
+LLM_HEDGE_PERCENTILE      = float(os.environ.get("LLM_HEDGE_PERCENTILE", "0.95"))
+LLM_HEDGE_DEFAULT_DELAY_S = float(os.environ.get("LLM_HEDGE_DEFAULT_DELAY_S", "4"))
+LLM_HEDGE_MIN_SAMPLES     = int(os.environ.get("LLM_HEDGE_MIN_SAMPLES", "20"))
+_HEDGE_MIN_DELAY_S        = 0.25   # Never hedge sooner than this, whatever the percentile says
+_LATENCY_WINDOW           = 200    # Successful-call latencies kept per provider
+
+# Stream completions on the async path and stop once the SQL statement is complete
+LLM_STREAMING_ENABLED = os.environ.get("LLM_STREAMING", "false").lower() == "true"
+
+# Receives progress events while a completion streams, e.g.
+# {"event": "llm_token", "provider": "groq/...", "text": "SELECT", "chars": 6}
+ProgressCallback = Callable[[dict[str, Any]], None]
+
+# Send explicit prompt-cache breakpoints where the API accepts them (OpenRouter)
+LLM_PROMPT_CACHE_HINTS = os.environ.get("LLM_PROMPT_CACHE_HINTS", "true").lower() == "true"
+
+# Context window used by token_budget.plan_prompt(); 0 = each provider's default
+LLM_CONTEXT_TOKENS = int(os.environ.get("LLM_CONTEXT_TOKENS", "0"))
+
 # Model identifiers
 OPENROUTER_DEFAULT_MODEL = "qwen/qwen-2.5-coder-32b-instruct"
 GROQ_DEFAULT_MODEL       = "qwen-2.5-coder-32b"
@@ -46,6 +128,14 @@ OLLAMA_DEFAULT_MODEL     = "qwen2.5-coder:7b"
 class LLMProvider(ABC):
     """Abstract base class for all LLM backends."""
 
+    model:                  str = ""
+    default_context_tokens: int = 8_192   # Conservative default for unknown models
+
+    @property
+    def context_tokens(self) -> int:
+        """Context window (prompt + completion) that prompts are budgeted against."""
+        return LLM_CONTEXT_TOKENS or self.default_context_tokens
+
     @abstractmethod
     def generate_sql(
         self,
@@ -66,16 +156,273 @@ class LLMProvider(ABC):
             Directives look like: "CLARIFY: <question>" or "WRITE_OP: <sql>"
         """
 
+    async def agenerate_sql(
+        self,
+        system_prompt: str,
+        user_query: str,
+        chat_history: list[dict],
+        on_progress: Optional[ProgressCallback] = None,
+        db_dialect: Optional[str] = None,
+    ) -> tuple[str, str]:
+        """
+        Async generate_sql(). Providers without a native implementation run
+        the blocking call on a worker thread so the event loop stays free.
+        on_progress receives streaming events from providers that stream;
+        db_dialect is the target database's dialect, for wrappers that
+        validate output (hedging) — single providers ignore it.
+        """
+        return await asyncio.to_thread(self.generate_sql, system_prompt, user_query, chat_history)
+
     @property
     @abstractmethod
     def name(self) -> str:
         """Human-readable provider name for logging and API responses."""
 
 
+# ---------------------------------------------------------------------------
+# HTTP provider base — one JSON POST per completion
+# ---------------------------------------------------------------------------
+class LLMRequest(TypedDict):
+    url:     str
+    headers: dict[str, str]
+    json:    dict[str, Any]
+
+
+class LLMUsage(TypedDict):
+    prompt_tokens:     int
+    cached_tokens:     int   # Prompt tokens served from the provider's prefix cache
+    completion_tokens: int
+
+
+class HTTPLLMProvider(LLMProvider):
+    """
+    Base for providers backed by a single JSON POST. Subclasses only build
+    the request and pick the text out of the response; the sync and async
+    call paths, streaming, timing and output cleanup are shared.
+
+    The streaming hooks default to the OpenAI-compatible SSE format
+    ("stream": true, choices[0].delta.content).
+    """
+
+    client_key:    str   = ""                 # Key of the shared AsyncClient (one per provider)
+    log_tag:       str   = "LLM"
+    timeout_s:     float = REQUEST_TIMEOUT_S
+    stream_format: str   = "sse"              # "sse" (data: {...} lines) or "ndjson"
+    model:         str
+
+    @abstractmethod
+    def _build_request(
+        self,
+        system_prompt: str,
+        user_query: str,
+        chat_history: list[dict],
+    ) -> LLMRequest:
+        """URL, headers and JSON body for one completion."""
+
+    @abstractmethod
+    def _parse_response(self, data: dict) -> str:
+        """Extract the completion text from the decoded JSON response."""
+
+    def _stream_request(self, request: LLMRequest) -> LLMRequest:
+        """Turn a completion request into its streaming variant (usage arrives in the last event)."""
+        return LLMRequest(
+            url     = request["url"],
+            headers = request["headers"],
+            json    = {**request["json"], "stream": True, "stream_options": {"include_usage": True}},
+        )
+
+    def _parse_stream_chunk(self, data: dict) -> str:
+        """Extract the text delta from one decoded stream event."""
+        choices = data.get("choices") or [{}]
+        return (choices[0].get("delta") or {}).get("content") or ""
+
+    def _parse_usage(self, data: dict) -> Optional[LLMUsage]:
+        """Token usage from a response or stream event (OpenAI-compatible "usage" block)."""
+        usage = data.get("usage")
+        if not usage:
+            return None
+        details = usage.get("prompt_tokens_details") or {}
+        return LLMUsage(
+            prompt_tokens     = usage.get("prompt_tokens") or 0,
+            cached_tokens     = details.get("cached_tokens") or 0,
+            completion_tokens = usage.get("completion_tokens") or 0,
+        )
+
+    def generate_sql(
+        self,
+        system_prompt: str,
+        user_query: str,
+        chat_history: list[dict],
+    ) -> tuple[str, str]:
+        request  = self._build_request(system_prompt, user_query, chat_history)
+        limiter  = get_rate_limiter(self.client_key)
+        deadline = time.monotonic() + LLM_QUEUE_MAX_WAIT_S
+
+        with self._span(), httpx.Client(timeout=self.timeout_s) as client:
+            for attempt in range(LLM_RATE_LIMIT_RETRIES + 1):
+                queued = time.perf_counter()
+                with limiter.slot(deadline) if limiter else nullcontext():
+                    start = _record_queue_wait(queued)
+                    response = client.post(request["url"], headers=request["headers"], json=request["json"])
+                if not self._should_retry(limiter, response, attempt, deadline):
+                    break  # On retry, admission waits out the provider's pause
+            response.raise_for_status()
+
+            data = response.json()
+            return self._finish(self._parse_response(data), start, self._parse_usage(data))
+
+    async def agenerate_sql(
+        self,
+        system_prompt: str,
+        user_query: str,
+        chat_history: list[dict],
+        on_progress: Optional[ProgressCallback] = None,
+        db_dialect: Optional[str] = None,
+    ) -> tuple[str, str]:
+        request  = self._build_request(system_prompt, user_query, chat_history)
+        limiter  = get_rate_limiter(self.client_key)
+        deadline = time.monotonic() + LLM_QUEUE_MAX_WAIT_S
+
+        client = get_async_client(self.client_key, self.timeout_s)
+        with self._span():
+            for attempt in range(LLM_RATE_LIMIT_RETRIES + 1):
+                queued = time.perf_counter()
+                async with limiter.aslot(deadline) if limiter else nullcontext():
+                    start = _record_queue_wait(queued)
+                    try:
+                        if LLM_STREAMING_ENABLED:
+                            return await self._astream(
+                                client, self._stream_request(request), start, on_progress, limiter
+                            )
+                        response = await client.post(request["url"], headers=request["headers"], json=request["json"])
+                    except httpx.HTTPStatusError as exc:  # Streams fail before the first byte of the body
+                        if self._should_retry(limiter, exc.response, attempt, deadline):
+                            continue
+                        raise
+                if not self._should_retry(limiter, response, attempt, deadline):
+                    break  # On retry, admission waits out the provider's pause
+            response.raise_for_status()
+
+            data = response.json()
+            return self._finish(self._parse_response(data), start, self._parse_usage(data))
+
+    def _span(self):
+        """Trace span for one provider call, retries on 429 included (tracing.py)."""
+        return span("llm.call", kind=KIND_CLIENT, **{
+            "llm.provider": self.name, "llm.model": self.model, "llm.streaming": LLM_STREAMING_ENABLED,
+        })
+
+    async def _astream(
+        self,
+        client: httpx.AsyncClient,
+        request: LLMRequest,
+        start: float,
+        on_progress: Optional[ProgressCallback],
+        limiter: Optional[ProviderLimiter] = None,
+    ) -> tuple[str, str]:
+        """Consume a streamed completion; close the stream once the statement is complete."""
+        assembler = _StreamAssembler()
+        usage:          Optional[LLMUsage] = None
+        first_token_ms: Optional[float] = None
+        _emit(on_progress, {"event": "llm_started", "provider": self.name})
+
+        async with client.stream(
+            "POST", request["url"], headers=request["headers"], json=request["json"]
+        ) as response:
+            if limiter:
+                limiter.observe(response.headers)
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                data = _decode_stream_line(line, self.stream_format)
+                if data is None:
+                    continue
+                if data is _STREAM_DONE:
+                    break
+                usage = self._parse_usage(data) or usage
+                delta = self._parse_stream_chunk(data)
+                if not delta:
+                    continue
+                if first_token_ms is None:
+                    first_token_ms = (time.perf_counter() - start) * 1000
+
+                known    = assembler.directive
+                complete = assembler.feed(delta)
+                _emit(on_progress, {
+                    "event": "llm_token", "provider": self.name, "text": delta, "chars": len(assembler.text),
+                })
+                if assembler.directive != known:
+                    _emit(on_progress, {
+                        "event": "llm_directive", "provider": self.name, "directive": assembler.directive,
+                    })
+                if complete:
+                    break  # Leaving the context closes the stream; Ollama stops generating
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        _emit(on_progress, {
+            "event":         "llm_complete",
+            "provider":      self.name,
+            "chars":         len(assembler.text),
+            "stopped_early": assembler.complete,
+            "elapsed_ms":    round(elapsed_ms),
+        })
+        current_span().set_attribute("llm.first_token_ms", round(first_token_ms or elapsed_ms, 1))
+        current_span().set_attribute("llm.stopped_early", assembler.complete)
+        logger.info(
+            f"[{self.log_tag}] Stream: first token {first_token_ms or elapsed_ms:.0f}ms | "
+            f"directive={assembler.directive} | stopped_early={assembler.complete}"
+        )
+        return self._finish(assembler.text, start, usage)
+
+    def _should_retry(
+        self,
+        limiter: Optional[ProviderLimiter],
+        response: httpx.Response,
+        attempt: int,
+        deadline: float,
+    ) -> bool:
+        """
+        Feed the response's rate-limit headers to the limiter. True for a 429
+        (or a 503 with Retry-After) whose pause still fits in the wait budget.
+        """
+        if limiter is None:
+            return False
+        throttled = response.status_code == 429 or (
+            response.status_code == 503 and "retry-after" in response.headers
+        )
+        if not throttled:
+            limiter.observe(response.headers)
+            return False
+        delay = limiter.penalize(response.headers)
+        if attempt >= LLM_RATE_LIMIT_RETRIES or time.monotonic() + delay > deadline:
+            return False
+        limiter.record_retry()
+        current_span().add_event("llm.rate_limited", **{"http.status_code": response.status_code, "retry_in_s": delay})
+        logger.info(f"[{self.log_tag}] HTTP {response.status_code} — retrying in {delay:.1f}s")
+        return True
+
+    def _finish(self, text: str, start: float, usage: Optional[LLMUsage] = None) -> tuple[str, str]:
+        elapsed = (time.perf_counter() - start) * 1000
+        _record_usage(self.name, usage)
+        if usage is not None:
+            call = current_span()
+            call.set_attribute("llm.prompt_tokens", usage["prompt_tokens"])
+            call.set_attribute("llm.cached_tokens", usage["cached_tokens"])
+            call.set_attribute("llm.completion_tokens", usage["completion_tokens"])
+        logger.info(
+            f"[{self.log_tag}] Response in {elapsed:.0f}ms | model={self.model}"
+            + (
+                f" | prompt_tokens={usage['prompt_tokens']} cached={usage['cached_tokens']}"
+                if usage is not None else ""
+            )
+        )
+
+        return _clean_llm_output(text.strip()), self.name
+
+
 # ---------------------------------------------------------------------------
 # OpenRouter Provider  (PRIMARY)
 # ---------------------------------------------------------------------------
-class OpenRouterProvider(LLMProvider):
+class OpenRouterProvider(HTTPLLMProvider):
     """
     OpenRouter: unified API gateway supporting 100+ models.
     Uses OpenAI-compatible /v1/chat/completions endpoint.
@@ -87,6 +434,10 @@ class OpenRouterProvider(LLMProvider):
         OPENROUTER_BASE_URL — optional (default: https://openrouter.ai/api/v1)
     """
 
+    client_key = "openrouter"
+    log_tag    = "OpenRouter"
+    default_context_tokens = 32_768
+
     def __init__(self):
         self.api_key  = os.environ.get("OPENROUTER_API_KEY", "")
         self.model    = os.environ.get("OPENROUTER_MODEL", OPENROUTER_DEFAULT_MODEL)
@@ -99,45 +450,38 @@ class OpenRouterProvider(LLMProvider):
     def name(self) -> str:
         return f"openrouter/{self.model}"
 
-    def generate_sql(
+    def _build_request(
         self,
         system_prompt: str,
         user_query: str,
         chat_history: list[dict],
-    ) -> tuple[str, str]:
-        messages = _build_messages(system_prompt, user_query, chat_history)
-
-        start = time.perf_counter()
-        with httpx.Client(timeout=REQUEST_TIMEOUT_S) as client:
-            response = client.post(
-                f"{self.base_url}/chat/completions",
-                headers={
-                    "Authorization":  f"Bearer {self.api_key}",
-                    "Content-Type":   "application/json",
-                    "HTTP-Referer":   "https://talk2tables.project",  # OpenRouter attribution
-                    "X-Title":        "Talk2Tables",
-                },
-                json={
-                    "model":      self.model,
-                    "messages":   messages,
-                    "max_tokens": DEFAULT_MAX_TOKENS,
-                    "temperature": 0.1,  # Low temperature for deterministic SQL
-                },
-            )
-            response.raise_for_status()
-
-        elapsed = (time.perf_counter() - start) * 1000
-        logger.info(f"[OpenRouter] Response in {elapsed:.0f}ms | model={self.model}")
+    ) -> LLMRequest:
+        return LLMRequest(
+            url     = f"{self.base_url}/chat/completions",
+            headers = {
+                "Authorization":  f"Bearer {self.api_key}",
+                "Content-Type":   "application/json",
+                "HTTP-Referer":   "https://talk2tables.project",  # OpenRouter attribution
+                "X-Title":        "Talk2Tables",
+            },
+            json    = {
+                "model":      self.model,
+                "messages":   _with_cache_breakpoints(
+                    _build_messages(system_prompt, user_query, chat_history)
+                ),
+                "max_tokens": DEFAULT_MAX_TOKENS,
+                "temperature": 0.1,  # Low temperature for deterministic SQL
+            },
+        )
 
-        data = response.json()
-        sql  = data["choices"][0]["message"]["content"].strip()
-        return _clean_llm_output(sql), self.name
+    def _parse_response(self, data: dict) -> str:
+        return data["choices"][0]["message"]["content"]
 
 
 # ---------------------------------------------------------------------------
 # Groq Provider  (SECONDARY)
 # ---------------------------------------------------------------------------
-class GroqProvider(LLMProvider):
+class GroqProvider(HTTPLLMProvider):
     """
     Groq: LPU-accelerated inference — ~1.5s response, generous free tier.
     Default model: Qwen2.5-Coder-32B (SQL-specialized).
@@ -147,6 +491,10 @@ class GroqProvider(LLMProvider):
         GROQ_MODEL      — optional (default: qwen-2.5-coder-32b)
     """
 
+    client_key = "groq"
+    log_tag    = "Groq"
+    default_context_tokens = 32_768
+
     def __init__(self):
         self.api_key = os.environ.get("GROQ_API_KEY", "")
         self.model   = os.environ.get("GROQ_MODEL", GROQ_DEFAULT_MODEL)
@@ -158,43 +506,34 @@ class GroqProvider(LLMProvider):
     def name(self) -> str:
         return f"groq/{self.model}"
 
-    def generate_sql(
+    def _build_request(
         self,
         system_prompt: str,
         user_query: str,
         chat_history: list[dict],
-    ) -> tuple[str, str]:
-        messages = _build_messages(system_prompt, user_query, chat_history)
-
-        start = time.perf_counter()
-        with httpx.Client(timeout=REQUEST_TIMEOUT_S) as client:
-            response = client.post(
-                "https://api.groq.com/openai/v1/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {self.api_key}",
-                    "Content-Type":  "application/json",
-                },
-                json={
-                    "model":       self.model,
-                    "messages":    messages,
-                    "max_tokens":  DEFAULT_MAX_TOKENS,
-                    "temperature": 0.1,
-                },
-            )
-            response.raise_for_status()
-
-        elapsed = (time.perf_counter() - start) * 1000
-        logger.info(f"[Groq] Response in {elapsed:.0f}ms | model={self.model}")
+    ) -> LLMRequest:
+        return LLMRequest(
+            url     = "https://api.groq.com/openai/v1/chat/completions",
+            headers = {
+                "Authorization": f"Bearer {self.api_key}",
+                "Content-Type":  "application/json",
+            },
+            json    = {
+                "model":       self.model,
+                "messages":    _build_messages(system_prompt, user_query, chat_history),
+                "max_tokens":  DEFAULT_MAX_TOKENS,
+                "temperature": 0.1,
+            },
+        )
 
-        data = response.json()
-        sql  = data["choices"][0]["message"]["content"].strip()
-        return _clean_llm_output(sql), self.name
+    def _parse_response(self, data: dict) -> str:
+        return data["choices"][0]["message"]["content"]
 
 
 # ---------------------------------------------------------------------------
 # Google Gemini Provider  (TERTIARY / FALLBACK)
 # ---------------------------------------------------------------------------
-class GeminiProvider(LLMProvider):
+class GeminiProvider(HTTPLLMProvider):
     """
     Google Gemini: free tier with Hindi language support.
     Default model: gemini-1.5-flash (~2.5s response).
@@ -204,6 +543,10 @@ class GeminiProvider(LLMProvider):
         GEMINI_MODEL    — optional (default: gemini-1.5-flash)
     """
 
+    client_key = "gemini"
+    log_tag    = "Gemini"
+    default_context_tokens = 1_048_576
+
     def __init__(self):
         self.api_key = os.environ.get("GEMINI_API_KEY", "")
         self.model   = os.environ.get("GEMINI_MODEL", GEMINI_DEFAULT_MODEL)
@@ -215,49 +558,62 @@ class GeminiProvider(LLMProvider):
     def name(self) -> str:
         return f"gemini/{self.model}"
 
-    def generate_sql(
+    def _build_request(
         self,
         system_prompt: str,
         user_query: str,
         chat_history: list[dict],
-    ) -> tuple[str, str]:
+    ) -> LLMRequest:
         # Gemini uses a different REST API shape — build content blocks
         contents = _build_gemini_contents(system_prompt, user_query, chat_history)
-
-        start = time.perf_counter()
-        url = (
-            f"https://generativelanguage.googleapis.com/v1beta/models/"
-            f"{self.model}:generateContent?key={self.api_key}"
-        )
-        with httpx.Client(timeout=REQUEST_TIMEOUT_S) as client:
-            response = client.post(
-                url,
-                headers={"Content-Type": "application/json"},
-                json={
-                    "contents": contents,
-                    "generationConfig": {
-                        "temperature": 0.1,
-                        "maxOutputTokens": DEFAULT_MAX_TOKENS,
-                    },
-                    "systemInstruction": {
-                        "parts": [{"text": system_prompt}]
-                    },
+        return LLMRequest(
+            url     = (
+                f"https://generativelanguage.googleapis.com/v1beta/models/"
+                f"{self.model}:generateContent?key={self.api_key}"
+            ),
+            headers = {"Content-Type": "application/json"},
+            json    = {
+                "contents": contents,
+                "generationConfig": {
+                    "temperature": 0.1,
+                    "maxOutputTokens": DEFAULT_MAX_TOKENS,
                 },
-            )
-            response.raise_for_status()
+                "systemInstruction": {
+                    "parts": [{"text": system_prompt}]
+                },
+            },
+        )
 
-        elapsed = (time.perf_counter() - start) * 1000
-        logger.info(f"[Gemini] Response in {elapsed:.0f}ms | model={self.model}")
+    def _parse_response(self, data: dict) -> str:
+        return data["candidates"][0]["content"]["parts"][0]["text"]
+
+    def _stream_request(self, request: LLMRequest) -> LLMRequest:
+        return LLMRequest(
+            url     = request["url"].replace(":generateContent?", ":streamGenerateContent?alt=sse&", 1),
+            headers = request["headers"],
+            json    = request["json"],
+        )
 
-        data = response.json()
-        sql  = data["candidates"][0]["content"]["parts"][0]["text"].strip()
-        return _clean_llm_output(sql), self.name
+    def _parse_stream_chunk(self, data: dict) -> str:
+        candidates = data.get("candidates") or [{}]
+        parts      = (candidates[0].get("content") or {}).get("parts") or []
+        return "".join(part.get("text", "") for part in parts)
+
+    def _parse_usage(self, data: dict) -> Optional[LLMUsage]:
+        usage = data.get("usageMetadata")
+        if not usage:
+            return None
+        return LLMUsage(
+            prompt_tokens     = usage.get("promptTokenCount") or 0,
+            cached_tokens     = usage.get("cachedContentTokenCount") or 0,   # Implicit caching
+            completion_tokens = usage.get("candidatesTokenCount") or 0,
+        )
 
 
 # ---------------------------------------------------------------------------
 # Ollama Provider  (OPTIONAL — local/offline)
 # ---------------------------------------------------------------------------
-class OllamaProvider(LLMProvider):
+class OllamaProvider(HTTPLLMProvider):
     """
     Ollama: runs open-source models locally, no API key needed.
     Default model: qwen2.5-coder:7b (quantized, CPU-friendly).
@@ -266,45 +622,534 @@ class OllamaProvider(LLMProvider):
     Environment vars:
         OLLAMA_BASE_URL — optional (default: http://localhost:11434)
         OLLAMA_MODEL    — optional (default: qwen2.5-coder:7b)
+        OLLAMA_NUM_CTX  — optional context window in tokens (default: 8192;
+                          Ollama's own default silently truncates long prompts)
 
     Setup: docker exec ollama ollama pull qwen2.5-coder:7b
     """
 
+    client_key    = "ollama"
+    log_tag       = "Ollama"
+    timeout_s     = 120  # Longer timeout for local CPU inference
+    stream_format = "ndjson"
+
     def __init__(self):
         self.base_url = os.environ.get("OLLAMA_BASE_URL", "http://localhost:11434")
         self.model    = os.environ.get("OLLAMA_MODEL", OLLAMA_DEFAULT_MODEL)
+        self.num_ctx  = int(os.environ.get("OLLAMA_NUM_CTX", "8192"))
+        self.default_context_tokens = self.num_ctx
 
     @property
     def name(self) -> str:
         return f"ollama/{self.model}"
 
+    def _build_request(
+        self,
+        system_prompt: str,
+        user_query: str,
+        chat_history: list[dict],
+    ) -> LLMRequest:
+        return LLMRequest(
+            url     = f"{self.base_url}/api/chat",
+            headers = {},
+            json    = {
+                "model":    self.model,
+                "messages": _build_messages(system_prompt, user_query, chat_history),
+                "stream":   False,
+                "options":  {
+                    "temperature": 0.1,
+                    "num_predict": DEFAULT_MAX_TOKENS,
+                    "num_ctx":     self.num_ctx,
+                },
+            },
+        )
+
+    def _parse_response(self, data: dict) -> str:
+        return data["message"]["content"]
+
+    def _stream_request(self, request: LLMRequest) -> LLMRequest:
+        return LLMRequest(url=request["url"], headers=request["headers"], json={**request["json"], "stream": True})
+
+    def _parse_stream_chunk(self, data: dict) -> str:
+        return (data.get("message") or {}).get("content") or ""
+
+    def _parse_usage(self, data: dict) -> Optional[LLMUsage]:
+        # Ollama reuses the KV cache of a matching prompt prefix on its own;
+        # prompt_eval_count counts only the tokens it actually had to evaluate.
+        if "prompt_eval_count" not in data:
+            return None
+        return LLMUsage(
+            prompt_tokens     = data.get("prompt_eval_count") or 0,
+            cached_tokens     = 0,
+            completion_tokens = data.get("eval_count") or 0,
+        )
+
+
+# ---------------------------------------------------------------------------
+# Failover wrapper — call-time routing across providers via circuit breakers
+# ---------------------------------------------------------------------------
+class FailoverLLMProvider(LLMProvider):
+    """
+    Tries the configured providers in priority order on every call.
+
+    A provider is skipped while its circuit breaker is open. Timeouts,
+    connection errors, 5xx and 429s that outlast the rate limiter's retries
+    are recorded on its breaker, and the same prompt goes to the next
+    provider; so does a malformed response, without counting against the
+    breaker. Any other 4xx is raised to the caller directly and never opens
+    a breaker. The provider that actually answered is reported in the
+    returned provider name.
+
+    With LLM_HEDGING enabled, agenerate_sql() also races a slow primary
+    against the next provider once it exceeds its LLM_HEDGE_PERCENTILE
+    latency; the first response that passes validate_sql() wins.
+    """
+
+    def __init__(self, providers: list[LLMProvider]):
+        if not providers:
+            raise ValueError("FailoverLLMProvider needs at least one provider.")
+        self.providers = providers
+
+    @property
+    def name(self) -> str:
+        return self.providers[0].name
+
+    @property
+    def model(self) -> str:
+        return getattr(self.providers[0], "model", "")
+
+    @property
+    def context_tokens(self) -> int:
+        """The smallest window in the chain, so a failed-over prompt still fits."""
+        return min(provider.context_tokens for provider in self.providers)
+
     def generate_sql(
         self,
         system_prompt: str,
         user_query: str,
         chat_history: list[dict],
     ) -> tuple[str, str]:
-        messages = _build_messages(system_prompt, user_query, chat_history)
-
-        start = time.perf_counter()
-        with httpx.Client(timeout=120) as client:  # Longer timeout for local CPU inference
-            response = client.post(
-                f"{self.base_url}/api/chat",
-                json={
-                    "model":    self.model,
-                    "messages": messages,
-                    "stream":   False,
-                    "options":  {"temperature": 0.1, "num_predict": DEFAULT_MAX_TOKENS},
-                },
+        errors: list[str] = []
+        for provider, breaker in self._available():
+            timing = _CallTiming()
+            token  = _call_timing.set(timing)
+            try:
+                result = provider.generate_sql(system_prompt, user_query, chat_history)
+            except Exception as exc:
+                self._record_failure(provider, breaker, exc, timing, errors)
+                if _is_client_error(exc):
+                    raise
+                continue
+            finally:
+                _call_timing.reset(token)
+            _record_success(provider, breaker, timing)
+            return result
+        raise self._exhausted(errors)
+
+    async def agenerate_sql(
+        self,
+        system_prompt: str,
+        user_query: str,
+        chat_history: list[dict],
+        on_progress: Optional[ProgressCallback] = None,
+        db_dialect: Optional[str] = None,
+    ) -> tuple[str, str]:
+        if LLM_HEDGING_ENABLED and len(self.providers) > 1:
+            return await self._ahedged(system_prompt, user_query, chat_history, on_progress, db_dialect)
+
+        errors: list[str] = []
+        for provider, breaker in self._available():
+            timing = _CallTiming()
+            token  = _call_timing.set(timing)
+            try:
+                result = await provider.agenerate_sql(
+                    system_prompt, user_query, chat_history, on_progress, db_dialect
+                )
+            except asyncio.CancelledError:
+                breaker.release_probe()  # Caller gave up — says nothing about the provider
+                raise
+            except Exception as exc:
+                self._record_failure(provider, breaker, exc, timing, errors)
+                if _is_client_error(exc):
+                    raise
+                continue
+            finally:
+                _call_timing.reset(token)
+            _record_success(provider, breaker, timing)
+            return result
+        raise self._exhausted(errors)
+
+    # ── Hedging ───────────────────────────────────────────────────────────
+    async def _ahedged(
+        self,
+        system_prompt: str,
+        user_query: str,
+        chat_history: list[dict],
+        on_progress: Optional[ProgressCallback] = None,
+        db_dialect: Optional[str] = None,
+    ) -> tuple[str, str]:
+        """
+        Failover plus hedging. One call runs at first; if it has not finished
+        within the provider's hedge delay, the next provider gets the same
+        prompt and both race. A response that fails validate_sql() does not
+        win while another call is still running; a failed call triggers
+        plain failover. The losing call is cancelled.
+        """
+        available = self._available()
+        errors:   list[str] = []
+        running:  dict[asyncio.Task, tuple[LLMProvider, CircuitBreaker, _CallTiming]] = {}
+        fallback: Optional[tuple[str, str]] = None   # Valid HTTP response that failed validation
+        raced:    list[str] = []                      # Providers that took part in a hedged race
+        can_hedge = True
+
+        def launch() -> Optional[LLMProvider]:
+            nxt = next(available, None)
+            if nxt is None:
+                return None
+            provider, breaker = nxt
+            timing = _CallTiming()
+            token  = _call_timing.set(timing)   # The task copies the context it is created in
+            try:
+                task = asyncio.ensure_future(
+                    provider.agenerate_sql(system_prompt, user_query, chat_history, on_progress, db_dialect)
+                )
+            finally:
+                _call_timing.reset(token)
+            running[task] = (provider, breaker, timing)
+            return provider
+
+        _hedge_stats["calls"] += 1
+        if launch() is None:
+            raise self._exhausted(errors)
+        try:
+            while running:
+                only   = next(iter(running.values()))[0] if len(running) == 1 else None
+                delay  = _hedge_delay(only.name) if (only is not None and can_hedge) else None
+                done, _ = await asyncio.wait(running, timeout=delay, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:  # Hedge delay passed with the call still running
+                    can_hedge = False
+                    hedge = launch()
+                    if hedge is not None:
+                        raced[:] = [only.name, hedge.name]
+                        _hedge_stats["hedges_fired"] += 1
+                        logger.info(
+                            f"[LLMHedge] {only.name} slower than {delay:.2f}s — hedging on {hedge.name}"
+                        )
+                    continue
+
+                for task in done:
+                    provider, breaker, timing = running.pop(task)
+                    if task.exception() is not None:
+                        self._record_failure(provider, breaker, task.exception(), timing, errors)
+                        if _is_client_error(task.exception()):
+                            raise task.exception()
+                    else:
+                        _record_success(provider, breaker, timing)
+                        result = task.result()
+                        if _is_usable(result[0], db_dialect):
+                            self._record_win(provider.name, raced)
+                            return result
+                        logger.info(f"[LLMHedge] {provider.name} answered but failed validation")
+                        fallback = fallback or result
+
+                if not running and fallback is None and launch() is not None:
+                    can_hedge = True  # Plain failover to the next provider; it may be hedged too
+        finally:
+            for task, (provider, breaker, _) in running.items():
+                task.cancel()
+                breaker.release_probe()
+
+        if fallback is not None:
+            return fallback  # Let the graph's validation + retry loop handle it
+        raise self._exhausted(errors)
+
+    @staticmethod
+    def _record_win(winner: str, raced: list[str]) -> None:
+        if winner in raced:
+            for name in raced:
+                _race_stats[name]["races"] += 1
+            _race_stats[winner]["wins"] += 1
+
+    # ── Internals ─────────────────────────────────────────────────────────
+    def _available(self) -> Iterator[tuple[LLMProvider, CircuitBreaker]]:
+        """Yield (provider, breaker) for each provider whose breaker admits a call, lazily."""
+        for provider in self.providers:
+            breaker = get_breaker(provider.name)
+            if breaker.allow_request():
+                yield provider, breaker
+            else:
+                logger.info(f"[LLMFailover] Skipping {provider.name} — circuit open")
+
+    @staticmethod
+    def _record_failure(
+        provider: LLMProvider,
+        breaker: CircuitBreaker,
+        exc: Exception,
+        timing: _CallTiming,
+        errors: list[str],
+    ) -> None:
+        elapsed = timing.service_s()
+        if _is_transient(exc):
+            breaker.record_failure(elapsed)
+        else:
+            breaker.release_probe()  # Our request or our queue, not the provider's health
+        errors.append(f"{provider.name}: {exc}")
+        if _is_client_error(exc):
+            logger.warning(
+                f"[LLMFailover] {provider.name} rejected the request after {elapsed * 1000:.0f}ms — "
+                f"not failing over: {exc}"
             )
-            response.raise_for_status()
+            return
+        logger.warning(
+            f"[LLMFailover] {provider.name} failed after {elapsed * 1000:.0f}ms — "
+            f"trying next provider: {exc}"
+        )
 
-        elapsed = (time.perf_counter() - start) * 1000
-        logger.info(f"[Ollama] Response in {elapsed:.0f}ms | model={self.model}")
+    def _exhausted(self, errors: list[str]) -> RuntimeError:
+        if not errors:
+            return RuntimeError(
+                "All LLM providers are temporarily unavailable (circuit breakers open). "
+                "Please retry shortly."
+            )
+        return RuntimeError(f"All LLM providers failed: {'; '.join(errors)}")
+
+
+def _is_transient(exc: BaseException) -> bool:
+    """
+    Errors that say the provider is unhealthy and count on its breaker:
+    timeouts, connection errors, 5xx, and 429s / 408s left after the
+    rate limiter's retries.
+    """
+    if isinstance(exc, httpx.HTTPStatusError):
+        status = exc.response.status_code
+        return status >= 500 or status in (408, 429)
+    return isinstance(exc, (httpx.TransportError, asyncio.TimeoutError, ConnectionError))
+
+
+def _is_client_error(exc: BaseException) -> bool:
+    """
+    Any other 4xx (bad request, bad key, unknown model, prompt too long). It is
+    raised to the caller as it is: the same request would fail on the next
+    provider too, or the configuration needs fixing.
+    """
+    return isinstance(exc, httpx.HTTPStatusError) and 400 <= exc.response.status_code < 500 and not _is_transient(exc)
+
+
+# ---------------------------------------------------------------------------
+# Latency tracking + hedging statistics (per process)
+# ---------------------------------------------------------------------------
+_latencies:   dict[str, deque] = defaultdict(lambda: deque(maxlen=_LATENCY_WINDOW))
+_queue_waits: dict[str, deque] = defaultdict(lambda: deque(maxlen=_LATENCY_WINDOW))
+_race_stats:  dict[str, Counter] = defaultdict(Counter)
+_hedge_stats: Counter = Counter()
+
+
+class _CallTiming:
+    """
+    Where the time of one provider call went. The failover wrapper creates
+    one per call and binds it to _call_timing; the provider stamps it each
+    time the rate limiter admits the request (_record_queue_wait).
+    """
+
+    __slots__ = ("started", "admitted", "queue_wait_s")
+
+    def __init__(self):
+        self.started  = time.perf_counter()
+        self.admitted: Optional[float] = None   # Last admission (after any Retry-After pause)
+        self.queue_wait_s = 0.0                 # Limiter queue + Retry-After waits, all attempts
+
+    def service_s(self) -> float:
+        """Seconds since the provider last admitted the request — the provider's own latency."""
+        return time.perf_counter() - (self.admitted if self.admitted is not None else self.started)
+
+
+_call_timing: contextvars.ContextVar[Optional[_CallTiming]] = contextvars.ContextVar(
+    "t2t_llm_call_timing", default=None
+)
+
+
+def _record_success(provider: LLMProvider, breaker: CircuitBreaker, timing: _CallTiming) -> None:
+    """Breaker slow-call check and hedge delays use service time; queueing is kept apart."""
+    latency_s = timing.service_s()
+    breaker.record_success(latency_s)
+    _latencies[provider.name].append(latency_s)
+    _queue_waits[provider.name].append(timing.queue_wait_s)
 
-        data = response.json()
-        sql  = data["message"]["content"].strip()
-        return _clean_llm_output(sql), self.name
+
+def _hedge_delay(provider_name: str) -> float:
+    """LLM_HEDGE_PERCENTILE of the provider's recent latency, or the default until enough samples."""
+    samples = sorted(_latencies.get(provider_name, ()))
+    if len(samples) < LLM_HEDGE_MIN_SAMPLES:
+        return LLM_HEDGE_DEFAULT_DELAY_S
+    index = min(int(len(samples) * LLM_HEDGE_PERCENTILE), len(samples) - 1)
+    return max(samples[index], _HEDGE_MIN_DELAY_S)
+
+
+def _is_usable(output: str, db_dialect: Optional[str] = None) -> bool:
+    """
+    Would this completion pass the validator for the request's dialect?
+    RBAC is ignored — it is the same for every provider.
+    """
+    result, _ = validate_sql(output, user_role="admin", db_dialect=db_dialect or "mysql")
+    return result["is_valid"]
+
+
+def get_hedging_stats() -> dict[str, Any]:
+    """
+    Hedging counters for GET /health.
+
+    Returns:
+        { "enabled": False, "calls": 120, "hedges_fired": 7,
+          "providers": { "groq/...": { "races": 7, "wins": 5, "win_rate": 0.71,
+                                       "hedge_delay_s": 2.4, "avg_queue_wait_s": 0.3 }, ... } }
+    """
+    providers = {}
+    for name in set(_race_stats) | set(_latencies):
+        races = _race_stats[name]["races"] if name in _race_stats else 0
+        wins  = _race_stats[name]["wins"] if name in _race_stats else 0
+        waits = _queue_waits.get(name, ())
+        providers[name] = {
+            "races":            races,
+            "wins":             wins,
+            "win_rate":         round(wins / races, 2) if races else None,
+            "hedge_delay_s":    round(_hedge_delay(name), 2),
+            "avg_queue_wait_s": round(sum(waits) / len(waits), 2) if waits else None,
+        }
+    return {
+        "enabled":      LLM_HEDGING_ENABLED,
+        "calls":        _hedge_stats["calls"],
+        "hedges_fired": _hedge_stats["hedges_fired"],
+        "providers":    providers,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Prompt caching — cache breakpoints + reported usage (per process)
+# ---------------------------------------------------------------------------
+_usage_stats: dict[str, Counter] = defaultdict(Counter)
+
+
+def _with_cache_breakpoints(messages: list[dict]) -> list[dict]:
+    """
+    Split the system message into its cache layers (static rules, schema,
+    docs) and mark the end of every layer but the last with an ephemeral
+    cache_control breakpoint. OpenRouter forwards these to providers with
+    explicit caching and ignores them elsewhere.
+    """
+    if not LLM_PROMPT_CACHE_HINTS or not messages or messages[0]["role"] != "system":
+        return messages
+    segments = cache_segments(messages[0]["content"])
+    if len(segments) < 2:
+        return messages
+    content = [
+        {"type": "text", "text": segment, **({"cache_control": {"type": "ephemeral"}} if i < len(segments) - 1 else {})}
+        for i, segment in enumerate(segments)
+    ]
+    return [{"role": "system", "content": content}, *messages[1:]]
+
+
+def _record_queue_wait(queued: float) -> float:
+    """
+    Time spent waiting for the rate limiter, on the current llm.call span and
+    the failover wrapper's _CallTiming. Returns the admission time — latency
+    is measured from there, so queueing never looks like a slow provider.
+    """
+    admitted = time.perf_counter()
+    current_span().add_attribute("llm.queue_wait_ms", round((admitted - queued) * 1000, 1))
+    timing = _call_timing.get()
+    if timing is not None:
+        timing.admitted      = admitted
+        timing.queue_wait_s += admitted - queued
+    return admitted
+
+
+def _record_usage(provider_name: str, usage: Optional[LLMUsage]) -> None:
+    stats = _usage_stats[provider_name]
+    stats["calls"] += 1
+    if usage is None:
+        stats["calls_without_usage"] += 1  # e.g. a stream closed early, before the usage event
+        return
+    stats["prompt_tokens"]     += usage["prompt_tokens"]
+    stats["cached_tokens"]     += usage["cached_tokens"]
+    stats["completion_tokens"] += usage["completion_tokens"]
+    if usage["cached_tokens"]:
+        stats["calls_with_cache_hit"] += 1
+
+
+def get_llm_usage_stats() -> dict[str, Any]:
+    """
+    Per-provider token usage for GET /health.
+
+    Returns:
+        { "groq/...": { "calls": 40, "prompt_tokens": 91000, "cached_tokens": 52000,
+                        "cached_ratio": 0.57, "completion_tokens": 2100,
+                        "calls_with_cache_hit": 31, "calls_without_usage": 0 }, ... }
+    """
+    result = {}
+    for name, stats in list(_usage_stats.items()):
+        prompt = stats["prompt_tokens"]
+        result[name] = {
+            "calls":                stats["calls"],
+            "prompt_tokens":        prompt,
+            "cached_tokens":        stats["cached_tokens"],
+            "cached_ratio":         round(stats["cached_tokens"] / prompt, 3) if prompt else None,
+            "completion_tokens":    stats["completion_tokens"],
+            "calls_with_cache_hit": stats["calls_with_cache_hit"],
+            "calls_without_usage":  stats["calls_without_usage"],
+        }
+    return result
+
+
+# ---------------------------------------------------------------------------
+# Shared async HTTP clients — keep-alive pools reused across requests
+# ---------------------------------------------------------------------------
+
+# client_key → (event loop the client belongs to, client)
+_async_clients: dict[str, tuple[asyncio.AbstractEventLoop, httpx.AsyncClient]] = {}
+
+
+def get_async_client(client_key: str, timeout_s: float = REQUEST_TIMEOUT_S) -> httpx.AsyncClient:
+    """
+    Return the shared AsyncClient for a provider, creating it on first use.
+    Pooled connections belong to one event loop, so a client created on a
+    different (e.g. already closed) loop is replaced.
+    """
+    loop  = asyncio.get_running_loop()
+    entry = _async_clients.get(client_key)
+    if entry is not None and entry[0] is loop and not entry[1].is_closed:
+        return entry[1]
+
+    client = httpx.AsyncClient(
+        timeout = timeout_s,
+        http2   = LLM_HTTP2_ENABLED,
+        limits  = httpx.Limits(
+            max_connections           = LLM_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections = LLM_HTTP_MAX_KEEPALIVE,
+            keepalive_expiry          = LLM_HTTP_KEEPALIVE_EXPIRY_S,
+        ),
+    )
+    _async_clients[client_key] = (loop, client)
+    logger.info(f"[LLMFactory] Created shared HTTP client for '{client_key}' | http2={LLM_HTTP2_ENABLED}")
+    return client
+
+
+async def aclose_llm_clients() -> int:
+    """
+    Close every shared AsyncClient. Called from main.lifespan on shutdown.
+
+    Returns:
+        Number of clients closed.
+    """
+    loop  = asyncio.get_running_loop()
+    items = list(_async_clients.values())
+    _async_clients.clear()
+    closed = 0
+    for client_loop, client in items:
+        if client_loop is loop and not client.is_closed:
+            await client.aclose()
+            closed += 1
+    return closed
 
 
 # ---------------------------------------------------------------------------
@@ -321,6 +1166,9 @@ _PROVIDER_MAP: dict[str, type[LLMProvider]] = {
     "ollama":     OllamaProvider,
 }
 
+# Offline providers — only used when LLM_PROVIDER names them explicitly
+_OFFLINE_PROVIDERS = ("mock", "cassette")
+
 
 def get_llm_provider(preferred: Optional[str] = None) -> LLMProvider:
     """
@@ -329,14 +1177,29 @@ def get_llm_provider(preferred: Optional[str] = None) -> LLMProvider:
     Priority order: openrouter → groq → gemini → ollama
     Override with LLM_PROVIDER env var or the `preferred` argument.
 
+    With LLM_FAILOVER enabled (default) and more than one provider
+    configured, the result is a FailoverLLMProvider that also falls through
+    the chain at call time when a provider errors or its breaker is open.
+
+    LLM_PROVIDER=mock or cassette selects an offline provider
+    (offline_providers.py) instead; those are never part of the fallback chain.
+
     Returns:
-        An instantiated LLMProvider ready to call .generate_sql()
+        An instantiated LLMProvider ready to call .agenerate_sql() / .generate_sql()
 
     Raises:
         RuntimeError if no provider can be instantiated.
     """
     env_pref = preferred or os.environ.get("LLM_PROVIDER", "").lower().strip()
 
+    if env_pref in _OFFLINE_PROVIDERS:
+        from .offline_providers import get_offline_provider
+        return get_offline_provider(env_pref)
+    return build_live_provider(env_pref)
+
+
+def build_live_provider(env_pref: str = "") -> LLMProvider:
+    """The online provider chain of get_llm_provider(), starting with env_pref if it names one."""
     # If explicitly set, try that one first then fall through priority chain
     priority = (
         [env_pref] + [p for p in _PROVIDER_PRIORITY if p != env_pref]
@@ -344,25 +1207,32 @@ def get_llm_provider(preferred: Optional[str] = None) -> LLMProvider:
         else _PROVIDER_PRIORITY
     )
 
+    instances:  list[LLMProvider] = []
     last_error: Optional[Exception] = None
     for provider_key in priority:
         cls = _PROVIDER_MAP.get(provider_key)
         if cls is None:
             continue
         try:
-            instance = cls()
-            logger.info(f"[LLMFactory] Using provider: {provider_key}")
-            return instance
+            instances.append(cls())
         except (ValueError, Exception) as exc:
-            logger.warning(f"[LLMFactory] Provider '{provider_key}' unavailable: {exc}")
+            # Only providers ahead of the one in use are worth a warning
+            log = logger.warning if not instances else logger.debug
+            log(f"[LLMFactory] Provider '{provider_key}' unavailable: {exc}")
             last_error = exc
             continue
-
-    raise RuntimeError(
-        f"No LLM provider could be instantiated. "
-        f"Set at least one of: OPENROUTER_API_KEY, GROQ_API_KEY, GEMINI_API_KEY, or OLLAMA_BASE_URL. "
-        f"Last error: {last_error}"
-    )
+        if len(instances) == 1:
+            logger.info(f"[LLMFactory] Using provider: {provider_key}")
+        if not LLM_FAILOVER_ENABLED:
+            break
+
+    if not instances:
+        raise RuntimeError(
+            f"No LLM provider could be instantiated. "
+            f"Set at least one of: OPENROUTER_API_KEY, GROQ_API_KEY, GEMINI_API_KEY, or OLLAMA_BASE_URL. "
+            f"Last error: {last_error}"
+        )
+    return instances[0] if len(instances) == 1 else FailoverLLMProvider(instances)
 
 
 # ---------------------------------------------------------------------------
@@ -423,6 +1293,175 @@ def _build_gemini_contents(
     return contents
 
 
+# ---------------------------------------------------------------------------
+# Streaming helpers
+# ---------------------------------------------------------------------------
+_STREAM_DONE = object()   # Sentinel for the OpenAI "data: [DONE]" event
+
+
+def _decode_stream_line(line: str, stream_format: str) -> Any:
+    """One stream line → decoded JSON dict, _STREAM_DONE, or None for keep-alives / comments."""
+    line = line.strip()
+    if stream_format == "sse":
+        if not line.startswith("data:"):
+            return None  # "event:", ": keep-alive" and blank separator lines
+        line = line[len("data:"):].strip()
+        if line == "[DONE]":
+            return _STREAM_DONE
+    if not line:
+        return None
+    try:
+        data = json.loads(line)
+    except json.JSONDecodeError:
+        logger.debug(f"[LLMStream] Skipping undecodable stream line: {line[:80]!r}")
+        return None
+    return data
+
+
+def _emit(on_progress: Optional[ProgressCallback], event: dict[str, Any]) -> None:
+    """Deliver a progress event; a failing callback must never break generation."""
+    if on_progress is None:
+        return
+    try:
+        on_progress(event)
+    except Exception as exc:
+        logger.debug(f"[LLMStream] Progress callback failed: {exc}")
+
+
+class _StreamAssembler:
+    """
+    Accumulates streamed completion text and watches it as it grows:
+
+      - directive : "CLARIFY" / "WRITE_OP" / "SQL" once the first
+                    characters after any opening code fence decide it
+      - complete  : the SQL statement has ended — a `;` outside quotes and
+                    comments, or the ``` fence closing the one that opened
+                    the statement. CLARIFY questions are plain text and
+                    always run to the end of the stream.
+
+    A body that does not open with a SQL keyword is prose ("Here is the
+    query:"); it is only searched for an opening fence, and the statement
+    starts after that fence's line. Prose with no fence is never cut short.
+    """
+
+    _DIRECTIVES = (("CLARIFY", "CLARIFY:"), ("WRITE_OP", "WRITE_OP:"))
+    _STATEMENT_WORDS = frozenset((
+        "SELECT WITH INSERT UPDATE DELETE MERGE REPLACE DROP TRUNCATE CREATE ALTER "
+        "EXEC EXECUTE CALL SHOW DESCRIBE PRAGMA VALUES"
+    ).split())
+    _FIRST_WORD = re.compile(r"[A-Za-z_]+")
+
+    def __init__(self):
+        self.text      = ""
+        self.directive: Optional[str] = None
+        self.complete  = False
+        self._body_at: Optional[int] = None   # Index where the statement text starts
+        self._pos      = 0                    # Scan position inside self.text
+        self._quote:   Optional[str] = None   # Open quote character, if any
+        self._comment: Optional[str] = None   # "--" or "/*" while inside a comment
+        self._fenced   = False                # An opening ``` fence has been consumed
+        self._prose:   Optional[bool] = None  # Body is prose before a fence (None: undecided)
+
+    def feed(self, delta: str) -> bool:
+        """Append a delta; True once the statement is complete (text is trimmed after it)."""
+        if self.complete:
+            return True
+        self.text += delta
+        if self.directive is None:
+            self._detect_directive()
+        if self.directive in ("SQL", "WRITE_OP"):
+            self._scan()
+        return self.complete
+
+    def _detect_directive(self) -> None:
+        head = self.text.lstrip()
+        offset = len(self.text) - len(head)
+        if head.startswith("```"):
+            newline = head.find("\n")
+            if newline == -1:
+                return  # Still inside the opening fence line
+            offset += newline + 1
+            head = head[newline + 1:]
+            self._fenced = True
+        stripped = head.lstrip()
+        offset  += len(head) - len(stripped)
+        upper    = stripped.upper()
+        for name, prefix in self._DIRECTIVES:
+            if upper.startswith(prefix):
+                self.directive = name
+                self._body_at  = offset + len(prefix)
+                return
+            if prefix.startswith(upper):
+                return  # Could still become this directive
+        self.directive = "SQL"
+        self._body_at  = offset
+
+    def _scan(self) -> None:
+        text = self.text
+        pos  = max(self._pos, self._body_at or 0)
+        while pos < len(text):
+            char = text[pos]
+            if self._prose is None:
+                if char.isspace():
+                    pos += 1
+                    continue
+                if self._fenced or char == "(":
+                    self._prose = False
+                elif char == "`":
+                    self._prose = True   # Opening fence after the directive
+                else:
+                    word = self._FIRST_WORD.match(text, pos)
+                    if word is not None and word.end() == len(text):
+                        break  # First word not complete yet
+                    self._prose = word is None or word.group(0).upper() not in self._STATEMENT_WORDS
+            if self._comment == "--":
+                if char == "\n":
+                    self._comment = None
+            elif self._comment == "/*":
+                if text.startswith("*/", pos):
+                    self._comment = None
+                    pos += 1
+                elif char == "*" and pos + 1 == len(text):
+                    break  # Might be the start of "*/"
+            elif self._quote is not None:
+                if char == self._quote:
+                    self._quote = None
+            elif char in "-/`" and pos + (3 if char == "`" else 2) > len(text):
+                break  # Need the next character(s) to tell a comment / fence from an operator
+            elif text.startswith("```", pos):
+                if self._fenced or not self._prose:
+                    if self._finish_at(pos, include=False):
+                        return
+                    pos += 2
+                else:
+                    newline = text.find("\n", pos)
+                    if newline == -1:
+                        break  # Still inside the opening fence line
+                    self._fenced   = True
+                    self._prose    = None
+                    self._body_at  = newline + 1
+                    pos = newline
+            elif self._prose:
+                pass  # Prose before a fence — quotes, comments and `;` mean nothing here
+            elif text.startswith("--", pos) or text.startswith("/*", pos):
+                self._comment = text[pos:pos + 2]
+                pos += 1
+            elif char in "'\"`":
+                self._quote = char
+            elif char == ";":
+                if self._finish_at(pos, include=True):
+                    return
+            pos += 1
+        self._pos = pos
+
+    def _finish_at(self, pos: int, include: bool) -> bool:
+        if not self.text[self._body_at:pos].strip():
+            return False  # Nothing before it — not the end of a statement
+        self.text     = self.text[:pos + 1] if include else self.text[:pos]
+        self.complete = True
+        return True
+
+
 def _clean_llm_output(raw: str) -> str:
     """
     Strip common LLM formatting artifacts from SQL output.
@@ -0,0 +1,331 @@
+"""
+Talk2Tables — Offline LLM Providers (mock + record/replay)
+==========================================================
+Two LLMProvider implementations that need no network, so run_agent() can be
+exercised end-to-end, benchmarked and regression-tested in air-gapped CI.
+Selected only explicitly through LLM_PROVIDER — they are never part of the
+openrouter → groq → gemini → ollama fallback chain.
+
+  - LLM_PROVIDER=mock     : MockLLMProvider — deterministic, rule-based SQL
+                            built from the schema in the system prompt, with
+                            configurable latency (MOCK_LLM_LATENCY_MS, plus a
+                            prompt-derived, reproducible MOCK_LLM_JITTER_MS).
+  - LLM_PROVIDER=cassette : CassetteLLMProvider — replays completions recorded
+                            from the live providers, keyed by a SHA-256 of the
+                            exact prompt (system prompt + history + question).
+                            LLM_CASSETTE_MODE = replay (miss → error) | record
+                            (always call live, overwrite) | auto (replay, record
+                            misses). Cassettes are JSONL files (LLM_CASSETTE_PATH).
+
+Prompt budgeting must be identical when recording and replaying, so the
+cassette provider always reports the same context window
+(LLM_CONTEXT_TOKENS, else 32k) whatever the upstream provider is.
+
+Author  : Member 1 (Backend Lead)
+Project : Talk2Tables — Diploma Final Year Project
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from typing import Any, Optional
+
+from .llm_provider import (
+    LLMProvider, LLMUsage, ProgressCallback, _emit, _record_usage, build_live_provider,
+)
+from .schema_index import tokenize
+from .token_budget import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------------
+MOCK_LLM_LATENCY_MS = int(os.environ.get("MOCK_LLM_LATENCY_MS", "0"))
+MOCK_LLM_JITTER_MS  = int(os.environ.get("MOCK_LLM_JITTER_MS", "0"))
+
+LLM_CASSETTE_PATH            = os.environ.get("LLM_CASSETTE_PATH", "llm_cassette.jsonl")
+LLM_CASSETTE_MODE            = os.environ.get("LLM_CASSETTE_MODE", "replay").lower()
+LLM_CASSETTE_UPSTREAM        = os.environ.get("LLM_CASSETTE_UPSTREAM", "").lower().strip()
+LLM_CASSETTE_REPLAY_LATENCY  = os.environ.get("LLM_CASSETTE_REPLAY_LATENCY", "false").lower() == "true"
+
+_TABLE_LINE   = re.compile(r"^TABLE: (\S+)", re.MULTILINE)
+_DIALECT_LINE = re.compile(r"^Dialect : (\w+)", re.MULTILINE)
+_RETRY_QUERY  = re.compile(r"^Original query: (.+)$", re.MULTILINE)
+_NUMBER       = re.compile(r"\b\d+\b")
+
+_COUNT_CUES  = ("how many", "count", "number of", "total number")
+_DELETE_CUES = ("delete", "remove")
+_UPDATE_CUES = ("update", "mark ", "set ", "change ")
+
+
+# ---------------------------------------------------------------------------
+# Mock provider — deterministic rule-based SQL
+# ---------------------------------------------------------------------------
+class MockLLMProvider(LLMProvider):
+    """
+    Deterministic stand-in for an LLM. Reads the tables from the system
+    prompt, picks the one whose name / columns best match the question and
+    answers with:
+      - "how many …"      → SELECT COUNT(*)
+      - "delete / remove" → WRITE_OP: DELETE … WHERE <pk> = <number in question>
+      - "update / mark"   → WRITE_OP: UPDATE … WHERE <pk> = <number in question>
+      - anything else     → SELECT <matched columns or *> … LIMIT 1000
+      - no table matches  → CLARIFY: asking which table to use
+    The same prompt always yields the same output and the same latency.
+    """
+
+    model = "mock"
+
+    @property
+    def name(self) -> str:
+        return "mock/rule-based"
+
+    def generate_sql(
+        self,
+        system_prompt: str,
+        user_query: str,
+        chat_history: list[dict],
+    ) -> tuple[str, str]:
+        time.sleep(self._latency_s(system_prompt, user_query))
+        return self._answer(system_prompt, user_query), self.name
+
+    async def agenerate_sql(
+        self,
+        system_prompt: str,
+        user_query: str,
+        chat_history: list[dict],
+        on_progress: Optional[ProgressCallback] = None,
+        db_dialect: Optional[str] = None,
+    ) -> tuple[str, str]:
+        _emit(on_progress, {"event": "llm_started", "provider": self.name})
+        await asyncio.sleep(self._latency_s(system_prompt, user_query))
+        output = self._answer(system_prompt, user_query)
+        _emit(on_progress, {"event": "llm_token", "provider": self.name, "text": output, "chars": len(output)})
+        _emit(on_progress, {"event": "llm_complete", "provider": self.name, "chars": len(output), "stopped_early": False})
+        return output, self.name
+
+    # ── Internals ─────────────────────────────────────────────────────────
+    @staticmethod
+    def _latency_s(system_prompt: str, user_query: str) -> float:
+        jitter = 0
+        if MOCK_LLM_JITTER_MS > 0:
+            digest = hashlib.sha256(f"{system_prompt}\x1f{user_query}".encode("utf-8")).digest()
+            jitter = int.from_bytes(digest[:4], "little") % (MOCK_LLM_JITTER_MS + 1)
+        return (MOCK_LLM_LATENCY_MS + jitter) / 1000
+
+    def _answer(self, system_prompt: str, user_query: str) -> str:
+        retry    = _RETRY_QUERY.search(user_query)
+        question = (retry.group(1) if retry else user_query).strip()
+        lowered  = question.lower()
+        dialect  = (_DIALECT_LINE.search(system_prompt) or [None, "MYSQL"])[1].lower()
+        tables   = _parse_tables(system_prompt)
+
+        table = _best_table(question, tables)
+        _record_usage(self.name, LLMUsage(
+            prompt_tokens     = estimate_tokens(system_prompt) + estimate_tokens(user_query),
+            cached_tokens     = 0,
+            completion_tokens = 0,
+        ))
+        if table is None:
+            listing = ", ".join(list(tables)[:8]) or "none found"
+            return f"CLARIFY: Which table should I look at? Available tables: {listing}"
+
+        columns, pk = tables[table]
+        key    = pk or (columns[0] if columns else "id")
+        number = (_NUMBER.search(question) or [None])[0] or "0"
+
+        if any(cue in lowered for cue in _DELETE_CUES):
+            return f"WRITE_OP: DELETE FROM {table} WHERE {key} = {number}"
+        if any(cue in lowered for cue in _UPDATE_CUES):
+            target = next((c for c in columns if c != key), key)
+            return f"WRITE_OP: UPDATE {table} SET {target} = {target} WHERE {key} = {number}"
+        if any(cue in lowered for cue in _COUNT_CUES):
+            return f"SELECT COUNT(*) AS total FROM {table}"
+
+        wanted   = set(tokenize(question)) - set(tokenize(table))
+        selected = [c for c in columns if set(tokenize(c)) & wanted]
+        return _limit(f"{', '.join(selected) or '*'} FROM {table}", dialect)
+
+
+def _parse_tables(system_prompt: str) -> dict[str, tuple[list[str], Optional[str]]]:
+    """{ table: ([columns], primary key) } from the TABLE: blocks of the rendered schema."""
+    tables: dict[str, tuple[list[str], Optional[str]]] = {}
+    matches = list(_TABLE_LINE.finditer(system_prompt))
+    for i, match in enumerate(matches):
+        end   = matches[i + 1].start() if i + 1 < len(matches) else len(system_prompt)
+        block = system_prompt[match.end():end]
+        columns, pk = [], None
+        for line in block.splitlines():
+            if not line.startswith("  - "):
+                continue
+            fields = line[4:].split()
+            columns.append(fields[0])
+            if pk is None and "PK" in fields[1:]:
+                pk = fields[0]
+        tables[match.group(1)] = (columns, pk)
+    return tables
+
+
+def _best_table(question: str, tables: dict[str, tuple[list[str], Optional[str]]]) -> Optional[str]:
+    """Table with the most question tokens in its name (×3) and columns; catalog order breaks ties."""
+    wanted = set(tokenize(question))
+    best, best_score = None, 0
+    for table, (columns, _) in tables.items():
+        score = 3 * len(wanted & set(tokenize(table))) + len(wanted & {t for c in columns for t in tokenize(c)})
+        if score > best_score:
+            best, best_score = table, score
+    return best
+
+
+def _limit(select_body: str, dialect: str) -> str:
+    if dialect == "mssql":
+        return f"SELECT TOP 1000 {select_body}"
+    if dialect == "oracle":
+        return f"SELECT {select_body} FETCH FIRST 1000 ROWS ONLY"
+    return f"SELECT {select_body} LIMIT 1000"
+
+
+# ---------------------------------------------------------------------------
+# Cassette provider — record live completions, replay them offline
+# ---------------------------------------------------------------------------
+class CassetteLLMProvider(LLMProvider):
+    """Replays recorded completions keyed by prompt hash; records through the live chain."""
+
+    model                  = "cassette"
+    default_context_tokens = 32_768   # Fixed, so record and replay budget prompts identically
+
+    def __init__(self, path: str = LLM_CASSETTE_PATH, mode: str = LLM_CASSETTE_MODE):
+        if mode not in ("replay", "record", "auto"):
+            raise ValueError(f"LLM_CASSETTE_MODE must be replay, record or auto (got {mode!r}).")
+        self.path  = path
+        self.mode  = mode
+        self._lock = threading.Lock()
+        self._upstream: Optional[LLMProvider] = None
+        self._records: dict[str, dict[str, Any]] = self._load()
+        logger.info(f"[Cassette] {len(self._records)} recorded completion(s) from {path} | mode={mode}")
+
+    @property
+    def name(self) -> str:
+        return "cassette"
+
+    def generate_sql(
+        self,
+        system_prompt: str,
+        user_query: str,
+        chat_history: list[dict],
+    ) -> tuple[str, str]:
+        key    = prompt_key(system_prompt, user_query, chat_history)
+        record = self._lookup(key)
+        if record is not None:
+            if LLM_CASSETTE_REPLAY_LATENCY:
+                time.sleep(record.get("latency_ms", 0) / 1000)
+            return record["output"], f"cassette/{record['provider']}"
+
+        start = time.perf_counter()
+        output, provider_name = self._get_upstream().generate_sql(system_prompt, user_query, chat_history)
+        self._store(key, output, provider_name, start)
+        return output, provider_name
+
+    async def agenerate_sql(
+        self,
+        system_prompt: str,
+        user_query: str,
+        chat_history: list[dict],
+        on_progress: Optional[ProgressCallback] = None,
+        db_dialect: Optional[str] = None,
+    ) -> tuple[str, str]:
+        key    = prompt_key(system_prompt, user_query, chat_history)
+        record = self._lookup(key)
+        if record is not None:
+            if LLM_CASSETTE_REPLAY_LATENCY:
+                await asyncio.sleep(record.get("latency_ms", 0) / 1000)
+            return record["output"], f"cassette/{record['provider']}"
+
+        start = time.perf_counter()
+        output, provider_name = await self._get_upstream().agenerate_sql(
+            system_prompt, user_query, chat_history, on_progress, db_dialect
+        )
+        await asyncio.to_thread(self._store, key, output, provider_name, start)
+        return output, provider_name
+
+    # ── Internals ─────────────────────────────────────────────────────────
+    def _lookup(self, key: str) -> Optional[dict[str, Any]]:
+        if self.mode == "record":
+            return None
+        record = self._records.get(key)
+        if record is None and self.mode == "replay":
+            raise RuntimeError(
+                f"Cassette miss for prompt {key[:12]} in {self.path} — record it with "
+                f"LLM_CASSETTE_MODE=record or auto"
+            )
+        return record
+
+    def _get_upstream(self) -> LLMProvider:
+        if self._upstream is None:
+            self._upstream = build_live_provider(LLM_CASSETTE_UPSTREAM)
+        return self._upstream
+
+    def _store(self, key: str, output: str, provider_name: str, start: float) -> None:
+        record = {
+            "key":         key,
+            "provider":    provider_name,
+            "output":      output,
+            "latency_ms":  round((time.perf_counter() - start) * 1000),
+            "recorded_at": time.time(),
+        }
+        with self._lock:
+            self._records[key] = record
+            with open(self.path, "a", encoding="utf-8") as fh:
+                fh.write(json.dumps(record, ensure_ascii=False) + "\n")
+        logger.info(f"[Cassette] Recorded {key[:12]} from {provider_name}")
+
+    def _load(self) -> dict[str, dict[str, Any]]:
+        """Read the JSONL cassette; later lines win, so re-recording a prompt just appends."""
+        records: dict[str, dict[str, Any]] = {}
+        if not os.path.exists(self.path):
+            return records
+        with open(self.path, encoding="utf-8") as fh:
+            for line_no, line in enumerate(fh, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                    records[record["key"]] = record
+                except (json.JSONDecodeError, KeyError) as exc:
+                    logger.warning(f"[Cassette] Skipping bad line {line_no} in {self.path}: {exc}")
+        return records
+
+
+def prompt_key(system_prompt: str, user_query: str, chat_history: list[dict]) -> str:
+    """SHA-256 of exactly what a live provider would be sent."""
+    history = [
+        [turn.get("role", "user"), turn.get("content", "")]
+        for turn in chat_history if turn.get("content")
+    ]
+    payload = json.dumps([system_prompt, history, user_query], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# ---------------------------------------------------------------------------
+# Factory hook — called by llm_provider.get_llm_provider()
+# ---------------------------------------------------------------------------
+_instances: dict[str, LLMProvider] = {}
+_instances_lock = threading.Lock()
+
+
+def get_offline_provider(kind: str) -> LLMProvider:
+    """The process-wide mock or cassette provider (the cassette file is loaded once)."""
+    with _instances_lock:
+        provider = _instances.get(kind)
+        if provider is None:
+            provider = _instances[kind] = MockLLMProvider() if kind == "mock" else CassetteLLMProvider()
+            logger.info(f"[LLMFactory] Using offline provider: {provider.name}")
+        return provider
@@ -8,6 +8,11 @@ Dual-context injection:
   1. Live schema  — auto-introspected CREATE TABLE DDL via SQLAlchemy
   2. Doc context  — extracted text from user-uploaded PDF/Word/Excel docs
 
+Layout is ordered for provider prompt-prefix caching, most stable first:
+static rules (same for every request) → dialect + schema (same per
+connection) → doc excerpts (chosen per question). cache_segments() splits
+a built prompt at those boundaries for providers that take cache hints.
+
 Author  : Member 1 (Backend Lead)
 Project : Talk2Tables — Diploma Final Year Project
 """
@@ -20,7 +25,9 @@ from typing import Optional
 # Master System Prompt — Talk2Tables v2.0
 # ---------------------------------------------------------------------------
 
-_MASTER_SYSTEM_PROMPT = """\
+# Static part — identical for every connection and every question, so it
+# forms the cacheable prompt prefix. It must contain no placeholders.
+_STATIC_RULES = """\
 You are an expert SQL assistant embedded in Talk2Tables, an industrial database
 query system built for non-technical users (plant technicians, operations managers)
 in manufacturing and engineering environments.
@@ -28,23 +35,11 @@ in manufacturing and engineering environments.
 Your sole job: Convert the user's natural language query into a single, valid,
 executable SQL statement for the connected database.
 
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-DATABASE INFORMATION
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-Dialect : {db_dialect}
-
-LIVE SCHEMA (auto-introspected — always current):
-{schema_context}
-
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-ADDITIONAL CONTEXT FROM DOCUMENTATION
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-{doc_context}
-
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 STRICT RULES — FOLLOW EXACTLY
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-1.  Return ONLY valid {db_dialect} SQL — no explanation, no markdown, no code fences.
+1.  Return ONLY valid SQL in the dialect given under DATABASE INFORMATION —
+    no explanation, no markdown, no code fences.
 2.  Always use table aliases for multi-table queries (e.g. s for sensors).
 3.  Always add LIMIT 1000 to SELECT queries unless the user specifies a different limit.
 4.  Never generate DROP, TRUNCATE, CREATE, ALTER, or any DDL statements.
@@ -94,6 +89,27 @@ OUTPUT FORMAT EXAMPLES
    ```sql
    SELECT ...
    ```
+
+"""
+
+# Per-connection part — byte-stable while the schema does not change
+# (large schemas are pruned per question by render_schema_context)
+_CONNECTION_SECTION = """\
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+DATABASE INFORMATION
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+Dialect : {db_dialect}
+
+LIVE SCHEMA (auto-introspected — always current):
+{schema_context}
+
+"""
+
+# Per-question part — doc excerpts are selected for each question, so they go last
+_DOC_SECTION_HEADER = """\
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+ADDITIONAL CONTEXT FROM DOCUMENTATION
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 """
 
 # Placeholder when no schema docs have been uploaded
@@ -128,13 +144,33 @@ def build_system_prompt(
         else _NO_DOC_CONTEXT
     )
 
-    return _MASTER_SYSTEM_PROMPT.format(
-        db_dialect     = db_dialect.upper(),
-        schema_context = schema_context.strip(),
-        doc_context    = resolved_doc_context,
+    return (
+        _STATIC_RULES
+        + _CONNECTION_SECTION.format(
+            db_dialect     = db_dialect.upper(),
+            schema_context = schema_context.strip(),
+        )
+        + _DOC_SECTION_HEADER
+        + resolved_doc_context
+        + "\n"
     )
 
 
+def cache_segments(system_prompt: str) -> list[str]:
+    """
+    Split a prompt from build_system_prompt() into its cacheable layers:
+    [static rules, connection schema, per-question docs]. The segments join
+    back to the exact input; an unrecognised prompt is returned whole.
+    """
+    if not system_prompt.startswith(_STATIC_RULES):
+        return [system_prompt]
+    rest     = system_prompt[len(_STATIC_RULES):]
+    docs_at  = rest.rfind(_DOC_SECTION_HEADER)
+    if docs_at <= 0:
+        return [_STATIC_RULES, rest]
+    return [_STATIC_RULES, rest[:docs_at], rest[docs_at:]]
+
+
 def build_retry_user_message(
     original_query: str,
     failed_sql: str,
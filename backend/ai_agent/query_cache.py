@@ -0,0 +1,347 @@
+"""
+Talk2Tables — NL→SQL Query Cache
+=================================
+Cache of validated SQL, so that a question asked again (the same "sensors
+overdue for calibration" across every shift) skips the LLM round trip
+entirely. Two lookups, in order:
+
+  1. Exact    — the key below, built from the normalised question.
+  2. Semantic — for paraphrases ("overdue calibrations" / "which sensors need
+                calibrating"): cosine similarity between hashed character
+                n-gram vectors (NumPy, fully offline) of the new question and
+                every cached question in the same scope. Only cached
+                questions with exactly the same content words are candidates:
+                the words minus request filler ("show me all the"), compared
+                case-insensitively, with numbers and single letters kept and
+                "isn't" read as "not". The cosine only ranks those candidates
+                (and must reach QUERY_CACHE_SIMILARITY_THRESHOLD). N-grams
+                alone score "active"/"inactive" 0.96 and "day"/"night shift"
+                0.95. Quoted strings and IDs like S-201 must match too.
+                Every semantic reuse is written to the audit logger
+                "ai_agent.query_cache.audit".
+
+Key — SHA-256 over:
+  - the normalised question  (case-folded, whitespace collapsed, trailing
+                               punctuation dropped)
+  - the schema content_hash plus a hash of the doc context that went into
+    the prompt             (any schema or doc change yields a new key)
+  - the dialect and the user role
+  - a hash of the chat-history tail the LLM would see (the last
+    MAX_HISTORY_TURNS turns), so follow-up questions never collide with
+    the same words asked in a different conversation
+
+The semantic scope is the same minus the question and the doc context
+(doc chunks are selected per question): connection, schema content_hash,
+dialect, role and history tail.
+
+Entries are stored by graph.node_format_results only after the SQL passed
+validation AND executed successfully; a hit is re-validated by
+classify_and_validate before it runs. Eviction is LRU (QUERY_CACHE_MAX_ENTRIES)
+plus a TTL (QUERY_CACHE_TTL_S). Counters are shown on GET /health. Without
+NumPy installed only the exact lookup runs.
+
+Author  : Member 1 (Backend Lead)
+Project : Talk2Tables — Diploma Final Year Project
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from typing_extensions import TypedDict
+
+try:
+    import numpy as np
+    _NUMPY_AVAILABLE = True
+except ImportError:  # pragma: no cover - numpy ships with pandas, but keep exact-match working without it
+    np = None
+    _NUMPY_AVAILABLE = False
+
+logger       = logging.getLogger(__name__)
+audit_logger = logging.getLogger(f"{__name__}.audit")
+
+# ---------------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------------
+QUERY_CACHE_ENABLED     = os.environ.get("QUERY_CACHE_ENABLED", "true").lower() == "true"
+QUERY_CACHE_TTL_S       = int(os.environ.get("QUERY_CACHE_TTL_S", "3600"))
+QUERY_CACHE_MAX_ENTRIES = int(os.environ.get("QUERY_CACHE_MAX_ENTRIES", "1024"))
+
+QUERY_CACHE_SEMANTIC_ENABLED = (
+    os.environ.get("QUERY_CACHE_SEMANTIC", "true").lower() == "true" and _NUMPY_AVAILABLE
+)
+QUERY_CACHE_SIMILARITY_THRESHOLD = float(os.environ.get("QUERY_CACHE_SIMILARITY_THRESHOLD", "0.92"))
+
+_NGRAM_SIZES = (3, 4, 5)
+_NGRAM_DIM   = 1 << 12    # Hashed feature space per question vector
+
+_WHITESPACE     = re.compile(r"\s+")
+_TRAILING_PUNCT = re.compile(r"[\s?.!;,]+$")
+_WORD           = re.compile(r"\w+")
+# Request phrasing that carries no meaning for the SQL (negations are deliberately absent)
+_FILLER = frozenset((
+    "a an the me us please show list display give get find fetch tell what which who "
+    "are is do does there all of for can could you i want need to"
+).split())
+# Values the SQL depends on literally — paraphrases must agree on all of them
+_LITERAL        = re.compile(r"'[^']*'|\"[^\"]*\"|\b[\w-]*\d[\w-]*\b|\b[A-HJ-Z]\b")
+_NEGATED_CONTRACTION = re.compile(r"\b\w+n't\b")
+
+
+class CachedSQL(TypedDict):
+    sql:          str
+    llm_provider: str                # Provider that originally generated the SQL
+    stored_at:    float              # time.monotonic()
+    hits:         int
+    question:     str                # Normalised question the SQL was generated for
+    scope:        Optional[str]      # Semantic scope (None: exact lookups only)
+
+
+class _SemanticEntry(TypedDict):
+    vector:   Any                    # np.ndarray, L2-normalised float32
+    literals: frozenset[str]
+    words:    frozenset[str]             # _content_words() — must be identical for a reuse
+
+
+# ---------------------------------------------------------------------------
+# Key construction
+# ---------------------------------------------------------------------------
+
+def normalize_query(natural_language_query: str) -> str:
+    """Case-fold, collapse whitespace and drop trailing punctuation."""
+    text = _WHITESPACE.sub(" ", natural_language_query.casefold()).strip()
+    return _TRAILING_PUNCT.sub("", text)
+
+
+def make_cache_key(
+    natural_language_query: str,
+    schema_hash:            str,
+    doc_context:            Optional[str],
+    db_dialect:             str,
+    user_role:              str,
+    chat_history:           list[dict],
+) -> str:
+    """Build the cache key for one question in one schema / role / conversation context."""
+    max_turns = int(os.environ.get("MAX_HISTORY_TURNS", "6"))
+    tail = [
+        [turn.get("role", "user"), turn.get("content", "")]
+        for turn in chat_history[-(max_turns * 2):]
+        if turn.get("role", "user") in ("user", "assistant") and turn.get("content")
+    ]
+    parts = [
+        normalize_query(natural_language_query),
+        schema_hash,
+        hashlib.sha256((doc_context or "").encode("utf-8")).hexdigest(),
+        db_dialect,
+        user_role,
+        hashlib.sha256(json.dumps(tail, ensure_ascii=False).encode("utf-8")).hexdigest(),
+    ]
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+def make_scope_key(
+    connection_id: str,
+    schema_hash:   str,
+    db_dialect:    str,
+    user_role:     str,
+    chat_history:  list[dict],
+) -> str:
+    """Everything a paraphrase must share with a cached question, except the wording itself."""
+    return make_cache_key(
+        natural_language_query = f"scope:{connection_id}",
+        schema_hash            = schema_hash,
+        doc_context            = None,
+        db_dialect             = db_dialect,
+        user_role              = user_role,
+        chat_history           = chat_history,
+    )
+
+
+def _ngram_vector(question: str) -> Any:
+    """Hashed character 3–5-gram counts of each non-filler word, L2-normalised."""
+    vector = np.zeros(_NGRAM_DIM, dtype=np.float32)
+    for word in _WORD.findall(_NEGATED_CONTRACTION.sub("not", question)):
+        if word in _FILLER:
+            continue
+        padded = f" {word} "
+        for n in _NGRAM_SIZES:
+            for i in range(max(len(padded) - n + 1, 1)):
+                digest = hashlib.blake2b(padded[i:i + n].encode("utf-8"), digest_size=4).digest()
+                vector[int.from_bytes(digest, "little") % _NGRAM_DIM] += 1.0
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm else vector
+
+
+def _literals(natural_language_query: str) -> frozenset[str]:
+    return frozenset(match.casefold() for match in _LITERAL.findall(natural_language_query))
+
+
+def _content_words(question: str) -> frozenset[str]:
+    """
+    The words of a normalised question that can change its SQL: everything but
+    multi-letter filler. Single letters stay ("zone a" ≠ "zone b") and "isn't"
+    becomes "not".
+    """
+    words = _WORD.findall(_NEGATED_CONTRACTION.sub("not", question))
+    return frozenset(word for word in words if len(word) == 1 or word not in _FILLER)
+
+
+# ---------------------------------------------------------------------------
+# LRU + TTL store
+# ---------------------------------------------------------------------------
+_entries: "OrderedDict[str, CachedSQL]" = OrderedDict()
+_semantic: dict[str, dict[str, _SemanticEntry]] = {}   # scope → { exact key → vector }
+_lock  = threading.Lock()
+_stats = {
+    "hits": 0, "semantic_hits": 0, "misses": 0, "stores": 0,
+    "evictions": 0, "expired": 0, "invalidated": 0,
+}
+
+
+def get_cached_sql(key: str) -> Optional[CachedSQL]:
+    """Return the cached entry for key (and mark it recently used), or None."""
+    with _lock:
+        entry = _entries.get(key)
+        if entry is None:
+            _stats["misses"] += 1
+            return None
+        if time.monotonic() - entry["stored_at"] > QUERY_CACHE_TTL_S:
+            _remove(key)
+            _stats["expired"] += 1
+            _stats["misses"] += 1
+            return None
+        _entries.move_to_end(key)
+        entry["hits"] += 1
+        _stats["hits"] += 1
+        return CachedSQL(**entry)
+
+
+def find_similar_sql(
+    scope:                  str,
+    natural_language_query: str,
+    user_id:                str = "",
+) -> Optional[tuple[str, CachedSQL, float]]:
+    """
+    Semantic lookup after an exact miss.
+
+    Returns:
+        (matched key, entry, cosine score) for the most similar cached question
+        in scope with the same content words and literals, if it clears
+        QUERY_CACHE_SIMILARITY_THRESHOLD, else None.
+    """
+    if not QUERY_CACHE_SEMANTIC_ENABLED:
+        return None
+    question = normalize_query(natural_language_query)
+    vector   = _ngram_vector(question)
+    literals = _literals(natural_language_query)
+    words    = _content_words(question)
+
+    with _lock:
+        candidates = _semantic.get(scope)
+        if not candidates:
+            return None
+        now = time.monotonic()
+        for key in [k for k in candidates if now - _entries[k]["stored_at"] > QUERY_CACHE_TTL_S]:
+            _remove(key)
+            _stats["expired"] += 1
+        keys = [
+            k for k, item in candidates.items()
+            if item["words"] == words and item["literals"] == literals
+        ]
+        if not keys:
+            return None
+        scores = np.stack([candidates[k]["vector"] for k in keys]) @ vector
+        best   = int(np.argmax(scores))
+        score  = float(scores[best])
+        if score < QUERY_CACHE_SIMILARITY_THRESHOLD:
+            return None
+        key   = keys[best]
+        entry = _entries[key]
+        _entries.move_to_end(key)
+        entry["hits"] += 1
+        _stats["semantic_hits"] += 1
+        result = (key, CachedSQL(**entry), score)
+
+    audit_logger.info(
+        f"[QueryCacheAudit] Semantic reuse | user={user_id} | score={score:.3f} "
+        f"(threshold {QUERY_CACHE_SIMILARITY_THRESHOLD}) | asked={question!r} | "
+        f"matched={entry['question']!r} | sql={entry['sql'][:200]!r}"
+    )
+    return result
+
+
+def store_sql(
+    key:                    str,
+    sql:                    str,
+    llm_provider:           str,
+    natural_language_query: str = "",
+    scope:                  Optional[str] = None,
+) -> None:
+    """Cache SQL that validated and executed successfully; index it for paraphrases when scoped."""
+    question = normalize_query(natural_language_query)
+    semantic = None
+    if scope is not None and QUERY_CACHE_SEMANTIC_ENABLED and question:
+        semantic = _SemanticEntry(
+            vector   = _ngram_vector(question),
+            literals = _literals(natural_language_query),
+            words    = _content_words(question),
+        )
+    with _lock:
+        _remove(key)
+        _entries[key] = CachedSQL(
+            sql=sql, llm_provider=llm_provider, stored_at=time.monotonic(), hits=0,
+            question=question, scope=scope if semantic is not None else None,
+        )
+        if semantic is not None:
+            _semantic.setdefault(scope, {})[key] = semantic
+        _stats["stores"] += 1
+        while len(_entries) > max(QUERY_CACHE_MAX_ENTRIES, 1):
+            _remove(next(iter(_entries)))
+            _stats["evictions"] += 1
+
+
+def drop_cached_sql(key: str) -> None:
+    """Remove one entry — used when a cached SQL fails validation or execution."""
+    with _lock:
+        if _remove(key):
+            _stats["invalidated"] += 1
+
+
+def invalidate_query_cache() -> None:
+    """Drop every cached query."""
+    with _lock:
+        _entries.clear()
+        _semantic.clear()
+
+
+def _remove(key: str) -> bool:
+    """Drop an entry and its semantic vector. Call with _lock held."""
+    entry = _entries.pop(key, None)
+    if entry is None:
+        return False
+    scoped = _semantic.get(entry["scope"]) if entry["scope"] is not None else None
+    if scoped is not None:
+        scoped.pop(key, None)
+        if not scoped:
+            del _semantic[entry["scope"]]
+    return True
+
+
+def get_query_cache_stats() -> dict[str, Any]:
+    with _lock:
+        lookups = _stats["hits"] + _stats["misses"]
+        return {
+            **_stats,
+            "entries":   len(_entries),
+            "hit_rate":  round((_stats["hits"] + _stats["semantic_hits"]) / lookups, 3) if lookups else 0.0,
+            "semantic":  QUERY_CACHE_SEMANTIC_ENABLED,
+            "threshold": QUERY_CACHE_SIMILARITY_THRESHOLD,
+        }
@@ -0,0 +1,300 @@
+"""
+Talk2Tables — LLM Provider Rate Limiting + Request Queueing
+============================================================
+One limiter per HTTP LLM provider, used by HTTPLLMProvider (llm_provider.py)
+so that bursts of questions on the Groq / Gemini free tiers turn into short
+waits instead of 429 "AI provider error" replies.
+
+  - Concurrency : at most <PROVIDER>_MAX_CONCURRENCY calls in flight.
+  - Token bucket: <PROVIDER>_RPM requests per minute, bursts of up to
+                  LLM_RATE_LIMIT_BURST (0 RPM = no bucket, e.g. local Ollama).
+  - Queue       : callers wait in FIFO order for a slot and a token, for at
+                  most LLM_QUEUE_MAX_WAIT_S and with at most
+                  LLM_QUEUE_MAX_DEPTH waiting. A call that cannot be admitted
+                  in time raises LLMThrottled at once (so FailoverLLMProvider
+                  moves on to the next provider without tripping a breaker).
+  - Headers     : a 429 (or a 503 carrying Retry-After) pauses the provider
+                  for Retry-After seconds (LLM_RATE_LIMIT_BACKOFF_S when the
+                  header is missing) and the call is retried up to
+                  LLM_RATE_LIMIT_RETRIES times if that fits in the wait budget.
+                  x-ratelimit-remaining-requests = 0 pauses the provider until
+                  x-ratelimit-reset-requests, before the 429 happens.
+
+Limiters are shared by every request and event loop in the process;
+get_rate_limit_stats() (queue depth, throttling time, 429s) is shown on
+GET /health.
+
+Author  : Member 1 (Backend Lead)
+Project : Talk2Tables — Diploma Final Year Project
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import re
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from email.utils import parsedate_to_datetime
+from typing import Any, AsyncIterator, Iterator, Mapping, Optional
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------------
+LLM_RATE_LIMIT_ENABLED    = os.environ.get("LLM_RATE_LIMIT", "true").lower() == "true"
+LLM_RATE_LIMIT_BURST      = int(os.environ.get("LLM_RATE_LIMIT_BURST", "5"))
+LLM_RATE_LIMIT_RETRIES    = int(os.environ.get("LLM_RATE_LIMIT_RETRIES", "2"))
+LLM_RATE_LIMIT_BACKOFF_S  = float(os.environ.get("LLM_RATE_LIMIT_BACKOFF_S", "2"))
+LLM_QUEUE_MAX_WAIT_S      = float(os.environ.get("LLM_QUEUE_MAX_WAIT_S", "10"))
+LLM_QUEUE_MAX_DEPTH       = int(os.environ.get("LLM_QUEUE_MAX_DEPTH", "64"))
+
+# Free-tier defaults: (requests per minute, max concurrent calls); 0 RPM = unlimited
+_DEFAULT_LIMITS: dict[str, tuple[int, int]] = {
+    "openrouter": (20, 8),
+    "groq":       (30, 4),
+    "gemini":     (15, 4),
+    "ollama":     (0,  2),   # Local CPU inference — concurrency is the only limit
+}
+
+_POLL_S    = 0.05   # Re-check interval while waiting for a slot or the queue head
+_DURATION  = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_UNIT_S    = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+class LLMThrottled(RuntimeError):
+    """The call was not sent: the provider's queue is full or the wait budget ran out."""
+
+
+class ProviderLimiter:
+    """Token bucket + concurrency cap + FIFO wait queue for one provider."""
+
+    def __init__(self, name: str, rpm: int, max_concurrency: int):
+        self.name            = name
+        self.rpm             = rpm
+        self.max_concurrency = max(max_concurrency, 1)
+        self.capacity        = float(max(min(LLM_RATE_LIMIT_BURST, rpm), 1)) if rpm > 0 else 0.0
+        self.tokens          = self.capacity
+        self.refilled_at     = time.monotonic()
+        self.blocked_until   = 0.0   # Set from Retry-After / x-ratelimit-* headers
+        self.in_flight       = 0
+        self._queue: deque[object] = deque()
+        self._lock  = threading.Lock()
+        self._stats = {
+            "admitted": 0, "throttled": 0, "throttle_wait_s": 0.0, "rejected": 0,
+            "rate_limited": 0, "retried": 0, "max_queue_depth": 0,
+        }
+
+    # ── Admission ─────────────────────────────────────────────────────────
+    @asynccontextmanager
+    async def aslot(self, deadline: float) -> AsyncIterator[None]:
+        """Wait (without blocking the event loop) for a call slot; release it on exit."""
+        ticket, queued_at = self._enqueue()
+        try:
+            while True:
+                wait = self._try_admit(ticket, deadline)
+                if wait == 0:
+                    break
+                await asyncio.sleep(wait)
+        finally:
+            self._dequeue(ticket)
+        self._record_wait(queued_at)
+        try:
+            yield
+        finally:
+            self._release()
+
+    @contextmanager
+    def slot(self, deadline: float) -> Iterator[None]:
+        """Blocking variant of aslot() for the sync generate_sql() path."""
+        ticket, queued_at = self._enqueue()
+        try:
+            while True:
+                wait = self._try_admit(ticket, deadline)
+                if wait == 0:
+                    break
+                time.sleep(wait)
+        finally:
+            self._dequeue(ticket)
+        self._record_wait(queued_at)
+        try:
+            yield
+        finally:
+            self._release()
+
+    # ── Provider feedback ─────────────────────────────────────────────────
+    def observe(self, headers: Mapping[str, str]) -> None:
+        """Pause until the window resets when the provider says no requests are left in it."""
+        if headers.get("x-ratelimit-remaining-requests", "").strip() != "0":
+            return
+        reset = _parse_duration(headers.get("x-ratelimit-reset-requests", ""))
+        if reset:
+            self._block(reset, "request quota used up")
+
+    def penalize(self, headers: Mapping[str, str]) -> float:
+        """Record a 429; pause the provider for Retry-After. Returns the pause in seconds."""
+        delay = _parse_retry_after(headers.get("retry-after", ""))
+        if delay is None:
+            delay = _parse_duration(headers.get("x-ratelimit-reset-requests", "")) or LLM_RATE_LIMIT_BACKOFF_S
+        with self._lock:
+            self._stats["rate_limited"] += 1
+        self._block(delay, "rate limited by provider")
+        return delay
+
+    def record_retry(self) -> None:
+        with self._lock:
+            self._stats["retried"] += 1
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            throttled = self._stats["throttled"]
+            blocked   = max(self.blocked_until - time.monotonic(), 0.0)
+            return {
+                "provider":        self.name,
+                "rpm":             self.rpm or None,
+                "max_concurrency": self.max_concurrency,
+                "in_flight":       self.in_flight,
+                "queue_depth":     len(self._queue),
+                **self._stats,
+                "throttle_wait_s": round(self._stats["throttle_wait_s"], 2),
+                "avg_wait_ms":     round(self._stats["throttle_wait_s"] / throttled * 1000) if throttled else 0,
+                "blocked_for_s":   round(blocked, 1) if blocked else None,
+            }
+
+    # ── Internals ─────────────────────────────────────────────────────────
+    def _enqueue(self) -> tuple[object, float]:
+        ticket = object()
+        with self._lock:
+            if len(self._queue) >= LLM_QUEUE_MAX_DEPTH:
+                self._stats["rejected"] += 1
+                raise LLMThrottled(f"{self.name} request queue is full ({LLM_QUEUE_MAX_DEPTH} waiting)")
+            self._queue.append(ticket)
+            self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], len(self._queue))
+        return ticket, time.monotonic()
+
+    def _dequeue(self, ticket: object) -> None:
+        with self._lock:
+            try:
+                self._queue.remove(ticket)
+            except ValueError:
+                pass
+
+    def _try_admit(self, ticket: object, deadline: float) -> float:
+        """0 if the call may go now (slot and token taken); otherwise how long to wait before re-checking."""
+        with self._lock:
+            now = time.monotonic()
+            if self._queue[0] is not ticket or self.in_flight >= self.max_concurrency:
+                wait = _POLL_S
+            elif now < self.blocked_until:
+                wait = self.blocked_until - now
+            else:
+                wait = self._take_token(now)
+                if wait == 0:
+                    self.in_flight += 1
+                    self._stats["admitted"] += 1
+                    return 0
+            if now + wait > deadline:
+                self._stats["rejected"] += 1
+                raise LLMThrottled(
+                    f"{self.name} is rate limited — not admitted within {LLM_QUEUE_MAX_WAIT_S:.0f}s "
+                    f"({len(self._queue)} queued, {self.in_flight} in flight)"
+                )
+            return wait
+
+    def _take_token(self, now: float) -> float:
+        """Consume one bucket token (call with _lock held). Returns the wait until one is available."""
+        if self.rpm <= 0:
+            return 0
+        rate = self.rpm / 60.0
+        self.tokens      = min(self.capacity, self.tokens + (now - self.refilled_at) * rate)
+        self.refilled_at = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / rate
+
+    def _record_wait(self, queued_at: float) -> None:
+        waited = time.monotonic() - queued_at
+        if waited < 0.001:
+            return
+        with self._lock:
+            self._stats["throttled"]       += 1
+            self._stats["throttle_wait_s"] += waited
+        if waited >= 1:
+            logger.info(f"[RateLimiter] {self.name} call admitted after {waited:.1f}s in queue")
+
+    def _release(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+
+    def _block(self, delay_s: float, reason: str) -> None:
+        with self._lock:
+            until = time.monotonic() + delay_s
+            if until <= self.blocked_until:
+                return
+            self.blocked_until = until
+            self.tokens        = 0.0
+        logger.warning(f"[RateLimiter] {self.name} paused for {delay_s:.1f}s ({reason})")
+
+
+def _parse_retry_after(value: str) -> Optional[float]:
+    """Retry-After as delta-seconds or an HTTP date."""
+    value = value.strip()
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def _parse_duration(value: str) -> Optional[float]:
+    """Durations like "2m59.56s", "850ms" or "7.66s" (x-ratelimit-reset-* headers); plain numbers are seconds."""
+    value = value.strip()
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION.findall(value)
+    return sum(float(amount) * _UNIT_S[unit] for amount, unit in parts) if parts else None
+
+
+# ---------------------------------------------------------------------------
+# Registry — one limiter per provider, shared by all requests
+# ---------------------------------------------------------------------------
+_limiters: dict[str, ProviderLimiter] = {}
+_registry_lock = threading.Lock()
+
+
+def get_rate_limiter(provider_key: str) -> Optional[ProviderLimiter]:
+    """The limiter for a provider (client_key), or None when LLM_RATE_LIMIT is off."""
+    if not LLM_RATE_LIMIT_ENABLED:
+        return None
+    with _registry_lock:
+        limiter = _limiters.get(provider_key)
+        if limiter is None:
+            rpm, concurrency = _DEFAULT_LIMITS.get(provider_key, (0, 4))
+            prefix  = provider_key.upper()
+            limiter = _limiters[provider_key] = ProviderLimiter(
+                name            = provider_key,
+                rpm             = int(os.environ.get(f"{prefix}_RPM", rpm)),
+                max_concurrency = int(os.environ.get(f"{prefix}_MAX_CONCURRENCY", concurrency)),
+            )
+        return limiter
+
+
+def get_rate_limit_stats() -> list[dict[str, Any]]:
+    """Snapshot of every provider's queue and throttling counters, for GET /health."""
+    with _registry_lock:
+        limiters = list(_limiters.values())
+    return [limiter.snapshot() for limiter in limiters]
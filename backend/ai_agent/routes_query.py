@@ -5,9 +5,10 @@ FastAPI route handlers for all NL2SQL query endpoints.
 
 Endpoints:
   POST /api/query          — Submit natural language query (READ)
+  POST /api/query/stream   — Same, as Server-Sent Events: progress per stage, then rows in chunks
   POST /api/query/execute  — Confirm and execute a write operation (WRITE)
   GET  /api/query/history  — Get query history for current user
-  GET  /api/schema/tables  — List tables for schema explorer sidebar
+  GET  /api/schema/tables  — List tables for schema explorer sidebar (paginated, ETag)
 
 Auth: JWT required on all endpoints (extracted by auth middleware).
 RBAC: Write execute endpoint requires admin or power_user role.
@@ -18,14 +19,17 @@ Project : Talk2Tables — Diploma Final Year Project
 
 from __future__ import annotations
 
+import json
 import logging
-from typing import Any, Optional
+from typing import Any, AsyncIterator, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 
 # Internal imports
-from ai_agent import run_agent, validate_confirmed_write, get_table_list, ChatMessage
+from ai_agent import run_agent, astream_agent, validate_confirmed_write, get_engine, ChatMessage
+from ai_agent import aload_schema_snapshot, detect_dialect, table_page, schema_etag
 from ai_agent.sql_validator import validate_confirmed_write
 
 logger = logging.getLogger(__name__)
@@ -44,6 +48,7 @@ class QueryRequest(BaseModel):
     db_id:            str = Field(..., description="Target DB connection UUID")
     chat_history:     list[dict] = Field(default_factory=list,
                                           description="Previous conversation turns for multi-turn context")
+    include_timings:  bool = Field(False, description="Add a per-stage timings_ms breakdown to final_response")
 
     class Config:
         json_schema_extra = {
@@ -77,6 +82,8 @@ class QueryResponse(BaseModel):
     final_response: dict[str, Any]
     chat_history:   list[dict] = []
     llm_provider:   Optional[str] = None
+    sql_source:     Optional[str] = None   # "llm", "cache" / "semantic_cache" (query cache hits) or "fast_path"
+    prompt_tokens:  Optional[int] = None   # Estimated prompt size of the LLM call, if one was made
 
 
 # ---------------------------------------------------------------------------
@@ -153,24 +160,10 @@ async def query(
     )
 
     # ── Fetch connection details ───────────────────────────────────────────
-    try:
-        conn_info = await get_connection_info(request.db_id, user_id, system_db)
-    except HTTPException:
-        raise
-    except Exception as exc:
-        logger.error(f"[POST /api/query] Connection fetch failed: {exc}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Failed to retrieve database connection details."
-        )
+    conn_info = await _fetch_connection(request.db_id, user_id, system_db, "POST /api/query")
 
     # ── Validate and cast chat history ────────────────────────────────────
-    chat_history: list[ChatMessage] = []
-    for turn in request.chat_history:
-        role    = turn.get("role", "user")
-        content = turn.get("content", "")
-        if role in ("user", "assistant") and content:
-            chat_history.append(ChatMessage(role=role, content=content))
+    chat_history = _cast_chat_history(request.chat_history)
 
     # ── Run the AI agent ──────────────────────────────────────────────────
     try:
@@ -183,6 +176,7 @@ async def query(
             chat_history           = chat_history,
             db_dialect             = conn_info.get("dialect"),
             system_db_session      = system_db,
+            include_timings        = request.include_timings or None,   # None → TRACE_TIMINGS_IN_RESPONSE
         )
     except Exception as exc:
         logger.error(f"[POST /api/query] Agent error: {exc}", exc_info=True)
@@ -199,8 +193,102 @@ async def query(
         final_response = result["final_response"],
         chat_history   = result.get("chat_history", []),
         llm_provider   = result.get("llm_provider"),
+        sql_source     = result.get("sql_source"),
+        prompt_tokens  = result.get("prompt_tokens"),
+    )
+
+
+# ---------------------------------------------------------------------------
+# POST /api/query/stream — Same pipeline, streamed as Server-Sent Events
+# ---------------------------------------------------------------------------
+
+@router.post("/query/stream")
+async def query_stream(
+    request:      QueryRequest,
+    current_user: dict = Depends(get_current_user),
+    system_db          = Depends(get_system_db),
+):
+    """
+    Streaming variant of POST /api/query (text/event-stream), so the
+    QueryInterface page can render progressively instead of showing a
+    spinner until the whole pipeline has finished.
+
+    Events (each `data:` line is JSON — see graph.astream_agent):
+      stage    — a node finished: "Schema loaded", "SQL generated", "Executing query", …
+      sql      — the validated SQL, before it runs
+      llm_*    — LLM token progress (with LLM_STREAMING on)
+      columns  — column metadata, then
+      rows     — result rows in chunks ({"offset", "rows"})
+      result   — the QueryResponse fields (final_response without the rows already sent)
+      done     — always last
+
+    Connection / auth errors are returned as normal HTTP errors before the
+    stream starts; errors during the run arrive as a result event with
+    response_type "error".
+    """
+    user_id   = current_user["user_id"]
+    user_role = current_user["role"]
+
+    logger.info(
+        f"[POST /api/query/stream] user={user_id} role={user_role} "
+        f"db_id={request.db_id} | query='{request.natural_language[:80]}'"
     )
 
+    conn_info    = await _fetch_connection(request.db_id, user_id, system_db, "POST /api/query/stream")
+    chat_history = _cast_chat_history(request.chat_history)
+
+    async def event_stream() -> AsyncIterator[str]:
+        # Dependencies with yield are closed before a StreamingResponse body
+        # runs, so the stream holds its own system DB session for doc context
+        sessions = get_system_db()
+        stream_db = await anext(sessions)
+        try:
+            async for item in astream_agent(
+                natural_language_query = request.natural_language,
+                db_connection_string   = conn_info["connection_string"],
+                connection_id          = request.db_id,
+                user_id                = user_id,
+                user_role              = user_role,
+                chat_history           = chat_history,
+                db_dialect             = conn_info.get("dialect"),
+                system_db_session      = stream_db,
+                include_timings        = request.include_timings or None,
+            ):
+                yield f"event: {item['event']}\ndata: {json.dumps(item['data'], default=str)}\n\n"
+        finally:
+            await sessions.aclose()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type = "text/event-stream",
+        headers    = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},  # No proxy buffering
+    )
+
+
+async def _fetch_connection(db_id: str, user_id: str, system_db, route: str) -> dict:
+    """get_connection_info() with unexpected failures mapped to a 500."""
+    try:
+        return await get_connection_info(db_id, user_id, system_db)
+    except HTTPException:
+        raise
+    except Exception as exc:
+        logger.error(f"[{route}] Connection fetch failed: {exc}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to retrieve database connection details."
+        )
+
+
+def _cast_chat_history(turns: list[dict]) -> list[ChatMessage]:
+    """Keep well-formed user / assistant turns from the request's chat_history."""
+    chat_history: list[ChatMessage] = []
+    for turn in turns:
+        role    = turn.get("role", "user")
+        content = turn.get("content", "")
+        if role in ("user", "assistant") and content:
+            chat_history.append(ChatMessage(role=role, content=content))
+    return chat_history
+
 
 # ---------------------------------------------------------------------------
 # POST /api/query/execute — Confirm and execute write operation
@@ -252,10 +340,10 @@ async def execute_write(
 
     # ── Execute in transaction ────────────────────────────────────────────
     try:
-        from sqlalchemy import create_engine, text as sa_text
+        from sqlalchemy import text as sa_text
         import time
 
-        engine = create_engine(conn_info["connection_string"], pool_pre_ping=True)
+        engine  = get_engine(conn_info["connection_string"])
         t_start = time.perf_counter()
 
         with engine.begin() as conn:  # engine.begin() auto-commits on success, rolls back on exception
@@ -300,23 +388,51 @@ async def execute_write(
 
 @router.get("/schema/tables/{db_id}")
 async def list_tables(
-    db_id:        str,
-    current_user: dict = Depends(get_current_user),
-    system_db          = Depends(get_system_db),
+    db_id:         str,
+    response:      Response,
+    offset:        int           = Query(0, ge=0, description="Index of the first table to return"),
+    limit:         Optional[int] = Query(None, ge=1, le=1000, description="Max tables to return (all if omitted)"),
+    prefix:        Optional[str] = Query(None, max_length=128, description="Case-insensitive table name prefix"),
+    if_none_match: Optional[str] = Header(None),
+    current_user:  dict = Depends(get_current_user),
+    system_db           = Depends(get_system_db),
 ):
     """
     Return a list of tables and column counts for the schema explorer sidebar.
     Used by the frontend Schema Explorer component.
+
+    Served from the cached schema snapshot used for prompts. The ETag changes
+    only when the reflected schema changes, so the SchemaBrowser can send
+    If-None-Match and get a bodiless 304 Not Modified.
     """
     user_id = current_user["user_id"]
     try:
         conn_info = await get_connection_info(db_id, user_id, system_db)
-        tables    = get_table_list(conn_info["connection_string"])
-        return {"db_id": db_id, "tables": tables, "table_count": len(tables)}
+        connection_string = conn_info["connection_string"]
+        snapshot  = await aload_schema_snapshot(
+            connection_string, conn_info.get("dialect") or detect_dialect(connection_string)
+        )
     except HTTPException:
         raise
     except Exception as exc:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Schema listing failed: {exc}"
-        )
\ No newline at end of file
+        )
+
+    etag    = schema_etag(snapshot)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}  # Always revalidate
+    client_tags = {tag.strip().removeprefix("W/") for tag in (if_none_match or "").split(",")}
+    if etag in client_tags or "*" in client_tags:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    tables, total = table_page(snapshot, prefix, offset, limit)
+    response.headers.update(headers)
+    return {
+        "db_id":       db_id,
+        "tables":      tables,
+        "table_count": total,
+        "offset":      offset,
+        "limit":       limit,
+        "has_more":    offset + len(tables) < total,
+    }
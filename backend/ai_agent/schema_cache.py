@@ -0,0 +1,294 @@
+"""
+Talk2Tables — Schema Cache
+===========================
+Per-connection in-memory cache of reflected schema snapshots (table metadata
+plus the rendered schema context), so that get_schema_context() does not run
+full Inspector reflection on every query.
+
+Invalidation is two-layered (per-table signatures from
+compute_table_fingerprints() then let a stale entry be refreshed
+incrementally — see schema_manager._refresh_schema):
+
+  1. TTL          — entries older than SCHEMA_CACHE_TTL_S are always re-reflected
+                    in full, bypassing the snapshot store (schema_store.py).
+  2. Fingerprint  — within the TTL, a single cheap per-dialect catalog query
+                    (PRAGMA schema_version, a hash over information_schema /
+                    pg_catalog, sys.objects, user_objects) is compared with the
+                    fingerprint stored alongside the entry. A match is a cache
+                    hit; a mismatch forces re-reflection.
+
+A cache hit therefore costs one tiny query instead of hundreds of catalog
+round trips.
+
+Author  : Member 1 (Backend Lead)
+Project : Talk2Tables — Diploma Final Year Project
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from typing_extensions import TypedDict
+
+if TYPE_CHECKING:
+    from .schema_manager import TableMeta
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------------
+SCHEMA_CACHE_TTL_S         = int(os.environ.get("SCHEMA_CACHE_TTL_S", "600"))
+SCHEMA_CACHE_MAX_ENTRIES   = int(os.environ.get("SCHEMA_CACHE_MAX_ENTRIES", "64"))
+SCHEMA_FINGERPRINT_ENABLED = os.environ.get("SCHEMA_FINGERPRINT_CHECK", "true").lower() == "true"
+
+
+# ---------------------------------------------------------------------------
+# Per-dialect "has the schema changed?" queries — each returns ONE row
+# ---------------------------------------------------------------------------
+_MYSQL_FINGERPRINT_SQL = """
+SELECT
+  (SELECT COUNT(*) FROM information_schema.COLUMNS WHERE TABLE_SCHEMA = DATABASE()),
+  (SELECT SUM(CRC32(CONCAT_WS('|', TABLE_NAME, COLUMN_NAME, COLUMN_TYPE, IS_NULLABLE,
+                              COLUMN_KEY, IFNULL(COLUMN_DEFAULT, ''))))
+     FROM information_schema.COLUMNS WHERE TABLE_SCHEMA = DATABASE()),
+  (SELECT SUM(CRC32(CONCAT_WS('|', TABLE_NAME, INDEX_NAME, COLUMN_NAME, NON_UNIQUE)))
+     FROM information_schema.STATISTICS WHERE TABLE_SCHEMA = DATABASE()),
+  (SELECT SUM(CRC32(CONCAT_WS('|', TABLE_NAME, COLUMN_NAME, IFNULL(REFERENCED_TABLE_NAME, ''),
+                              IFNULL(REFERENCED_COLUMN_NAME, ''))))
+     FROM information_schema.KEY_COLUMN_USAGE WHERE TABLE_SCHEMA = DATABASE())
+"""
+
+_FINGERPRINT_SQL: dict[str, str] = {
+    "sqlite": "PRAGMA schema_version",
+    "mysql":   _MYSQL_FINGERPRINT_SQL,
+    "mariadb": _MYSQL_FINGERPRINT_SQL,
+    "postgresql": """
+SELECT
+  (SELECT md5(COALESCE(string_agg(
+            c.relname || '.' || a.attname || ':' || format_type(a.atttypid, a.atttypmod)
+            || ':' || a.attnotnull::text || ':' || COALESCE(pg_get_expr(d.adbin, d.adrelid), ''),
+            ',' ORDER BY c.relname, a.attnum), ''))
+     FROM pg_attribute a
+     JOIN pg_class c      ON c.oid = a.attrelid
+     JOIN pg_namespace n  ON n.oid = c.relnamespace
+     LEFT JOIN pg_attrdef d ON d.adrelid = a.attrelid AND d.adnum = a.attnum
+    WHERE n.nspname = current_schema() AND c.relkind IN ('r', 'p')
+      AND a.attnum > 0 AND NOT a.attisdropped),
+  (SELECT md5(COALESCE(string_agg(con.conname || ':' || pg_get_constraintdef(con.oid),
+                                  ',' ORDER BY con.conname), ''))
+     FROM pg_constraint con
+     JOIN pg_namespace n ON n.oid = con.connamespace
+    WHERE n.nspname = current_schema()),
+  (SELECT md5(COALESCE(string_agg(indexdef, ',' ORDER BY indexname), ''))
+     FROM pg_indexes WHERE schemaname = current_schema())
+""",
+    "mssql": """
+SELECT
+  (SELECT COUNT(*) FROM sys.objects WHERE type IN ('U', 'PK', 'F', 'UQ', 'D')),
+  (SELECT MAX(modify_date) FROM sys.objects WHERE type IN ('U', 'PK', 'F', 'UQ', 'D')),
+  (SELECT COUNT(*) FROM sys.index_columns ic JOIN sys.tables t ON t.object_id = ic.object_id)
+""",
+    "oracle": """
+SELECT COUNT(*), MAX(last_ddl_time)
+FROM user_objects
+WHERE object_type IN ('TABLE', 'INDEX')
+""",
+}
+
+
+def compute_schema_fingerprint(engine: Engine) -> Optional[str]:
+    """
+    Run the cheap per-dialect catalog query and hash its single result row.
+
+    Returns:
+        A short hex digest, or None if the dialect is unsupported or the
+        query failed (the cache then falls back to TTL-only invalidation).
+    """
+    sql = _FINGERPRINT_SQL.get(engine.dialect.name)
+    if sql is None:
+        return None
+    try:
+        with engine.connect() as conn:
+            row = conn.execute(text(sql)).fetchone()
+    except Exception as exc:
+        logger.warning(f"[SchemaCache] Fingerprint query failed ({engine.dialect.name}): {exc}")
+        return None
+    return hashlib.sha256(repr(tuple(row) if row else ()).encode("utf-8")).hexdigest()[:16]
+
+
+# ---------------------------------------------------------------------------
+# Per-table fingerprints — one row per table: (table_name, signature columns...)
+# Used for incremental refresh: only tables whose signature changed are re-reflected.
+# ---------------------------------------------------------------------------
+_MYSQL_TABLE_FINGERPRINT_SQL = """
+SELECT t.TABLE_NAME, t.CREATE_TIME,
+  (SELECT COUNT(*) FROM information_schema.COLUMNS c
+    WHERE c.TABLE_SCHEMA = t.TABLE_SCHEMA AND c.TABLE_NAME = t.TABLE_NAME),
+  (SELECT SUM(CRC32(CONCAT_WS('|', c.COLUMN_NAME, c.COLUMN_TYPE, c.IS_NULLABLE,
+                              c.COLUMN_KEY, IFNULL(c.COLUMN_DEFAULT, ''))))
+     FROM information_schema.COLUMNS c
+    WHERE c.TABLE_SCHEMA = t.TABLE_SCHEMA AND c.TABLE_NAME = t.TABLE_NAME),
+  (SELECT SUM(CRC32(CONCAT_WS('|', s.INDEX_NAME, s.COLUMN_NAME, s.NON_UNIQUE)))
+     FROM information_schema.STATISTICS s
+    WHERE s.TABLE_SCHEMA = t.TABLE_SCHEMA AND s.TABLE_NAME = t.TABLE_NAME),
+  (SELECT SUM(CRC32(CONCAT_WS('|', k.COLUMN_NAME, IFNULL(k.REFERENCED_TABLE_NAME, ''),
+                              IFNULL(k.REFERENCED_COLUMN_NAME, ''))))
+     FROM information_schema.KEY_COLUMN_USAGE k
+    WHERE k.TABLE_SCHEMA = t.TABLE_SCHEMA AND k.TABLE_NAME = t.TABLE_NAME)
+FROM information_schema.TABLES t
+WHERE t.TABLE_SCHEMA = DATABASE() AND t.TABLE_TYPE = 'BASE TABLE'
+"""
+
+_TABLE_FINGERPRINT_SQL: dict[str, str] = {
+    "sqlite": """
+SELECT tbl_name, group_concat(COALESCE(sql, ''), ';')
+FROM (SELECT tbl_name, sql FROM sqlite_master WHERE type IN ('table', 'index') ORDER BY name)
+GROUP BY tbl_name
+""",
+    "mysql":   _MYSQL_TABLE_FINGERPRINT_SQL,
+    "mariadb": _MYSQL_TABLE_FINGERPRINT_SQL,
+    "postgresql": """
+SELECT c.relname,
+  (SELECT md5(COALESCE(string_agg(
+            a.attname || ':' || format_type(a.atttypid, a.atttypmod) || ':' || a.attnotnull::text
+            || ':' || COALESCE(pg_get_expr(d.adbin, d.adrelid), ''), ',' ORDER BY a.attnum), ''))
+     FROM pg_attribute a
+     LEFT JOIN pg_attrdef d ON d.adrelid = a.attrelid AND d.adnum = a.attnum
+    WHERE a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped),
+  (SELECT md5(COALESCE(string_agg(pg_get_constraintdef(con.oid), ',' ORDER BY con.conname), ''))
+     FROM pg_constraint con WHERE con.conrelid = c.oid),
+  (SELECT md5(COALESCE(string_agg(pg_get_indexdef(i.indexrelid), ',' ORDER BY i.indexrelid), ''))
+     FROM pg_index i WHERE i.indrelid = c.oid)
+FROM pg_class c
+JOIN pg_namespace n ON n.oid = c.relnamespace
+WHERE n.nspname = current_schema() AND c.relkind IN ('r', 'p')
+""",
+    "mssql": """
+SELECT t.name, t.modify_date,
+  (SELECT COUNT(*) FROM sys.columns c WHERE c.object_id = t.object_id),
+  (SELECT COUNT(*) FROM sys.index_columns ic WHERE ic.object_id = t.object_id)
+FROM sys.tables t
+WHERE t.schema_id = SCHEMA_ID()
+""",
+    "oracle": """
+SELECT o.object_name, o.last_ddl_time,
+  (SELECT COUNT(*) FROM user_tab_columns c WHERE c.table_name = o.object_name)
+FROM user_objects o
+WHERE o.object_type = 'TABLE'
+""",
+}
+
+
+def compute_table_fingerprints(engine: Engine) -> Optional[dict[str, str]]:
+    """
+    Run the per-dialect per-table signature query (one catalog query).
+
+    Returns:
+        { table_name: short hex signature } with names normalised the same way
+        the Inspector reports them, or None if unsupported / failed.
+    """
+    sql = _TABLE_FINGERPRINT_SQL.get(engine.dialect.name)
+    if sql is None:
+        return None
+    try:
+        with engine.connect() as conn:
+            rows = conn.execute(text(sql)).fetchall()
+    except Exception as exc:
+        logger.warning(f"[SchemaCache] Table fingerprint query failed ({engine.dialect.name}): {exc}")
+        return None
+    normalize = engine.dialect.normalize_name
+    return {
+        normalize(row[0]): hashlib.sha256(repr(tuple(row[1:])).encode("utf-8")).hexdigest()[:16]
+        for row in rows
+    }
+
+
+# ---------------------------------------------------------------------------
+# Cache entries
+# ---------------------------------------------------------------------------
+class SchemaSnapshot(TypedDict):
+    """One reflection of a target database plus the metadata needed to revalidate it."""
+    schema_text:  str                     # Full rendered context (truncated at MAX_SCHEMA_CHARS)
+    table_names:  list[str]               # Catalog order, as returned by the Inspector
+    tables:       dict[str, "TableMeta"]  # Per-table columns / PK / FKs / indexes
+    content_hash: str                     # Hash of `tables` — identifies this exact schema
+    fingerprint:  Optional[str]           # None when the dialect has no fingerprint query
+    table_fingerprints: Optional[dict[str, str]]  # Per-table signatures for incremental refresh
+    db_dialect:   str
+    loaded_at:    float                   # time.monotonic() at reflection
+
+
+class SchemaCache:
+    """
+    Thread-safe LRU of SchemaSnapshot entries keyed by connection string.
+    Reflection runs in worker threads, so every access takes the lock.
+    """
+
+    def __init__(self, max_entries: int = SCHEMA_CACHE_MAX_ENTRIES, ttl_s: int = SCHEMA_CACHE_TTL_S):
+        self.max_entries = max(max_entries, 1)
+        self.ttl_s       = ttl_s
+        self._entries: "OrderedDict[str, SchemaSnapshot]" = OrderedDict()
+        self._lock   = threading.Lock()
+        self._stats  = {
+            "hits": 0, "misses": 0, "expired": 0, "fingerprint_changes": 0,
+            "full_reflections": 0, "incremental_refreshes": 0,
+        }
+
+    def get_valid(self, key: str, fingerprint: Optional[str]) -> Optional[SchemaSnapshot]:
+        """
+        Return the entry for `key` if it is within the TTL and its stored
+        fingerprint matches `fingerprint`; otherwise None (counted as a miss).
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            if time.monotonic() - entry["loaded_at"] > self.ttl_s:
+                self._stats["expired"] += 1
+                self._stats["misses"]  += 1
+                return None
+            if entry["fingerprint"] != fingerprint:
+                self._stats["fingerprint_changes"] += 1
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry
+
+    def peek(self, key: str) -> Optional[SchemaSnapshot]:
+        """Return the entry for `key` even if stale — the base for an incremental refresh."""
+        with self._lock:
+            return self._entries.get(key)
+
+    def count(self, stat: str) -> None:
+        with self._lock:
+            self._stats[stat] = self._stats.get(stat, 0) + 1
+
+    def put(self, key: str, snapshot: SchemaSnapshot) -> None:
+        with self._lock:
+            self._entries[key] = snapshot
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key: Optional[str] = None) -> None:
+        """Drop one connection's entry, or every entry when key is None."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {**self._stats, "entries": len(self._entries)}
@@ -0,0 +1,231 @@
+"""
+Talk2Tables — Schema Relevance Index
+=====================================
+In-memory lexical (BM25) index over a reflected schema, used to pick the
+tables relevant to one natural-language question instead of hard-truncating
+the whole catalog at MAX_SCHEMA_CHARS.
+
+Each table becomes one "document" made of:
+  - its name tokens (boosted ×3),
+  - its column name tokens,
+  - the names of the tables it references via foreign keys,
+  - "synonyms" mined from uploaded schema docs: words from any doc line
+    that mentions the table, or a column that belongs to few tables.
+
+Identifiers are tokenised on underscores, digits and camelCase boundaries
+and lightly stemmed, so "calibrations", "CalibrationLog" and "calibration_id"
+all share the token "calibration".
+
+Author  : Member 1 (Backend Lead)
+Project : Talk2Tables — Diploma Final Year Project
+"""
+
+from __future__ import annotations
+
+import hashlib
+import math
+import re
+import threading
+from collections import Counter, OrderedDict, defaultdict
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from .doc_index import DocCorpus
+    from .schema_manager import TableMeta
+
+# ---------------------------------------------------------------------------
+# Tokenisation
+# ---------------------------------------------------------------------------
+_CAMEL_BOUNDARY = re.compile(r"(?<=[a-z0-9])(?=[A-Z])")
+_WORD           = re.compile(r"[A-Za-z]+|\d+")
+
+_STOPWORDS: set[str] = {
+    "a", "an", "the", "of", "in", "on", "for", "to", "and", "or", "by", "with",
+    "is", "are", "was", "be", "me", "show", "list", "give", "get", "find", "all",
+    "what", "which", "who", "how", "many", "much", "do", "does", "that", "this",
+    "from", "at", "as", "it", "its", "their", "there", "any", "each", "per",
+    "please", "display", "tell", "i", "we", "my", "our",
+}
+
+TABLE_NAME_BOOST   = 3    # Table name tokens count as this many occurrences
+MAX_SYNONYM_TOKENS = 200  # Cap on doc-derived tokens added to one table
+_RARE_COLUMN_TABLES = 3   # A column name in ≤ this many tables links doc lines to them
+
+
+def _stem(token: str) -> str:
+    """Very light English plural stemming — enough to match table names."""
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 4 and token.endswith(("sses", "shes", "ches", "xes")):
+        return token[:-2]
+    if len(token) > 3 and token.endswith("s") and not token.endswith(("ss", "us", "is")):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str, drop_stopwords: bool = True) -> list[str]:
+    """
+    Split free text or SQL identifiers into lowercase, stemmed tokens.
+    drop_stopwords=False keeps every word, single letters included — for exact
+    phrase-to-identifier matching, where a dropped word would go unnoticed.
+    """
+    text   = _CAMEL_BOUNDARY.sub(" ", text or "")
+    tokens = []
+    for word in _WORD.findall(text):
+        word = word.lower()
+        if drop_stopwords and (word in _STOPWORDS or (len(word) == 1 and not word.isdigit())):
+            continue
+        tokens.append(_stem(word))
+    return tokens
+
+
+# ---------------------------------------------------------------------------
+# BM25
+# ---------------------------------------------------------------------------
+class BM25Index:
+    """Okapi BM25 over pre-tokenised documents."""
+
+    def __init__(self, documents: list[list[str]], k1: float = 1.5, b: float = 0.75):
+        self.k1        = k1
+        self.b         = b
+        self.doc_freqs = [Counter(doc) for doc in documents]
+        self.doc_lens  = [len(doc) for doc in documents]
+        self.avg_len   = (sum(self.doc_lens) / len(documents)) if documents else 0.0
+
+        df: Counter = Counter()
+        for freqs in self.doc_freqs:
+            df.update(freqs.keys())
+        n = len(documents)
+        self.idf = {term: math.log(1 + (n - count + 0.5) / (count + 0.5)) for term, count in df.items()}
+
+    def scores(self, query_tokens: list[str]) -> list[float]:
+        """BM25 score of every document for the query, in document order."""
+        results = []
+        terms   = [t for t in set(query_tokens) if t in self.idf]
+        for freqs, doc_len in zip(self.doc_freqs, self.doc_lens):
+            score = 0.0
+            norm  = self.k1 * (1 - self.b + self.b * doc_len / self.avg_len) if self.avg_len else self.k1
+            for term in terms:
+                tf = freqs.get(term, 0)
+                if tf:
+                    score += self.idf[term] * tf * (self.k1 + 1) / (tf + norm)
+            results.append(score)
+        return results
+
+
+# ---------------------------------------------------------------------------
+# Schema index
+# ---------------------------------------------------------------------------
+class SchemaIndex:
+    """BM25 index over the tables of one schema snapshot plus FK adjacency."""
+
+    def __init__(
+        self,
+        table_names: list[str],
+        tables: dict[str, "TableMeta"],
+        doc_context: Optional[str] = None,
+    ):
+        self.table_names = list(table_names)
+        self.neighbours: dict[str, set[str]] = defaultdict(set)
+
+        documents: dict[str, list[str]] = {}
+        for name in self.table_names:
+            meta   = tables[name]
+            tokens = tokenize(name) * TABLE_NAME_BOOST
+            for col in meta["columns"] or []:
+                tokens.extend(tokenize(col["name"]))
+            for ref in meta["fks"].values():
+                ref_table = ref.rsplit(".", 1)[0]
+                tokens.extend(tokenize(ref_table))
+                if ref_table in tables and ref_table != name:
+                    self.neighbours[name].add(ref_table)
+                    self.neighbours[ref_table].add(name)
+            documents[name] = tokens
+
+        if doc_context:
+            for name, extra in _doc_synonyms(self.table_names, tables, doc_context).items():
+                documents[name].extend(extra[:MAX_SYNONYM_TOKENS])
+
+        self._bm25 = BM25Index([documents[name] for name in self.table_names])
+
+    def rank(self, question: str) -> list[tuple[str, float]]:
+        """Tables with a positive score for the question, best first."""
+        scores = self._bm25.scores(tokenize(question))
+        ranked = [(name, score) for name, score in zip(self.table_names, scores) if score > 0]
+        ranked.sort(key=lambda item: item[1], reverse=True)
+        return ranked
+
+
+def _doc_synonyms(
+    table_names: list[str],
+    tables: dict[str, "TableMeta"],
+    doc_context: str,
+) -> dict[str, list[str]]:
+    """
+    Attach the words of each doc line to the tables it mentions, either by
+    table name or by a column name that appears in only a few tables.
+    """
+    table_lookup = {name.lower(): name for name in table_names}
+    column_owners: dict[str, list[str]] = defaultdict(list)
+    for name in table_names:
+        for col in tables[name]["columns"] or []:
+            column_owners[col["name"].lower()].append(name)
+
+    synonyms: dict[str, list[str]] = defaultdict(list)
+    for line in re.split(r"[\n.;]+", doc_context):
+        identifiers = {word.lower() for word in re.findall(r"[A-Za-z_][A-Za-z0-9_]*", line)}
+        mentioned = {table_lookup[i] for i in identifiers if i in table_lookup}
+        for ident in identifiers:
+            owners = column_owners.get(ident)
+            if owners and len(owners) <= _RARE_COLUMN_TABLES:
+                mentioned.update(owners)
+        if not mentioned:
+            continue
+        words = tokenize(line)
+        for name in mentioned:
+            synonyms[name].extend(words)
+    return synonyms
+
+
+# ---------------------------------------------------------------------------
+# Index cache — one index per (schema content, doc corpus) pair
+# ---------------------------------------------------------------------------
+_INDEX_CACHE_SIZE = 32
+_index_cache: "OrderedDict[tuple[str, str], SchemaIndex]" = OrderedDict()
+_index_lock = threading.Lock()
+
+
+def get_schema_index(
+    content_hash: str,
+    table_names: list[str],
+    tables: dict[str, "TableMeta"],
+    doc_context: Optional[str] = None,
+    doc_corpus: Optional["DocCorpus"] = None,
+) -> SchemaIndex:
+    """
+    Return a cached SchemaIndex, building it on first use for this schema + docs.
+
+    Synonyms are mined from doc_corpus (the connection's whole doc corpus,
+    keyed by its digest) when given, else from the doc_context text.
+    """
+    if doc_corpus is not None:
+        doc_hash = doc_corpus.digest
+    else:
+        doc_hash = hashlib.sha256((doc_context or "").encode("utf-8")).hexdigest()[:16]
+    key = (content_hash, doc_hash)
+
+    with _index_lock:
+        index = _index_cache.get(key)
+        if index is not None:
+            _index_cache.move_to_end(key)
+            return index
+
+    if doc_corpus is not None:
+        doc_context = doc_corpus.full_text()
+    index = SchemaIndex(table_names, tables, doc_context)
+
+    with _index_lock:
+        _index_cache[key] = index
+        while len(_index_cache) > _INDEX_CACHE_SIZE:
+            _index_cache.popitem(last=False)
+    return index
@@ -11,7 +11,10 @@ Handles two complementary schema context sources:
                      (user-uploaded PDFs, Word docs, Excel files) and injects
                      it into the AI prompt as business context.
 
-Both sources are cached in-memory (LRU) for fast repeated access.
+The reflected live schema is cached per connection (schema_cache.py),
+revalidated with a cheap per-dialect fingerprint query, and persisted to a
+snapshot store shared by all workers (schema_store.py). When the schema does
+change, only the tables whose per-table signature changed are re-reflected.
 
 Author  : Member 1 (Backend Lead)
 Project : Talk2Tables — Diploma Final Year Project
@@ -19,13 +22,27 @@ Project : Talk2Tables — Diploma Final Year Project
 
 from __future__ import annotations
 
+import asyncio
+import hashlib
+import json
 import logging
 import os
-from functools import lru_cache
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
 
-from sqlalchemy import create_engine, inspect, text
+from sqlalchemy import inspect, text
 from sqlalchemy.engine import Engine
+from typing_extensions import TypedDict
+
+from .engine_registry import get_engine
+from .schema_cache import (
+    SchemaCache, SchemaSnapshot, SCHEMA_FINGERPRINT_ENABLED,
+    compute_schema_fingerprint, compute_table_fingerprints,
+)
+from .doc_index import DOC_CONTEXT_BUDGET_CHARS, DocCorpus, build_corpus, get_cached_corpus
+from .schema_index import get_schema_index
+from .schema_store import SchemaSnapshotStore
 
 logger = logging.getLogger(__name__)
 
@@ -34,50 +51,334 @@ MAX_SCHEMA_CHARS  = 12_000
 # Max characters for doc context sent to LLM (~2000 tokens per spec)
 MAX_DOC_CONTEXT_CHARS = 8_000
 
+# Use SQLAlchemy 2's multi-table Inspector APIs (4 catalog queries total, not 4 per table)
+BULK_REFLECTION_ENABLED = os.environ.get("SCHEMA_BULK_REFLECTION", "true").lower() == "true"
+
+# On a schema change, re-reflect only tables whose per-table signature changed
+INCREMENTAL_REFRESH_ENABLED = os.environ.get("SCHEMA_INCREMENTAL_REFRESH", "true").lower() == "true"
+
+# Relevance pruning: schemas rendering larger than this are cut down to the
+# tables relevant to the question (BM25 top-k + FK neighbours). Defaults to
+# MAX_SCHEMA_CHARS, so every schema that used to be sent whole still is
+SCHEMA_PRUNE_BUDGET_CHARS = min(int(os.environ.get("SCHEMA_PRUNE_BUDGET_CHARS", str(MAX_SCHEMA_CHARS))), MAX_SCHEMA_CHARS)
+SCHEMA_PRUNE_TOP_K        = int(os.environ.get("SCHEMA_PRUNE_TOP_K", "8"))
+_OMITTED_LISTING_CHARS    = 1_000  # Max chars spent naming tables left out of a pruned schema
+
+# Process-wide cache of reflected schema snapshots, keyed by connection string,
+# backed by an on-disk store shared by all uvicorn workers on the host
+_schema_cache   = SchemaCache()
+_snapshot_store = SchemaSnapshotStore()
+
+# Bounded thread pool for blocking reflection + single-flight registry of
+# in-flight reflections, keyed by (event loop id, connection string, force_refresh)
+SCHEMA_REFLECTION_WORKERS = int(os.environ.get("SCHEMA_REFLECTION_WORKERS", "4"))
+_reflection_executor: Optional[ThreadPoolExecutor] = None
+_inflight_reflections: dict[tuple[int, str, bool], asyncio.Future] = {}
+
+
+# ---------------------------------------------------------------------------
+# Reflected metadata model (JSON-friendly — every value is already a string)
+# ---------------------------------------------------------------------------
+class ColumnMeta(TypedDict):
+    name:     str
+    type:     str             # str() of the SQLAlchemy type, e.g. VARCHAR(50)
+    nullable: bool
+    default:  Optional[str]   # Server default as text, None if absent
+
+
+class IndexMeta(TypedDict):
+    columns: list[Optional[str]]   # None entries for expression indexes
+    unique:  bool
+
+
+class TableMeta(TypedDict):
+    """Everything _render_table() needs for one table."""
+    pk:      list[str]
+    fks:     dict[str, str]              # local column → "referred_table.referred_column"
+    columns: Optional[list[ColumnMeta]]  # None if columns could not be reflected
+    indexes: list[IndexMeta]
+
 
 # ---------------------------------------------------------------------------
 # Live Schema — SQLAlchemy reflection
 # ---------------------------------------------------------------------------
 
-def get_schema_context(connection_string: str, db_dialect: str) -> str:
+def get_schema_context(
+    connection_string: str,
+    db_dialect: str,
+    natural_language_query: Optional[str] = None,
+    doc_context: Optional[str] = None,
+) -> str:
     """
     Reflect the live database schema and return it as CREATE TABLE-style
     DDL strings suitable for LLM context injection.
 
     Supports: MySQL 8, PostgreSQL 15, SQLite, SQL Server (mssql), Oracle, MariaDB.
 
+    Served from the per-connection schema cache while the entry is within
+    SCHEMA_CACHE_TTL_S and the database's schema fingerprint is unchanged.
+
     Args:
-        connection_string : SQLAlchemy URL (e.g. mysql+pymysql://user:pw@host/db)
-        db_dialect        : Dialect hint for display purposes
+        connection_string      : SQLAlchemy URL (e.g. mysql+pymysql://user:pw@host/db)
+        db_dialect             : Dialect hint for display purposes
+        natural_language_query : Optional question; large schemas are pruned to
+                                 the tables relevant to it (see render_schema_context)
+        doc_context            : Optional schema doc text, mined for table synonyms
 
     Returns:
         Multi-line DDL string describing all tables, columns, types, PKs, FKs.
-        Truncated to MAX_SCHEMA_CHARS if very large schemas are detected.
+        Truncated to MAX_SCHEMA_CHARS if very large schemas are detected
+        and no question is given.
+
+    Raises:
+        RuntimeError on connection failure.
+    """
+    snapshot = load_schema_snapshot(connection_string, db_dialect)
+    return render_schema_context(snapshot, natural_language_query, doc_context)
+
+
+def load_schema_snapshot(
+    connection_string: str,
+    db_dialect: str,
+    force_refresh: bool = False,
+) -> SchemaSnapshot:
+    """
+    Return the reflected SchemaSnapshot for a connection, from the cache when
+    it is still valid, otherwise by reflecting the live database.
+
+    When the fingerprint changed and a previous snapshot for the connection
+    is at hand, the refresh is incremental: per-table signatures pick out new
+    and altered tables, only those are reflected, and the rest reuse their
+    cached metadata. When the fingerprint is unchanged but the entry outlived
+    SCHEMA_CACHE_TTL_S, the whole schema is reflected again — the snapshot
+    store is not consulted. A stored snapshot keeps the age it was saved
+    with, so one older than SCHEMA_CACHE_TTL_S is reflected again too.
+
+    force_refresh skips the in-memory cache and reflects in full like a TTL
+    expiry (used by the schema warmer to renew an entry before it expires).
 
     Raises:
         RuntimeError on connection failure.
     """
     try:
-        engine = _get_engine(connection_string)
-        return _reflect_schema(engine, db_dialect)
+        engine      = get_engine(connection_string)
+        fingerprint = compute_schema_fingerprint(engine) if SCHEMA_FINGERPRINT_ENABLED else None
+
+        cached = None if force_refresh else _schema_cache.get_valid(connection_string, fingerprint)
+        if cached is not None:
+            logger.info(
+                f"[SchemaManager] Schema cache hit | {len(cached['table_names'])} tables | "
+                f"fingerprint={fingerprint}"
+            )
+            return cached
+
+        # Same fingerprint but not served: the TTL expired (or the warmer is renewing
+        # the entry). That is the backstop for changes the fingerprint misses, so
+        # reflect everything again instead of trusting the store or table signatures.
+        previous = _schema_cache.peek(connection_string)
+        expired  = force_refresh or (previous is not None and previous["fingerprint"] == fingerprint)
+
+        # Another worker (or this one before a restart) may already have reflected it
+        if fingerprint is not None and not expired:
+            stored   = _snapshot_store.load(connection_string, fingerprint)
+            snapshot = _snapshot_from_payload(stored, fingerprint, db_dialect) if stored is not None else None
+            if snapshot is not None and time.monotonic() - snapshot["loaded_at"] > _schema_cache.ttl_s:
+                # Saved longer ago than the cache TTL — it would be expired on arrival
+                logger.info("[SchemaManager] Stored snapshot outlived SCHEMA_CACHE_TTL_S — reflecting again.")
+                expired, snapshot = True, None
+            if snapshot is not None:
+                _schema_cache.put(connection_string, snapshot)
+                logger.info(
+                    f"[SchemaManager] Schema loaded from snapshot store | "
+                    f"{len(snapshot['table_names'])} tables | fingerprint={fingerprint}"
+                )
+                return snapshot
+
+        table_fingerprints = compute_table_fingerprints(engine) if INCREMENTAL_REFRESH_ENABLED else None
+        if (
+            not expired and table_fingerprints is not None
+            and previous is not None and previous.get("table_fingerprints")
+        ):
+            snapshot = _refresh_schema(engine, db_dialect, fingerprint, previous, table_fingerprints)
+            _schema_cache.count("incremental_refreshes")
+        else:
+            snapshot = _reflect_schema(engine, db_dialect, fingerprint, table_fingerprints)
+            _schema_cache.count("full_reflections")
+        _schema_cache.put(connection_string, snapshot)
+        if fingerprint is not None:
+            _snapshot_store.save(connection_string, fingerprint, _snapshot_payload(snapshot))
+        return snapshot
     except Exception as exc:
         logger.error(f"[SchemaManager] Schema reflection failed: {exc}")
         raise RuntimeError(f"Could not load database schema: {exc}") from exc
 
 
-def _get_engine(connection_string: str) -> Engine:
+async def aload_schema_snapshot(
+    connection_string: str,
+    db_dialect: str,
+    force_refresh: bool = False,
+) -> SchemaSnapshot:
     """
-    Create or return a cached SQLAlchemy engine.
-    Connection pooling is handled automatically by SQLAlchemy.
+    Async, non-blocking load_schema_snapshot() for use on the event loop.
+
+    Reflection (and even the cache's fingerprint query) runs on a bounded
+    thread pool of SCHEMA_REFLECTION_WORKERS threads, so a slow catalog never
+    stalls other requests on the uvicorn worker. Concurrent callers for the
+    same connection share ONE in-flight reflection (single-flight), so a burst
+    of requests — e.g. a whole shift opening the dashboard at once — costs a
+    single reflection. A force_refresh call (the schema warmer) never joins
+    a normal load — that load may be served from the cache — but normal
+    callers do join an in-flight forced refresh.
+
+    Raises:
+        RuntimeError on connection failure (propagated to every waiter).
     """
-    # pool_pre_ping=True ensures stale connections are recycled
-    return create_engine(connection_string, pool_pre_ping=True, echo=False)
+    loop = asyncio.get_running_loop()
+    key  = (id(loop), connection_string, force_refresh)
+
+    future = _inflight_reflections.get(key)
+    if future is None and not force_refresh:
+        # A forced refresh in flight is at least as fresh as a normal load
+        future = _inflight_reflections.get((id(loop), connection_string, True))
+    if future is None:
+        future = loop.run_in_executor(
+            _get_reflection_executor(), load_schema_snapshot, connection_string, db_dialect, force_refresh
+        )
+        _inflight_reflections[key] = future
+        future.add_done_callback(lambda done: _forget_inflight(key, done))
+    else:
+        logger.info("[SchemaManager] Joining in-flight schema reflection for this connection.")
+
+    # shield(): a cancelled request must not cancel the reflection other requests await
+    return await asyncio.shield(future)
+
+
+def shutdown_reflection_executor() -> None:
+    """Stop the reflection thread pool. Called from main.lifespan on shutdown."""
+    global _reflection_executor
+    if _reflection_executor is not None:
+        _reflection_executor.shutdown(wait=False, cancel_futures=True)
+        _reflection_executor = None
+
+
+def _get_reflection_executor() -> ThreadPoolExecutor:
+    global _reflection_executor
+    if _reflection_executor is None:
+        _reflection_executor = ThreadPoolExecutor(
+            max_workers        = max(SCHEMA_REFLECTION_WORKERS, 1),
+            thread_name_prefix = "schema-reflect",
+        )
+    return _reflection_executor
+
+
+def _forget_inflight(key: tuple[int, str, bool], done: asyncio.Future) -> None:
+    if _inflight_reflections.get(key) is done:
+        del _inflight_reflections[key]
 
 
-def _reflect_schema(engine: Engine, db_dialect: str) -> str:
+def render_schema_context(
+    snapshot: SchemaSnapshot,
+    natural_language_query: Optional[str] = None,
+    doc_context: Optional[str] = None,
+    doc_corpus: Optional[DocCorpus] = None,
+) -> str:
     """
-    Use SQLAlchemy Inspector to build a human-readable schema description.
-    Generates output like:
+    Build the schema context for one question from a snapshot.
+
+    Schemas that fit in SCHEMA_PRUNE_BUDGET_CHARS are returned whole (so the
+    prompt stays byte-stable across questions). Larger schemas are pruned:
+    tables are ranked with BM25 over table/column names and doc-derived
+    synonyms, the top SCHEMA_PRUNE_TOP_K tables and their FK neighbours are
+    rendered first, then further ranked tables while the budget allows.
+    Falls back to the full (truncated) text if nothing in the question
+    matches the schema.
+
+    Synonyms come from doc_corpus — the connection's whole doc corpus, so the
+    index is built once per schema + corpus version — or else from the
+    doc_context text. Never pass a per-question doc excerpt as doc_context:
+    each excerpt would build (and cache) an index of its own.
+    """
+    full_text = snapshot["schema_text"]
+    if (
+        not natural_language_query
+        or not snapshot["table_names"]
+        or len(full_text) <= SCHEMA_PRUNE_BUDGET_CHARS
+    ):
+        return full_text
+
+    index  = get_schema_index(
+        snapshot["content_hash"], snapshot["table_names"], snapshot["tables"], doc_context, doc_corpus
+    )
+    ranked = [name for name, _ in index.rank(natural_language_query)]
+    if not ranked:
+        logger.info("[SchemaManager] No schema terms matched the question — using full schema.")
+        return full_text
+
+    # Seeds first, then their FK neighbours, then the remaining ranked tables
+    seeds   = ranked[:SCHEMA_PRUNE_TOP_K]
+    ordered = list(seeds)
+    for name in seeds:
+        for neighbour in sorted(index.neighbours.get(name, ())):
+            if neighbour not in ordered:
+                ordered.append(neighbour)
+    ordered.extend(name for name in ranked[SCHEMA_PRUNE_TOP_K:] if name not in ordered)
+
+    parts:    list[str] = []
+    selected: set[str]  = set()
+    used = 0
+    for name in ordered:
+        block = _render_table(name, snapshot["tables"][name])
+        if parts and used + len(block) + 2 > SCHEMA_PRUNE_BUDGET_CHARS:
+            continue  # A smaller, lower-ranked table may still fit
+        parts.append(block)
+        selected.add(name)
+        used += len(block) + 2
+
+    omitted = [name for name in snapshot["table_names"] if name not in selected]
+    pruned   = "\n\n".join(parts)
+    if omitted:
+        listing = ", ".join(omitted)
+        if len(listing) > _OMITTED_LISTING_CHARS:
+            listing = listing[:_OMITTED_LISTING_CHARS].rsplit(", ", 1)[0] + ", ..."
+        pruned += (
+            f"\n\n... [{len(omitted)} other tables not shown as less relevant "
+            f"to this question: {listing}]"
+        )
+
+    logger.info(
+        f"[SchemaManager] Schema pruned to {len(parts)} of {len(snapshot['table_names'])} tables | "
+        f"{len(pruned)} chars (full: {len(full_text)})"
+    )
+    return pruned
+
+
+def peek_schema_snapshot(connection_string: str) -> Optional[SchemaSnapshot]:
+    """The cached snapshot for a connection, even if stale — no database access."""
+    return _schema_cache.peek(connection_string)
+
+
+def invalidate_schema_cache(connection_string: Optional[str] = None) -> None:
+    """
+    Force the next get_schema_context() call to re-reflect.
+    Pass None to clear the cache for every connection.
+    """
+    _schema_cache.invalidate(connection_string)
+
+
+def get_schema_cache_stats() -> dict:
+    """Hit / miss / expiry / fingerprint-change counters for the schema cache and snapshot store."""
+    return {**_schema_cache.stats(), "snapshot_store": _snapshot_store.stats()}
+
+
+def _reflect_schema(
+    engine: Engine,
+    db_dialect: str,
+    fingerprint: Optional[str] = None,
+    table_fingerprints: Optional[dict[str, str]] = None,
+) -> SchemaSnapshot:
+    """
+    Use SQLAlchemy Inspector to reflect every table and build a SchemaSnapshot
+    whose schema_text is a human-readable schema description like:
 
         TABLE: sensors
           - sensor_id    VARCHAR(50)   PK
@@ -85,66 +386,129 @@ def _reflect_schema(engine: Engine, db_dialect: str) -> str:
           - location_id  INTEGER       FK → locations.location_id
           ...
     """
-    inspector = inspect(engine)
+    inspector   = inspect(engine)
     table_names = inspector.get_table_names()
 
-    if not table_names:
-        return "No tables found in the connected database."
+    tables = _collect_table_meta(inspector, table_names) if table_names else {}
+    schema_text = (
+        _render_schema(table_names, tables, db_dialect) if table_names
+        else "No tables found in the connected database."
+    )
 
-    schema_parts: list[str] = []
+    return SchemaSnapshot(
+        schema_text  = schema_text,
+        table_names  = table_names,
+        tables       = tables,
+        content_hash = _content_hash(table_names, tables),
+        fingerprint  = fingerprint,
+        table_fingerprints = table_fingerprints,
+        db_dialect   = db_dialect,
+        loaded_at    = time.monotonic(),
+    )
 
-    for table_name in table_names:
-        lines = [f"TABLE: {table_name}"]
 
-        # ── Columns ───────────────────────────────────────────────────────
-        try:
-            pk_columns = set(inspector.get_pk_constraint(table_name).get("constrained_columns", []))
-        except Exception:
-            pk_columns = set()
+def _refresh_schema(
+    engine: Engine,
+    db_dialect: str,
+    fingerprint: Optional[str],
+    previous: SchemaSnapshot,
+    table_fingerprints: dict[str, str],
+) -> SchemaSnapshot:
+    """
+    Rebuild a snapshot from `previous`, reflecting only the tables that are
+    new or whose signature differs from the one recorded in `previous`.
+    Dropped tables are evicted; the text is re-rendered from metadata in
+    catalog order, so it is identical to a full _reflect_schema().
+    """
+    inspector   = inspect(engine)
+    table_names = inspector.get_table_names()
+    old_fps     = previous["table_fingerprints"] or {}
+
+    changed = [
+        name for name in table_names
+        if name not in previous["tables"]
+        or table_fingerprints.get(name) is None
+        or old_fps.get(name) != table_fingerprints[name]
+    ]
+    dropped = [name for name in previous["table_names"] if name not in set(table_names)]
+
+    if not changed and not dropped and table_names == previous["table_names"]:
+        logger.info(f"[SchemaManager] Incremental schema refresh | no table changed | {len(table_names)} reused")
+        return SchemaSnapshot(**{
+            **previous,
+            "fingerprint":        fingerprint,
+            "table_fingerprints": table_fingerprints,
+            "loaded_at":          time.monotonic(),
+        })
+
+    refreshed = _collect_table_meta(inspector, changed, filtered=True) if changed else {}
+    tables    = {
+        name: refreshed[name] if name in refreshed else previous["tables"][name]
+        for name in table_names
+    }
+    logger.info(
+        f"[SchemaManager] Incremental schema refresh | {len(changed)} changed, "
+        f"{len(dropped)} dropped, {len(table_names) - len(changed)} reused"
+    )
 
-        try:
-            fk_map: dict[str, str] = {}
-            for fk in inspector.get_foreign_keys(table_name):
-                for local_col, ref_col in zip(
-                    fk["constrained_columns"], fk["referred_columns"]
-                ):
-                    fk_map[local_col] = f"{fk['referred_table']}.{ref_col}"
-        except Exception:
-            fk_map = {}
+    schema_text = (
+        _render_schema(table_names, tables, db_dialect) if table_names
+        else "No tables found in the connected database."
+    )
+    return SchemaSnapshot(
+        schema_text  = schema_text,
+        table_names  = table_names,
+        tables       = tables,
+        content_hash = _content_hash(table_names, tables),
+        fingerprint  = fingerprint,
+        table_fingerprints = table_fingerprints,
+        db_dialect   = db_dialect,
+        loaded_at    = time.monotonic(),
+    )
 
-        try:
-            columns = inspector.get_columns(table_name)
-        except Exception:
-            lines.append("  (could not reflect columns)")
-            schema_parts.append("\n".join(lines))
-            continue
 
-        for col in columns:
-            col_name    = col["name"]
-            col_type    = str(col.get("type", "UNKNOWN"))
-            nullable    = "" if col.get("nullable", True) else "  NOT NULL"
-            pk_marker   = "  PK" if col_name in pk_columns else ""
-            fk_marker   = f"  FK → {fk_map[col_name]}" if col_name in fk_map else ""
-            default     = ""
-            if col.get("default") is not None:
-                default = f"  DEFAULT {col['default']}"
-            lines.append(
-                f"  - {col_name:<30} {col_type:<20}{pk_marker}{fk_marker}{nullable}{default}"
-            )
+def _snapshot_payload(snapshot: SchemaSnapshot) -> dict:
+    """The persistable part of a snapshot (loaded_at is process-local)."""
+    return {
+        "schema_text":  snapshot["schema_text"],
+        "table_names":  snapshot["table_names"],
+        "tables":       snapshot["tables"],
+        "content_hash": snapshot["content_hash"],
+        "db_dialect":   snapshot["db_dialect"],
+        "table_fingerprints": snapshot.get("table_fingerprints"),
+    }
 
-        # ── Indexes (abbreviated) ─────────────────────────────────────────
-        try:
-            indexes = inspector.get_indexes(table_name)
-            for idx in indexes[:5]:  # Limit to 5 indexes per table
-                idx_cols = ", ".join(idx.get("column_names", []))
-                unique   = " UNIQUE" if idx.get("unique") else ""
-                lines.append(f"  INDEX{unique}: ({idx_cols})")
-        except Exception:
-            pass
 
-        schema_parts.append("\n".join(lines))
+def _snapshot_from_payload(payload: dict, fingerprint: str, db_dialect: str) -> SchemaSnapshot:
+    """
+    A snapshot from a stored payload. loaded_at is backdated by the payload's
+    age (saved_at, wall clock), so SCHEMA_CACHE_TTL_S runs from the original
+    reflection across workers and restarts — not from this read.
+    """
+    saved_at = payload.get("saved_at")
+    age      = max(time.time() - saved_at, 0.0) if saved_at is not None else 0.0
+    return SchemaSnapshot(
+        schema_text  = payload["schema_text"],
+        table_names  = payload["table_names"],
+        tables       = payload["tables"],
+        content_hash = payload["content_hash"],
+        fingerprint  = fingerprint,
+        table_fingerprints = payload.get("table_fingerprints"),
+        db_dialect   = payload.get("db_dialect") or db_dialect,
+        loaded_at    = time.monotonic() - age,
+    )
+
+
+def _content_hash(table_names: list[str], tables: dict[str, TableMeta]) -> str:
+    """Stable hash of the reflected metadata — identical schemas hash identically."""
+    payload = json.dumps([table_names, tables], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
 
-    full_schema = "\n\n".join(schema_parts)
+def _render_schema(table_names: list[str], tables: dict[str, TableMeta], db_dialect: str) -> str:
+    """Join per-table blocks in catalog order and truncate to MAX_SCHEMA_CHARS."""
+    schema_parts = [_render_table(name, tables[name]) for name in table_names]
+    full_schema  = "\n\n".join(schema_parts)
 
     # Truncate gracefully if schema is too large for context window
     if len(full_schema) > MAX_SCHEMA_CHARS:
@@ -161,73 +525,236 @@ def _reflect_schema(engine: Engine, db_dialect: str) -> str:
     return full_schema
 
 
+def _render_table(table_name: str, meta: TableMeta) -> str:
+    """Render one table's TABLE: block from its reflected metadata."""
+    lines = [f"TABLE: {table_name}"]
+
+    # ── Columns ───────────────────────────────────────────────────────────
+    if meta["columns"] is None:
+        lines.append("  (could not reflect columns)")
+        return "\n".join(lines)
+
+    pk_columns = set(meta["pk"])
+    fk_map     = meta["fks"]
+
+    for col in meta["columns"]:
+        col_name    = col["name"]
+        col_type    = col["type"]
+        nullable    = "" if col["nullable"] else "  NOT NULL"
+        pk_marker   = "  PK" if col_name in pk_columns else ""
+        fk_marker   = f"  FK → {fk_map[col_name]}" if col_name in fk_map else ""
+        default     = ""
+        if col["default"] is not None:
+            default = f"  DEFAULT {col['default']}"
+        lines.append(
+            f"  - {col_name:<30} {col_type:<20}{pk_marker}{fk_marker}{nullable}{default}"
+        )
+
+    # ── Indexes (abbreviated) ─────────────────────────────────────────────
+    try:
+        for idx in meta["indexes"][:5]:  # Limit to 5 indexes per table
+            idx_cols = ", ".join(idx["columns"])
+            unique   = " UNIQUE" if idx["unique"] else ""
+            lines.append(f"  INDEX{unique}: ({idx_cols})")
+    except Exception:
+        pass  # e.g. expression indexes report None column names
+
+    return "\n".join(lines)
+
+
+# ---------------------------------------------------------------------------
+# Catalog collection — bulk (get_multi_*) with per-table fallback
+# ---------------------------------------------------------------------------
+
+def _collect_table_meta(
+    inspector,
+    table_names: list[str],
+    filtered: bool = False,
+) -> dict[str, TableMeta]:
+    """
+    Reflect columns, PKs, FKs and indexes for every table in `table_names`.
+
+    With SCHEMA_BULK_REFLECTION enabled, SQLAlchemy 2's get_multi_* Inspector
+    APIs fetch each category for the whole schema in one catalog query
+    (4 round trips total instead of 4 per table). Any category whose bulk
+    call fails, or a table missing from a bulk result, falls back to the
+    per-table Inspector call, so the rendered output is identical either way.
+
+    With `filtered`, the bulk calls are restricted to `table_names`
+    (filter_names) — used by incremental refresh for a few changed tables.
+    """
+    bulk = _bulk_reflect(inspector, table_names if filtered else None) if BULK_REFLECTION_ENABLED else {}
+
+    tables: dict[str, TableMeta] = {}
+    for table_name in table_names:
+        raw = {
+            category: _lookup_or_reflect(inspector, bulk.get(category), category, table_name)
+            for category in _PER_TABLE_METHODS
+        }
+        tables[table_name] = _build_table_meta(raw)
+    return tables
+
+
+# category → (bulk Inspector method, per-table Inspector method)
+_PER_TABLE_METHODS: dict[str, tuple[str, str]] = {
+    "pk":      ("get_multi_pk_constraint", "get_pk_constraint"),
+    "fks":     ("get_multi_foreign_keys",  "get_foreign_keys"),
+    "columns": ("get_multi_columns",       "get_columns"),
+    "indexes": ("get_multi_indexes",       "get_indexes"),
+}
+
+# Sentinel for "this category could not be reflected for this table"
+_REFLECTION_FAILED = object()
+
+
+def _bulk_reflect(inspector, filter_names: Optional[list[str]] = None) -> dict[str, Optional[dict]]:
+    """Run each get_multi_* call once; map table name → raw reflection result."""
+    results: dict[str, Optional[dict]] = {}
+    for category, (bulk_method, _) in _PER_TABLE_METHODS.items():
+        method = getattr(inspector, bulk_method, None)
+        if method is None:
+            results[category] = None
+            continue
+        try:
+            # Keys are (schema, table_name); schema is None for the default schema
+            raw = method(filter_names=filter_names) if filter_names else method()
+            results[category] = {key[1]: value for key, value in raw.items()}
+        except Exception as exc:
+            logger.warning(
+                f"[SchemaManager] Bulk {bulk_method} failed, falling back to per-table: {exc}"
+            )
+            results[category] = None
+    return results
+
+
+def _lookup_or_reflect(inspector, bulk_result: Optional[dict], category: str, table_name: str):
+    if bulk_result is not None and table_name in bulk_result:
+        return bulk_result[table_name]
+    try:
+        return getattr(inspector, _PER_TABLE_METHODS[category][1])(table_name)
+    except Exception:
+        return _REFLECTION_FAILED
+
+
+def _build_table_meta(raw: dict) -> TableMeta:
+    """Normalise raw Inspector results into a JSON-friendly TableMeta."""
+    pk: list[str] = []
+    if raw["pk"] is not _REFLECTION_FAILED:
+        pk = list(raw["pk"].get("constrained_columns", []) or [])
+
+    fks: dict[str, str] = {}
+    if raw["fks"] is not _REFLECTION_FAILED:
+        try:
+            for fk in raw["fks"]:
+                for local_col, ref_col in zip(
+                    fk["constrained_columns"], fk["referred_columns"]
+                ):
+                    fks[local_col] = f"{fk['referred_table']}.{ref_col}"
+        except Exception:
+            fks = {}
+
+    columns: Optional[list[ColumnMeta]] = None
+    if raw["columns"] is not _REFLECTION_FAILED:
+        columns = [
+            ColumnMeta(
+                name     = col["name"],
+                type     = str(col.get("type", "UNKNOWN")),
+                nullable = bool(col.get("nullable", True)),
+                default  = str(col["default"]) if col.get("default") is not None else None,
+            )
+            for col in raw["columns"]
+        ]
+
+    indexes: list[IndexMeta] = []
+    if raw["indexes"] is not _REFLECTION_FAILED:
+        indexes = [
+            IndexMeta(columns=list(idx.get("column_names", [])), unique=bool(idx.get("unique")))
+            for idx in raw["indexes"]
+        ]
+
+    return TableMeta(pk=pk, fks=fks, columns=columns, indexes=indexes)
+
+
 # ---------------------------------------------------------------------------
 # Doc Context — connection_schema_docs table
 # ---------------------------------------------------------------------------
 
+# Shared WHERE clause of the version probe and the full fetch
+_DOC_FILTER_SQL = """connection_id = :cid
+                  AND extraction_status = 'done'
+                  AND extracted_text IS NOT NULL"""
+
+
 async def get_doc_context(
     connection_id: str,
     system_db_session,  # SQLAlchemy async Session for the system DB
+    natural_language_query: Optional[str] = None,
 ) -> Optional[str]:
     """
     Fetch extracted text from all schema docs uploaded for this connection.
     These are stored in the `connection_schema_docs` table by the
     Schema Doc Service (doc_extractor.py) after upload.
 
+    The docs are chunked and indexed once per connection (doc_index.py).
+    Each call runs only a COUNT / MAX(uploaded_at) probe; the full text is
+    re-read only when that changes. Large doc sets are cut down to the
+    chunks most relevant to the question.
+
     Args:
-        connection_id    : The active DB connection's UUID
-        system_db_session: SQLAlchemy async Session (injected from FastAPI dependency)
+        connection_id          : The active DB connection's UUID
+        system_db_session      : SQLAlchemy async Session (injected from FastAPI dependency)
+        natural_language_query : Optional question used to rank doc chunks
 
     Returns:
-        Concatenated extracted_text from all docs, truncated to MAX_DOC_CONTEXT_CHARS.
+        The relevant doc chunks, grouped per file, within DOC_CONTEXT_BUDGET_CHARS
+        (never more than MAX_DOC_CONTEXT_CHARS).
         Returns None if no docs are uploaded.
     """
     try:
-        result = await system_db_session.execute(
+        probe = await system_db_session.execute(
             text(
-                """
-                SELECT filename, extracted_text
+                f"""
+                SELECT COUNT(*), MAX(uploaded_at)
                 FROM connection_schema_docs
-                WHERE connection_id = :cid
-                  AND extraction_status = 'done'
-                  AND extracted_text IS NOT NULL
-                ORDER BY uploaded_at DESC
+                WHERE {_DOC_FILTER_SQL}
                 """
             ),
             {"cid": connection_id},
         )
-        rows = result.fetchall()
+        count, latest = probe.fetchone()
+        version = (int(count or 0), str(latest))
+        if not count:
+            logger.info(f"[SchemaManager] No schema docs found for connection_id={connection_id}")
+            return None
+
+        corpus = get_cached_corpus(connection_id, version)
+        if corpus is None:
+            result = await system_db_session.execute(
+                text(
+                    f"""
+                    SELECT filename, extracted_text
+                    FROM connection_schema_docs
+                    WHERE {_DOC_FILTER_SQL}
+                    ORDER BY uploaded_at DESC
+                    """
+                ),
+                {"cid": connection_id},
+            )
+            documents = [(row[0], row[1]) for row in result.fetchall() if row[1] and row[1].strip()]
+            corpus    = build_corpus(connection_id, documents, version)
     except Exception as exc:
         logger.warning(f"[SchemaManager] Doc context fetch failed: {exc}")
         return None
 
-    if not rows:
-        logger.info(f"[SchemaManager] No schema docs found for connection_id={connection_id}")
+    if not corpus.chunks:
         return None
 
-    parts = []
-    for row in rows:
-        filename      = row[0]
-        extracted_text = row[1]
-        if extracted_text:
-            parts.append(f"--- From: {filename} ---\n{extracted_text.strip()}")
-
-    if not parts:
-        return None
-
-    combined = "\n\n".join(parts)
-
-    # Truncate to stay within LLM token budget (~2000 tokens per spec)
-    if len(combined) > MAX_DOC_CONTEXT_CHARS:
-        logger.warning(
-            f"[SchemaManager] Doc context truncated from {len(combined)} to "
-            f"{MAX_DOC_CONTEXT_CHARS} chars for connection_id={connection_id}"
-        )
-        combined = combined[:MAX_DOC_CONTEXT_CHARS] + "\n\n... [doc context truncated]"
+    # Stay within the LLM token budget (~2000 tokens per spec)
+    combined = corpus.select(natural_language_query, min(DOC_CONTEXT_BUDGET_CHARS, MAX_DOC_CONTEXT_CHARS))
 
     logger.info(
-        f"[SchemaManager] Doc context loaded: {len(rows)} doc(s), "
-        f"{len(combined)} chars for connection_id={connection_id}"
+        f"[SchemaManager] Doc context loaded: {corpus.doc_count} doc(s), "
+        f"{len(combined)} of {corpus.total_chars} chars for connection_id={connection_id}"
     )
     return combined
 
@@ -273,25 +800,56 @@ def detect_dialect(connection_string: str) -> str:
 # Utility: Format schema for display in frontend SQL Viewer
 # ---------------------------------------------------------------------------
 
-def get_table_list(connection_string: str) -> list[dict]:
+def get_table_list(connection_string: str, db_dialect: Optional[str] = None) -> list[dict]:
     """
     Return a lightweight list of tables and their column counts.
     Used by the frontend schema explorer sidebar.
 
+    Read from the same cached SchemaSnapshot as the prompt context, so no
+    per-table catalog queries are issued once the schema is warm.
+
     Returns:
         [{ "table": "sensors", "columns": 8 }, ...]
     """
     try:
-        engine    = _get_engine(connection_string)
-        inspector = inspect(engine)
-        tables    = []
-        for table_name in inspector.get_table_names():
-            try:
-                cols = inspector.get_columns(table_name)
-                tables.append({"table": table_name, "columns": len(cols)})
-            except Exception:
-                tables.append({"table": table_name, "columns": 0})
+        snapshot = load_schema_snapshot(connection_string, db_dialect or detect_dialect(connection_string))
+        tables, _ = table_page(snapshot)
         return tables
     except Exception as exc:
         logger.error(f"[SchemaManager] Table list failed: {exc}")
-        return []
\ No newline at end of file
+        return []
+
+
+def table_page(
+    snapshot: SchemaSnapshot,
+    prefix: Optional[str] = None,
+    offset: int = 0,
+    limit: Optional[int] = None,
+) -> tuple[list[dict], int]:
+    """
+    One page of the snapshot's tables (catalog order), optionally filtered
+    by a case-insensitive name prefix.
+
+    Returns:
+        ([{ "table": "sensors", "columns": 8 }, ...], total tables matching the prefix)
+    """
+    names = snapshot["table_names"]
+    if prefix:
+        needle = prefix.lower()
+        names  = [name for name in names if name.lower().startswith(needle)]
+
+    end  = None if limit is None else offset + limit
+    page = [
+        {"table": name, "columns": len(snapshot["tables"][name]["columns"] or [])}
+        for name in names[offset:end]
+    ]
+    return page, len(names)
+
+
+def schema_etag(snapshot: SchemaSnapshot) -> str:
+    """
+    HTTP entity tag for views derived from a snapshot. Built from the
+    content hash, so it changes exactly when a fingerprint change (or
+    TTL refresh) yields a different reflected schema.
+    """
+    return f'"{snapshot["content_hash"]}"'
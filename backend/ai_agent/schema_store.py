@@ -0,0 +1,162 @@
+"""
+Talk2Tables — Persistent Schema Snapshot Store
+===============================================
+A local SQLite file shared by every uvicorn worker on the host, holding
+reflected SchemaSnapshots keyed by (connection, schema fingerprint).
+
+Production runs `uvicorn main:app --workers 4`, so the in-process schema
+cache alone would be filled four times and lost on every restart. With the
+store, the first worker to reflect a database persists the snapshot and the
+other workers — and every worker after a deploy — load it back with a
+single indexed read once the cheap fingerprint query confirms the schema is
+unchanged.
+
+  - Keys     : sha256 of the connection string (credentials are never stored)
+               + the fingerprint from schema_cache.compute_schema_fingerprint()
+  - Payload  : zlib-compressed JSON of the snapshot's table metadata
+  - Safety   : WAL journal + busy timeout for concurrent multi-process access;
+               any store error is logged and treated as a miss
+  - Location : SCHEMA_SNAPSHOT_STORE_PATH, by default backend/data/schema_snapshots.db
+               (created on first use); an empty string disables the store
+
+Author  : Member 1 (Backend Lead)
+Project : Talk2Tables — Diploma Final Year Project
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from contextlib import closing
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------------
+# Default: backend/data/ (git-ignored), whatever directory the server is started from
+_DEFAULT_STORE_PATH        = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "schema_snapshots.db"
+)
+SCHEMA_SNAPSHOT_STORE_PATH = os.environ.get("SCHEMA_SNAPSHOT_STORE_PATH", _DEFAULT_STORE_PATH)
+SCHEMA_SNAPSHOT_MAX_AGE_S  = int(os.environ.get("SCHEMA_SNAPSHOT_MAX_AGE_S", "86400"))
+_KEEP_PER_CONNECTION       = 3      # Older fingerprints per connection are pruned on save
+_BUSY_TIMEOUT_MS           = 2_000
+
+_CREATE_SQL = """
+CREATE TABLE IF NOT EXISTS schema_snapshots (
+    conn_key     TEXT NOT NULL,
+    fingerprint  TEXT NOT NULL,
+    db_dialect   TEXT NOT NULL,
+    payload      BLOB NOT NULL,
+    saved_at     REAL NOT NULL,
+    PRIMARY KEY (conn_key, fingerprint)
+)
+"""
+
+
+def connection_key(connection_string: str) -> str:
+    """Stable, credential-free identifier for a connection string."""
+    return hashlib.sha256(connection_string.encode("utf-8")).hexdigest()[:32]
+
+
+class SchemaSnapshotStore:
+    """
+    Process-safe SQLite store of serialised schema snapshots.
+    A short-lived sqlite3 connection is opened per operation, so the store
+    is safe to use from the reflection thread pool and from many processes.
+    """
+
+    def __init__(self, path: str = SCHEMA_SNAPSHOT_STORE_PATH, max_age_s: int = SCHEMA_SNAPSHOT_MAX_AGE_S):
+        self.path      = path
+        self.max_age_s = max_age_s
+        self._ready    = False
+        self._lock     = threading.Lock()
+        self._stats    = {"hits": 0, "misses": 0, "writes": 0, "errors": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    def load(self, connection_string: str, fingerprint: str) -> Optional[dict[str, Any]]:
+        """
+        Return the stored payload dict ({"table_names", "tables", "schema_text",
+        "content_hash", "db_dialect", "saved_at"}) for this connection +
+        fingerprint, or None if absent, older than SCHEMA_SNAPSHOT_MAX_AGE_S,
+        or unreadable. saved_at is the wall-clock time.time() of the save.
+        """
+        if not self.enabled:
+            return None
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT payload, saved_at FROM schema_snapshots "
+                    "WHERE conn_key = ? AND fingerprint = ?",
+                    (connection_key(connection_string), fingerprint),
+                ).fetchone()
+            if row is None or time.time() - row[1] > self.max_age_s:
+                self._count("misses")
+                return None
+            payload = json.loads(zlib.decompress(row[0]).decode("utf-8"))
+            payload["saved_at"] = row[1]
+        except Exception as exc:
+            self._count("errors")
+            logger.warning(f"[SchemaStore] Load failed ({self.path}): {exc}")
+            return None
+        self._count("hits")
+        return payload
+
+    def save(self, connection_string: str, fingerprint: str, payload: dict[str, Any]) -> None:
+        """Persist a snapshot payload and prune older fingerprints for the connection."""
+        if not self.enabled:
+            return
+        key = connection_key(connection_string)
+        try:
+            blob = zlib.compress(json.dumps(payload, default=str).encode("utf-8"), 6)
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO schema_snapshots "
+                    "(conn_key, fingerprint, db_dialect, payload, saved_at) VALUES (?, ?, ?, ?, ?)",
+                    (key, fingerprint, payload.get("db_dialect", ""), blob, time.time()),
+                )
+                conn.execute(
+                    "DELETE FROM schema_snapshots WHERE conn_key = ? AND fingerprint NOT IN ("
+                    "  SELECT fingerprint FROM schema_snapshots WHERE conn_key = ? "
+                    "  ORDER BY saved_at DESC LIMIT ?)",
+                    (key, key, _KEEP_PER_CONNECTION),
+                )
+        except Exception as exc:
+            self._count("errors")
+            logger.warning(f"[SchemaStore] Save failed ({self.path}): {exc}")
+            return
+        self._count("writes")
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {**self._stats, "enabled": self.enabled}
+
+    # ── Internals ─────────────────────────────────────────────────────────
+    def _connect(self) -> "closing[sqlite3.Connection]":
+        if not self._ready:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=_BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+        conn.execute(f"PRAGMA busy_timeout = {_BUSY_TIMEOUT_MS}")
+        if not self._ready:
+            with self._lock:
+                if not self._ready:
+                    conn.execute("PRAGMA journal_mode = WAL")  # Readers never block the writer
+                    conn.execute(_CREATE_SQL)
+                    self._ready = True
+        return closing(conn)  # Close (not just commit) when the `with` block exits
+
+    def _count(self, stat: str) -> None:
+        with self._lock:
+            self._stats[stat] += 1
+
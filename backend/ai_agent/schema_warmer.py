@@ -0,0 +1,214 @@
+"""
+Talk2Tables — Background Schema Warmer
+=======================================
+Keeps the schema cache warm so that no user pays for a full reflection:
+
+  - At startup  : every known connection is reflected (or loaded from the
+                  shared snapshot store) before the first question arrives.
+  - On schedule : entries older than SCHEMA_WARMER_REFRESH_FRACTION × TTL are
+                  refreshed in the background, so they never expire under a
+                  user request.
+
+"Known connections" are the connection strings listed in
+SCHEMA_WARM_CONNECTIONS plus every connection the agent has served
+(remember_connection() is called from graph.node_load_schema). Served
+connections that go unused for SCHEMA_WARMER_IDLE_S are dropped again.
+
+At most SCHEMA_WARMER_CONCURRENCY connections are warmed at a time, and the
+work itself runs on the reflection thread pool via aload_schema_snapshot(),
+so the event loop is never blocked and requests for a connection that is
+being warmed join the same in-flight reflection.
+
+Started / stopped from main.lifespan; get_warmer_status() is shown on /health.
+
+Author  : Member 1 (Backend Lead)
+Project : Talk2Tables — Diploma Final Year Project
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Optional
+
+from .engine_registry import redact_connection_string
+from .schema_cache import SCHEMA_CACHE_TTL_S
+from .schema_manager import aload_schema_snapshot, detect_dialect, peek_schema_snapshot
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------------
+SCHEMA_WARMER_ENABLED          = os.environ.get("SCHEMA_WARMER_ENABLED", "true").lower() == "true"
+SCHEMA_WARM_CONNECTIONS        = [
+    url.strip() for url in os.environ.get("SCHEMA_WARM_CONNECTIONS", "").split(",") if url.strip()
+]
+SCHEMA_WARMER_CONCURRENCY      = int(os.environ.get("SCHEMA_WARMER_CONCURRENCY", "2"))
+SCHEMA_WARMER_INTERVAL_S       = int(os.environ.get("SCHEMA_WARMER_INTERVAL_S", "60"))
+SCHEMA_WARMER_REFRESH_FRACTION = float(os.environ.get("SCHEMA_WARMER_REFRESH_FRACTION", "0.8"))
+SCHEMA_WARMER_IDLE_S           = int(os.environ.get("SCHEMA_WARMER_IDLE_S", "86400"))
+
+# connection_string → { dialect, source, last_used, last_warmed, last_error, warming }
+_connections: dict[str, dict[str, Any]] = {}
+_task: Optional[asyncio.Task] = None
+
+
+# ---------------------------------------------------------------------------
+# Public API
+# ---------------------------------------------------------------------------
+
+def remember_connection(connection_string: str, db_dialect: str) -> None:
+    """Record that the agent served this connection, so the warmer keeps it warm."""
+    entry = _connections.get(connection_string)
+    if entry is None:
+        entry = _connections[connection_string] = _new_entry(db_dialect, source="seen")
+    entry["last_used"] = time.time()
+
+
+def start_schema_warmer() -> bool:
+    """
+    Start the background warm-up loop on the running event loop.
+    Called from main.lifespan on startup. Returns False if disabled.
+    """
+    global _task
+    if not SCHEMA_WARMER_ENABLED:
+        logger.info("[SchemaWarmer] Disabled (SCHEMA_WARMER_ENABLED=false).")
+        return False
+    if _task is not None and not _task.done():
+        return True
+
+    for connection_string in SCHEMA_WARM_CONNECTIONS:
+        _connections.setdefault(
+            connection_string, _new_entry(detect_dialect(connection_string), source="config")
+        )
+    _task = asyncio.get_running_loop().create_task(_run(), name="schema-warmer")
+    logger.info(
+        f"[SchemaWarmer] Started | {len(SCHEMA_WARM_CONNECTIONS)} configured connection(s) | "
+        f"concurrency={SCHEMA_WARMER_CONCURRENCY} | interval={SCHEMA_WARMER_INTERVAL_S}s"
+    )
+    return True
+
+
+async def stop_schema_warmer() -> None:
+    """Cancel the warm-up loop. Called from main.lifespan on shutdown."""
+    global _task
+    if _task is None:
+        return
+    _task.cancel()
+    try:
+        await _task
+    except asyncio.CancelledError:
+        pass
+    _task = None
+
+
+def get_warmer_status() -> dict[str, Any]:
+    """
+    Per-connection warm/cold status for GET /health. Passwords are masked.
+
+    Returns:
+        {
+          "enabled": True, "running": True,
+          "connections": [{ "connection": "mysql+pymysql://u:***@h/db", "source": "config",
+                            "status": "warm", "age_s": 123.4, "tables": 42,
+                            "last_error": None }, ...]
+        }
+    """
+    now   = time.monotonic()
+    items = []
+    for connection_string, entry in list(_connections.items()):
+        snapshot = peek_schema_snapshot(connection_string)
+        age_s    = (now - snapshot["loaded_at"]) if snapshot is not None else None
+        if entry["warming"]:
+            state = "warming"
+        elif age_s is not None and age_s <= SCHEMA_CACHE_TTL_S:
+            state = "warm"
+        elif entry["last_error"]:
+            state = "error"
+        else:
+            state = "cold"
+        items.append({
+            "connection": redact_connection_string(connection_string),
+            "source":     entry["source"],
+            "status":     state,
+            "age_s":      round(age_s, 1) if age_s is not None else None,
+            "tables":     len(snapshot["table_names"]) if snapshot is not None else None,
+            "last_error": entry["last_error"],
+        })
+    return {
+        "enabled":     SCHEMA_WARMER_ENABLED,
+        "running":     _task is not None and not _task.done(),
+        "connections": items,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Internal helpers
+# ---------------------------------------------------------------------------
+
+def _new_entry(db_dialect: str, source: str) -> dict[str, Any]:
+    return {
+        "dialect":     db_dialect,
+        "source":      source,
+        "last_used":   time.time(),
+        "last_warmed": None,
+        "last_error":  None,
+        "warming":     False,
+    }
+
+
+async def _run() -> None:
+    """Warm everything once, then re-check every SCHEMA_WARMER_INTERVAL_S."""
+    semaphore = asyncio.Semaphore(max(SCHEMA_WARMER_CONCURRENCY, 1))
+    while True:
+        try:
+            await _warm_due(semaphore)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:  # Never let one bad pass kill the loop
+            logger.error(f"[SchemaWarmer] Warm-up pass failed: {exc}")
+        await asyncio.sleep(max(SCHEMA_WARMER_INTERVAL_S, 1))
+
+
+async def _warm_due(semaphore: asyncio.Semaphore) -> None:
+    """Warm every connection that is cold or older than the refresh age; drop idle ones."""
+    now         = time.time()
+    refresh_age = SCHEMA_CACHE_TTL_S * SCHEMA_WARMER_REFRESH_FRACTION
+
+    due: list[str] = []
+    for connection_string, entry in list(_connections.items()):
+        if entry["source"] == "seen" and now - entry["last_used"] > SCHEMA_WARMER_IDLE_S:
+            del _connections[connection_string]
+            continue
+        snapshot = peek_schema_snapshot(connection_string)
+        if snapshot is None or time.monotonic() - snapshot["loaded_at"] >= refresh_age:
+            due.append(connection_string)
+
+    if due:
+        await asyncio.gather(*(_warm_one(semaphore, cs) for cs in due))
+
+
+async def _warm_one(semaphore: asyncio.Semaphore, connection_string: str) -> None:
+    entry = _connections.get(connection_string)
+    if entry is None:
+        return
+    async with semaphore:
+        entry["warming"] = True
+        t_start = time.perf_counter()
+        try:
+            # force_refresh: renew the entry even though it is still within its TTL
+            snapshot = await aload_schema_snapshot(connection_string, entry["dialect"], force_refresh=True)
+            entry["last_warmed"] = time.time()
+            entry["last_error"]  = None
+            logger.info(
+                f"[SchemaWarmer] Warmed {redact_connection_string(connection_string)} | "
+                f"{len(snapshot['table_names'])} tables | {(time.perf_counter() - t_start) * 1000:.0f}ms"
+            )
+        except Exception as exc:
+            entry["last_error"] = str(exc)[:200]
+            logger.warning(f"[SchemaWarmer] Warm-up failed for {redact_connection_string(connection_string)}: {exc}")
+        finally:
+            entry["warming"] = False
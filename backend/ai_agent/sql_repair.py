@@ -0,0 +1,277 @@
+"""
+Talk2Tables — Local SQL Repair
+===============================
+Deterministic fixes for LLM output that failed validation (or execution)
+for purely mechanical reasons, tried before spending another LLM call
+(a full system-prompt rebuild plus a multi-second round trip):
+
+  - code_fence     : SQL wrapped in a ``` block, anywhere in the reply
+  - leading_prose  : "Here is the query:" (or any sentence) before the SQL
+  - trailing_prose : a `;` followed by an explanation, or an explanation
+                     paragraph after the statement
+  - dialect_limit  : LIMIT / TOP / FETCH FIRST in the wrong dialect
+                     (SELECT … LIMIT n on MSSQL → SELECT TOP n …, etc.)
+
+A repair is only accepted when the result passes validate_sql() as a
+SELECT — or, for a WRITE_OP: reply, as the same WRITE_OP directive — so a
+repair can never turn into an unconfirmed write. A `;` followed by another
+statement is never cut, and neither is a statement before the SQL (a
+prefix with a `;` or a line that starts like a statement): that is a
+stacked query, not prose, and it goes to the LLM retry (with the
+validator's error) as before.
+
+graph.node_repair_sql runs this once per generated SQL; counters are on
+GET /health under sql_repair.
+
+Author  : Member 1 (Backend Lead)
+Project : Talk2Tables — Diploma Final Year Project
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import re
+import threading
+from collections import Counter
+from typing import Any, Optional
+
+from typing_extensions import TypedDict
+
+from .sql_validator import validate_sql
+from .state import ValidationResult
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------------
+SQL_REPAIR_ENABLED = os.environ.get("SQL_REPAIR_ENABLED", "true").lower() == "true"
+
+_WRITE_OP_PREFIX = "WRITE_OP:"
+
+_FENCE          = re.compile(r"```[A-Za-z]*[ \t]*\n?(.*?)(?:```|$)", re.DOTALL)
+_SELECT_START   = re.compile(r"(?:^|(?<=:)|(?<=\n))\s*\b(WITH|SELECT)\b", re.IGNORECASE)
+_WRITE_START    = re.compile(r"(?:^|(?<=:)|(?<=\n))\s*\b(INSERT|UPDATE|DELETE|MERGE|REPLACE)\b", re.IGNORECASE)
+_STATEMENT_HEAD = re.compile(
+    r"^\s*(SELECT|WITH|INSERT|UPDATE|DELETE|MERGE|REPLACE|DROP|TRUNCATE|CREATE|ALTER|RENAME|GRANT|"
+    r"REVOKE|EXEC|EXECUTE|CALL|SET|DECLARE|USE|SHOW|DESCRIBE|PRAGMA|BEGIN|COMMIT|ROLLBACK)\b",
+    re.IGNORECASE,
+)
+_WORD           = re.compile(r"[A-Za-z_]+")
+# Words a line of the same SQL statement can start with
+_SQL_CONTINUATION = frozenset((
+    "select with from where join left right inner outer full cross natural on using and or not "
+    "group order having limit offset fetch union intersect except all distinct as case when then "
+    "else end between like in is exists window partition over top values set into returning"
+).split())
+
+_LIMIT_TAIL = re.compile(r"\s+LIMIT\s+(\d+)\s*;?\s*$", re.IGNORECASE)
+_TOP_HEAD   = re.compile(r"^(\s*SELECT(?:\s+DISTINCT)?)\s+TOP\s*\(?\s*(\d+)\s*\)?\s+", re.IGNORECASE)
+_FETCH_TAIL = re.compile(r"\s+FETCH\s+(?:FIRST|NEXT)\s+(\d+)\s+ROWS?\s+ONLY\s*;?\s*$", re.IGNORECASE)
+_SELECT_HEAD = re.compile(r"^(\s*SELECT(?:\s+DISTINCT)?)\b", re.IGNORECASE)
+
+
+class RepairResult(TypedDict):
+    sql:        str                # Repaired SQL (WRITE_OP: directive kept)
+    fixes:      list[str]          # Names of the fixes that changed something, in order
+    validation: ValidationResult   # validate_sql() result of the repaired SQL
+
+
+# ---------------------------------------------------------------------------
+# Entry point
+# ---------------------------------------------------------------------------
+
+def repair_sql(
+    raw_sql:    str,
+    db_dialect: str,
+    user_role:  str,
+    origin:     str = "validation",
+) -> Optional[RepairResult]:
+    """
+    Try the deterministic fixes on SQL that failed, then re-validate.
+
+    Args:
+        raw_sql    : SQL that failed validation (generated_sql) or execution (sanitized_sql)
+        db_dialect : Target dialect, for the LIMIT / TOP / FETCH FIRST fix
+        user_role  : RBAC role, passed to validate_sql()
+        origin     : "validation" or "execution" — only used for the counters
+
+    Returns:
+        The repaired SQL with the fixes applied and its validation result,
+        or None when nothing could be fixed or the result still fails.
+    """
+    with _lock:
+        _stats["attempts"] += 1
+        _stats[f"attempts_{origin}"] += 1
+
+    text  = raw_sql.strip()
+    write = text.upper().startswith(_WRITE_OP_PREFIX)
+    if write:
+        text = text[len(_WRITE_OP_PREFIX):].strip()
+
+    fixes: list[str] = []
+    for name, fix in _FIXES:
+        fixed = fix(text, db_dialect, write)
+        if fixed is not None and fixed.strip() != text:
+            text = fixed.strip()
+            fixes.append(name)
+
+    if not fixes or not text:
+        return _failed(origin, "nothing to fix")
+
+    candidate = f"{_WRITE_OP_PREFIX} {text}" if write else text
+    result, _ = validate_sql(candidate, user_role=user_role, db_dialect=db_dialect)
+    if not result["is_valid"] or result["operation_type"] != ("WRITE_OP" if write else "SELECT"):
+        return _failed(origin, result["error"] or f"repaired SQL is {result['operation_type']}")
+
+    with _lock:
+        _stats["repaired"] += 1
+        _stats[f"repaired_{origin}"] += 1
+        for name in fixes:
+            _fix_stats[name] += 1
+    logger.info(f"[SQLRepair] Repaired without the LLM ({origin}) | fixes={','.join(fixes)}")
+    return RepairResult(sql=candidate, fixes=fixes, validation=result)
+
+
+def _failed(origin: str, reason: str) -> None:
+    with _lock:
+        _stats["failed"] += 1
+    logger.info(f"[SQLRepair] No local repair ({origin}): {reason}")
+    return None
+
+
+# ---------------------------------------------------------------------------
+# Fixes — each returns the fixed text, or None when it does not apply
+# ---------------------------------------------------------------------------
+
+def _fix_code_fence(text: str, dialect: str, write: bool) -> Optional[str]:
+    if "```" not in text:
+        return None
+    match = _FENCE.search(text)
+    return match.group(1) if match and match.group(1).strip() else None
+
+
+def _fix_leading_prose(text: str, dialect: str, write: bool) -> Optional[str]:
+    match = (_WRITE_START if write else _SELECT_START).search(text)
+    if match is None or match.start(1) == 0:
+        return None
+    prefix = text[:match.start(1)]
+    if ";" in prefix or any(_STATEMENT_HEAD.match(line) for line in prefix.splitlines()):
+        return None  # An earlier statement, not prose: never drop it
+    return text[match.start(1):]
+
+
+def _fix_trailing_prose(text: str, dialect: str, write: bool) -> Optional[str]:
+    # 1. A top-level `;` followed by prose — but never by another statement
+    end = _statement_end(text)
+    if end is not None and text[end + 1:].strip():
+        if _STATEMENT_HEAD.match(text[end + 1:]):
+            return None  # Stacked statement: leave it to the validator and the LLM
+        return text[:end]
+
+    # 2. An explanation paragraph after a blank line
+    blocks = re.split(r"\n\s*\n", text)
+    if len(blocks) < 2:
+        return None
+    kept = [blocks[0]]
+    for block in blocks[1:]:
+        first = _WORD.match(block.strip())
+        if block.strip().startswith(("(", ")", "--")) or (first and first.group(0).lower() in _SQL_CONTINUATION):
+            kept.append(block)
+        else:
+            break
+    return "\n\n".join(kept) if len(kept) < len(blocks) else None
+
+
+def _fix_dialect_limit(text: str, dialect: str, write: bool) -> Optional[str]:
+    if write or not _SELECT_HEAD.match(text):
+        return None  # Only a plain top-level SELECT is rewritten (not CTEs or writes)
+
+    if dialect == "mssql":
+        limit = _LIMIT_TAIL.search(text)
+        if limit is None or _TOP_HEAD.match(text):
+            return None
+        body = text[:limit.start()]
+        return _SELECT_HEAD.sub(lambda m: f"{m.group(1)} TOP {limit.group(1)}", body, count=1)
+
+    if dialect == "oracle":
+        limit = _LIMIT_TAIL.search(text)
+        if limit is None:
+            return None
+        return f"{text[:limit.start()]} FETCH FIRST {limit.group(1)} ROWS ONLY"
+
+    # LIMIT dialects (mysql, postgresql, sqlite, ...)
+    top = _TOP_HEAD.match(text)
+    if top is not None and not _LIMIT_TAIL.search(text):
+        return f"{top.group(1)} {text[top.end():].rstrip().rstrip(';')} LIMIT {top.group(2)}"
+    fetch = _FETCH_TAIL.search(text)
+    if fetch is not None and dialect != "postgresql":  # PostgreSQL accepts FETCH FIRST
+        return f"{text[:fetch.start()]} LIMIT {fetch.group(1)}"
+    return None
+
+
+_FIXES = (
+    ("code_fence",     _fix_code_fence),
+    ("leading_prose",  _fix_leading_prose),
+    ("trailing_prose", _fix_trailing_prose),
+    ("dialect_limit",  _fix_dialect_limit),
+)
+
+
+def _statement_end(text: str) -> Optional[int]:
+    """Index of the first `;` outside quotes and comments, or None."""
+    quote: Optional[str] = None
+    i = 0
+    while i < len(text):
+        char = text[i]
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in ("'", '"', "`"):
+            quote = char
+        elif text.startswith("--", i):
+            newline = text.find("\n", i)
+            if newline == -1:
+                return None
+            i = newline
+        elif text.startswith("/*", i):
+            close = text.find("*/", i + 2)
+            if close == -1:
+                return None
+            i = close + 1
+        elif char == ";":
+            return i
+        i += 1
+    return None
+
+
+# ---------------------------------------------------------------------------
+# Statistics (per process, shown on GET /health)
+# ---------------------------------------------------------------------------
+_stats:     Counter = Counter()
+_fix_stats: Counter = Counter()
+_lock = threading.Lock()
+
+
+def get_sql_repair_stats() -> dict[str, Any]:
+    """
+    Returns:
+        { "enabled": True, "attempts": 12, "repaired": 9, "failed": 3,
+          "success_rate": 0.75, "by_origin": { "validation": {...}, "execution": {...} },
+          "fixes": { "code_fence": 4, "trailing_prose": 5, ... } }
+    """
+    with _lock:
+        attempts = _stats["attempts"]
+        return {
+            "enabled":      SQL_REPAIR_ENABLED,
+            "attempts":     attempts,
+            "repaired":     _stats["repaired"],
+            "failed":       _stats["failed"],
+            "success_rate": round(_stats["repaired"] / attempts, 3) if attempts else 0.0,
+            "by_origin":    {
+                origin: {"attempts": _stats[f"attempts_{origin}"], "repaired": _stats[f"repaired_{origin}"]}
+                for origin in ("validation", "execution")
+            },
+            "fixes":        dict(_fix_stats),
+        }
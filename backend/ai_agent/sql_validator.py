@@ -9,7 +9,8 @@ Stages (in order):
   3. Operation Type   — Classify SELECT / INSERT / UPDATE / DELETE / DDL
   4. DDL Guard        — Block DROP, CREATE, ALTER, TRUNCATE
   5. Injection Guard  — Block stacked queries, EXEC, system tables, xp_cmdshell
-  6. Row Limit        — Enforce LIMIT on SELECT queries
+  6. Row Limit        — Enforce a row limit on SELECT queries, in the dialect's
+                        syntax (LIMIT / TOP / FETCH FIRST)
   7. Risk Assessment  — Assign safe / moderate / high risk level
 
 Author  : Member 1 (Backend Lead)
@@ -37,6 +38,9 @@ logger = logging.getLogger(__name__)
 # Maximum rows enforced if LLM forgets to add LIMIT
 DEFAULT_SELECT_LIMIT = 1000
 
+# Start of a plain top-level SELECT — where MSSQL's TOP n goes
+_SELECT_HEAD = re.compile(r"^(\s*SELECT(?:\s+DISTINCT)?)\b", re.IGNORECASE)
+
 # Patterns that indicate SQL injection or dangerous commands
 _INJECTION_PATTERNS: list[re.Pattern] = [
     re.compile(r";\s*\S",          re.IGNORECASE),  # Stacked queries
@@ -77,7 +81,7 @@ def validate_sql(
     raw_sql: str,
     user_role: str = "viewer",
     db_dialect: str = "mysql",
-) -> ValidationResult:
+) -> tuple[ValidationResult, Optional[str]]:
     """
     Run the full multi-stage SQL validation pipeline.
 
@@ -87,7 +91,8 @@ def validate_sql(
         db_dialect : Target DB dialect (used for dialect-specific checks)
 
     Returns:
-        ValidationResult TypedDict with is_valid, operation_type, sanitized_sql, etc.
+        (ValidationResult TypedDict with is_valid, operation_type, sanitized_sql, etc.,
+         clarification question for CLARIFY directives, else None)
     """
     stripped = raw_sql.strip()
 
@@ -153,8 +158,10 @@ def validate_sql(
     # ── Stage 8: Enforce SELECT row limit ────────────────────────────────
     sanitized = stripped
     if op_type == "SELECT" and not _has_limit(stripped):
-        sanitized = f"{stripped.rstrip(';')} LIMIT {DEFAULT_SELECT_LIMIT}"
-        logger.info(f"[Validator] LIMIT {DEFAULT_SELECT_LIMIT} auto-applied to SELECT query.")
+        limited = _with_row_limit(stripped, db_dialect)
+        if limited is not None:
+            sanitized = limited
+            logger.info(f"[Validator] Row limit {DEFAULT_SELECT_LIMIT} auto-applied to SELECT query ({db_dialect}).")
 
     # ── Stage 9: Risk Assessment ─────────────────────────────────────────
     risk = _assess_risk(op_type, sanitized)
@@ -197,14 +204,14 @@ def validate_confirmed_write(
 # Internal helpers
 # ---------------------------------------------------------------------------
 
-def _fail(error_msg: str) -> tuple[ValidationResult, None]:
+def _fail(error_msg: str) -> ValidationResult:
     return ValidationResult(
         is_valid       = False,
         operation_type = "UNKNOWN",
         error          = error_msg,
         sanitized_sql  = None,
         risk_level     = "high",
-    ), None
+    )
 
 
 def _check_injection(sql: str) -> Optional[str]:
@@ -246,6 +253,24 @@ def _has_limit(sql: str) -> bool:
     )
 
 
+def _with_row_limit(sql: str, db_dialect: str) -> Optional[str]:
+    """
+    The SELECT capped at DEFAULT_SELECT_LIMIT rows in the dialect's syntax:
+    TOP n for MSSQL, FETCH FIRST n ROWS ONLY for Oracle, LIMIT n elsewhere.
+    None for an MSSQL query that does not start with SELECT (e.g. a CTE);
+    the executor's fetch cap still bounds it.
+    """
+    body = sql.rstrip().rstrip(";").rstrip()
+    if db_dialect == "mssql":
+        head = _SELECT_HEAD.match(body)
+        if head is None:
+            return None
+        return f"{head.group(1)} TOP {DEFAULT_SELECT_LIMIT}{body[head.end():]}"
+    if db_dialect == "oracle":
+        return f"{body} FETCH FIRST {DEFAULT_SELECT_LIMIT} ROWS ONLY"
+    return f"{body} LIMIT {DEFAULT_SELECT_LIMIT}"
+
+
 def _assess_risk(op_type: str, sql: str) -> str:
     """
     Assign a risk level based on operation type and SQL content.
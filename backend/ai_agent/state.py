@@ -44,7 +44,7 @@ class AgentState(TypedDict):
 
     Lifecycle:
         START → load_schema → generate_sql → classify_and_validate
-                → [execute_query | return_preview | return_clarification | retry_generate]
+                → [execute_query | return_preview | return_clarification | repair_sql | retry_generate]
                 → format_results → END
     """
 
@@ -93,10 +93,28 @@ class AgentState(TypedDict):
     clarification_question: Optional[str]
     """If the LLM returns CLARIFY:, this holds the question to ask the user."""
 
+    sql_source: Optional[Literal["llm", "cache", "semantic_cache", "fast_path"]]
+    """Where generated_sql came from: a provider call, an exact or a paraphrase query cache hit, or a fast-path template."""
+
+    sql_cache_key: Optional[str]
+    """Query cache key for this question (set by load_schema; None when caching is off)."""
+
+    sql_cache_scope: Optional[str]
+    """Semantic cache scope (connection, schema, dialect, role, history tail)."""
+
+    sql_cache_hit_key: Optional[str]
+    """Key of the cache entry that supplied generated_sql on a hit; dropped if that SQL fails."""
+
+    prompt_tokens: Optional[int]
+    """Estimated prompt tokens of the last LLM call, after token-budget trimming."""
+
     # ── Validation (populated by classify_and_validate node) ──────────────
     validation_result: Optional[ValidationResult]
     """Full structured output from the SQL safety & validation pipeline."""
 
+    sql_repair_attempted: bool
+    """Local repair (sql_repair.py) already tried on the current generated_sql; reset by generate_sql."""
+
     retry_count: int
     """Number of SQL generation retries attempted. Max = 2 (per spec)."""
 
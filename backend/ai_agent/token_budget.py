@@ -0,0 +1,198 @@
+"""
+Talk2Tables — Token-Budgeted Prompt Assembly
+=============================================
+Fits every LLM request into the active model's context window instead of
+always sending the full schema, full doc context and the last
+MAX_HISTORY_TURNS turns regardless of their length.
+
+  - Estimator : estimate_tokens() — characters per token by model family
+                (SQL DDL is token-dense, so ratios are conservative);
+                non-ASCII characters (Hindi, box-drawing rules) count as
+                one token each. No tokenizer download, no network.
+  - Budget    : the provider's context window (LLMProvider.context_tokens)
+                minus the completion reserve (DEFAULT_MAX_TOKENS), capped
+                by LLM_PROMPT_TOKEN_BUDGET when set.
+  - Trimming  : the system rules and the current question are never cut.
+                While over budget, the lowest-value part goes first:
+                  1. older history turns (the newest exchange is kept)
+                  2. doc context, from its last (least relevant) excerpt
+                  3. the newest history exchange
+                  4. schema, from its last (least relevant) table block
+
+plan_prompt() returns the assembled system prompt, the history to send and
+a per-part token breakdown; graph.node_generate_sql reports the total.
+
+Author  : Member 1 (Backend Lead)
+Project : Talk2Tables — Diploma Final Year Project
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+import os
+from typing import Optional
+
+from typing_extensions import TypedDict
+
+from .prompts import build_system_prompt
+from .state import ChatMessage
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------------
+LLM_PROMPT_TOKEN_BUDGET = int(os.environ.get("LLM_PROMPT_TOKEN_BUDGET", "0"))   # 0 = context window only
+COMPLETION_RESERVE      = 1024   # Matches llm_provider.DEFAULT_MAX_TOKENS
+MESSAGE_OVERHEAD_TOKENS = 4      # Role / separator tokens per chat message
+
+# Average characters per token for ASCII text, by model family (first match wins)
+_CHARS_PER_TOKEN: tuple[tuple[str, float], ...] = (
+    ("gemini",  4.0),
+    ("qwen",    3.3),
+    ("llama",   3.6),
+    ("mistral", 3.4),
+    ("mixtral", 3.4),
+    ("gpt",     3.8),
+)
+_DEFAULT_CHARS_PER_TOKEN = 3.5
+
+_DOC_TRIM_MARKER    = "\n\n... [further doc excerpts omitted to fit the model context]"
+_SCHEMA_TRIM_MARKER = "\n\n... [further tables omitted to fit the model context]"
+
+
+class PromptPlan(TypedDict):
+    system_prompt: str
+    chat_history:  list[ChatMessage]
+    tokens:        dict[str, int]   # rules / schema / docs / history / question / total
+    budget:        int
+    trimmed:       list[str]        # Parts that were cut, in order
+
+
+# ---------------------------------------------------------------------------
+# Estimation
+# ---------------------------------------------------------------------------
+
+def estimate_tokens(text: Optional[str], model: str = "") -> int:
+    """Approximate token count of text for the given model name."""
+    if not text:
+        return 0
+    model = model.lower()
+    ratio = next((r for family, r in _CHARS_PER_TOKEN if family in model), _DEFAULT_CHARS_PER_TOKEN)
+    non_ascii = sum(1 for char in text if ord(char) > 127)
+    return math.ceil((len(text) - non_ascii) / ratio) + non_ascii
+
+
+def prompt_budget(context_tokens: int) -> int:
+    """Prompt tokens available for one request on a model with this context window."""
+    budget = max(context_tokens - COMPLETION_RESERVE, 0)
+    if LLM_PROMPT_TOKEN_BUDGET > 0:
+        budget = min(budget, LLM_PROMPT_TOKEN_BUDGET)
+    return budget
+
+
+# ---------------------------------------------------------------------------
+# Planning
+# ---------------------------------------------------------------------------
+
+def plan_prompt(
+    db_dialect:     str,
+    schema_context: str,
+    doc_context:    Optional[str],
+    chat_history:   list[ChatMessage],
+    user_message:   str,
+    model:          str,
+    context_tokens: int,
+) -> PromptPlan:
+    """
+    Assemble the system prompt and history for one request within the budget.
+
+    Args:
+        db_dialect     : Database dialect (mysql, postgresql, ...)
+        schema_context : Schema text from render_schema_context()
+        doc_context    : Doc excerpts from get_doc_context(), or None
+        chat_history   : Conversation so far (capped at MAX_HISTORY_TURNS here)
+        user_message   : The current question (or retry message)
+        model          : Model name, used to pick the estimation ratio
+        context_tokens : Context window of the provider that will be called
+    """
+    budget  = prompt_budget(context_tokens)
+    trimmed: list[str] = []
+
+    max_turns = int(os.environ.get("MAX_HISTORY_TURNS", "6"))
+    history = [
+        turn for turn in chat_history[-(max_turns * 2):]
+        if turn.get("role") in ("user", "assistant") and turn.get("content")
+    ]
+
+    rules    = estimate_tokens(build_system_prompt(db_dialect, "", None), model) + MESSAGE_OVERHEAD_TOKENS
+    question = estimate_tokens(user_message, model) + MESSAGE_OVERHEAD_TOKENS
+    schema   = estimate_tokens(schema_context, model)
+    docs     = estimate_tokens(doc_context, model)
+
+    def history_tokens(turns: list[ChatMessage]) -> int:
+        return sum(estimate_tokens(turn["content"], model) + MESSAGE_OVERHEAD_TOKENS for turn in turns)
+
+    def over() -> int:
+        return rules + question + schema + docs + history_tokens(history) - budget
+
+    # 1. Older history turns — keep the newest exchange
+    if over() > 0 and len(history) > 2:
+        while over() > 0 and len(history) > 2:
+            history = history[2:] if len(history) > 3 else history[-2:]
+        trimmed.append("history")
+
+    # 2. Doc context, least relevant excerpts last
+    if over() > 0 and doc_context:
+        doc_context = _trim_blocks(doc_context, max(docs - over(), 0), model, _DOC_TRIM_MARKER)
+        docs = estimate_tokens(doc_context, model)
+        trimmed.append("docs")
+
+    # 3. The newest history exchange
+    if over() > 0 and history:
+        history = []
+        trimmed.append("history")
+
+    # 4. Schema, least relevant tables last
+    if over() > 0 and schema_context:
+        schema_context = _trim_blocks(schema_context, max(schema - over(), 0), model, _SCHEMA_TRIM_MARKER) or ""
+        schema = estimate_tokens(schema_context, model)
+        trimmed.append("schema")
+
+    system_prompt = build_system_prompt(db_dialect, schema_context, doc_context)
+    tokens = {
+        "rules":    rules,
+        "schema":   schema,
+        "docs":     docs,
+        "history":  history_tokens(history),
+        "question": question,
+    }
+    tokens["total"] = sum(tokens.values())
+
+    if tokens["total"] > budget:
+        logger.warning(
+            f"[TokenBudget] Prompt still {tokens['total']} tokens after trimming "
+            f"(budget {budget}) — rules and question alone exceed it"
+        )
+    return PromptPlan(
+        system_prompt = system_prompt,
+        chat_history  = history,
+        tokens        = tokens,
+        budget        = budget,
+        trimmed       = list(dict.fromkeys(trimmed)),
+    )
+
+
+def _trim_blocks(text: str, max_tokens: int, model: str, marker: str) -> Optional[str]:
+    """Keep whole blank-line-separated blocks from the start while they fit; None if none do."""
+    room = max_tokens - estimate_tokens(marker, model)
+    kept: list[str] = []
+    used = 0
+    for block in text.split("\n\n"):
+        size = estimate_tokens(block, model) + 1
+        if used + size > room:
+            break
+        kept.append(block)
+        used += size
+    return "\n\n".join(kept) + marker if kept else None
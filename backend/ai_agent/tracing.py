@@ -0,0 +1,390 @@
+"""
+Talk2Tables — Request Tracing (spans per graph node and LLM call)
+==================================================================
+Lightweight span tracing so a slow /api/query can be broken down into
+reflection, doc fetch, LLM (queueing, 429 retries, failover, hedging),
+validation, repair / retries and DB execution.
+
+  - One trace per HTTP request. main.py's middleware binds X-Request-ID
+    (generated when the client sends none, and echoed on the response); a
+    32-hex / UUID request ID is used as the trace ID as-is, anything else is
+    hashed to one, and the root span carries it as http.request_id.
+  - Spans: the request root, agent.run, one span per graph node (via
+    traced_node in graph.build_agent_graph), schema.load / schema.doc_context
+    inside load_schema, and llm.call per provider HTTP call (with queue wait,
+    429 events and token usage as attributes).
+  - The current span lives in a contextvar, so spans nest correctly across
+    awaits, asyncio.gather and hedged tasks without passing anything around.
+  - Finished traces are exported in OpenTelemetry OTLP/JSON
+    (ExportTraceServiceRequest) by a background thread — appended to a
+    JSONL file (TRACE_EXPORTER=file; readable by the Collector's
+    otlpjsonfile receiver) or POSTed to a collector's /v1/traces
+    (TRACE_EXPORTER=otlp). No OpenTelemetry SDK needed.
+  - stage_timings() sums span durations per stage for an optional
+    "timings_ms" breakdown in final_response (TRACE_TIMINGS_IN_RESPONSE).
+
+Author  : Member 1 (Backend Lead)
+Project : Talk2Tables — Diploma Final Year Project
+"""
+
+from __future__ import annotations
+
+import contextvars
+import functools
+import hashlib
+import json
+import logging
+import os
+import queue
+import re
+import secrets
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Iterator, Optional, TypeVar
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------------
+TRACING_ENABLED           = os.environ.get("TRACING_ENABLED", "true").lower() == "true"
+TRACE_EXPORTER            = os.environ.get("TRACE_EXPORTER", "none").lower()     # none | file | otlp
+TRACE_EXPORT_PATH         = os.environ.get("TRACE_EXPORT_PATH", "traces.otlp.jsonl")
+TRACE_OTLP_ENDPOINT       = os.environ.get("TRACE_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+TRACE_SERVICE_NAME        = os.environ.get("TRACE_SERVICE_NAME", "talk2tables-backend")
+TRACE_TIMINGS_IN_RESPONSE = os.environ.get("TRACE_TIMINGS_IN_RESPONSE", "false").lower() == "true"
+
+_MAX_SPANS_PER_TRACE = 512    # Further spans of one trace are counted as dropped
+_EXPORT_QUEUE_SIZE   = 256    # Finished traces waiting for the exporter thread
+_EXPORT_TIMEOUT_S    = 5
+
+_STATUS_OK    = 1             # OTLP Status.code
+_STATUS_ERROR = 2
+KIND_INTERNAL, KIND_SERVER, KIND_CLIENT = 1, 2, 3   # OTLP SpanKind
+
+_HEX_ID = re.compile(r"[0-9a-f]{32}")
+
+T = TypeVar("T")
+
+
+# ---------------------------------------------------------------------------
+# Spans
+# ---------------------------------------------------------------------------
+class Span:
+    """One timed operation; attributes and events end up in the OTLP export."""
+
+    __slots__ = (
+        "name", "kind", "trace", "span_id", "parent_id", "start_ns", "end_ns",
+        "attributes", "events", "error",
+    )
+
+    def __init__(self, name: str, trace: "_Trace", parent_id: Optional[str], kind: int):
+        self.name       = name
+        self.kind       = kind
+        self.trace      = trace
+        self.span_id    = secrets.token_hex(8)
+        self.parent_id  = parent_id
+        self.start_ns   = time.time_ns()
+        self.end_ns:    Optional[int] = None
+        self.attributes: dict[str, Any] = {}
+        self.events:    list[tuple[int, str, dict[str, Any]]] = []
+        self.error:     Optional[str] = None
+
+    @property
+    def trace_id(self) -> str:
+        return self.trace.trace_id
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        if value is not None:
+            self.attributes[key] = value
+
+    def add_attribute(self, key: str, value: float) -> None:
+        """Accumulate a numeric attribute (e.g. queue wait over several attempts)."""
+        self.attributes[key] = self.attributes.get(key, 0) + value
+
+    def add_event(self, name: str, **attributes: Any) -> None:
+        self.events.append((time.time_ns(), name, attributes))
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+
+class _NoopSpan:
+    """Stands in for Span when tracing is disabled."""
+    trace_id = span_id = None
+
+    def set_attribute(self, key: str, value: Any) -> None: ...
+    def add_attribute(self, key: str, value: float) -> None: ...
+    def add_event(self, name: str, **attributes: Any) -> None: ...
+
+
+class _Trace:
+    __slots__ = ("trace_id", "spans", "dropped")
+
+    def __init__(self, trace_id: str):
+        self.trace_id = trace_id
+        self.spans:   list[Span] = []
+        self.dropped  = 0
+
+
+_NOOP         = _NoopSpan()
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("t2t_span", default=None)
+_request_id:   contextvars.ContextVar[Optional[str]]  = contextvars.ContextVar("t2t_request_id", default=None)
+
+
+def bind_request_id(request_id: str) -> contextvars.Token:
+    """Bind X-Request-ID for this request's context; the next root span uses it as trace ID."""
+    return _request_id.set(request_id)
+
+
+def current_span() -> Span | _NoopSpan:
+    return _current_span.get() or _NOOP
+
+
+@contextmanager
+def span(name: str, kind: int = KIND_INTERNAL, **attributes: Any) -> Iterator[Span | _NoopSpan]:
+    """
+    Time a block as a child of the current span — or as the root of a new
+    trace when there is none; the trace is exported when its root ends.
+    An exception (including cancellation) marks the span as an error.
+    """
+    if not TRACING_ENABLED:
+        yield _NOOP
+        return
+
+    parent        = _current_span.get()
+    is_local_root = parent is None or parent.end_ns is not None
+    if not is_local_root:
+        trace = parent.trace
+        if len(trace.spans) >= _MAX_SPANS_PER_TRACE:
+            trace.dropped += 1
+            yield _NOOP
+            return
+    elif parent is not None:
+        # The parent already ended (e.g. a streamed response body outliving the
+        # request span): same trace and parent, exported as a batch of its own
+        trace = _Trace(parent.trace_id)
+    else:
+        request_id = _request_id.get()
+        trace = _Trace(_trace_id_for(request_id))
+        if request_id:
+            attributes.setdefault("http.request_id", request_id)
+        with _lock:
+            _stats["traces"] += 1
+
+    current = Span(name, trace, parent.span_id if parent else None, kind)
+    current.attributes.update({k: v for k, v in attributes.items() if v is not None})
+    trace.spans.append(current)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as exc:
+        current.error = f"{type(exc).__name__}: {exc}"
+        raise
+    finally:
+        current.end_ns = time.time_ns()
+        _current_span.reset(token)
+        if is_local_root:
+            _finish_trace(trace)
+
+
+async def traced(name: str, awaitable: Awaitable[T], **attributes: Any) -> T:
+    """Await inside a span — for one branch of an asyncio.gather()."""
+    with span(name, **attributes):
+        return await awaitable
+
+
+def traced_node(name: str, node: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
+    """
+    Wrap a LangGraph node coroutine in a span named after the node. functools.wraps
+    keeps the signature, so LangGraph still passes `config` to nodes that take it.
+    """
+    @functools.wraps(node)
+    async def wrapper(state: dict, *args: Any, **kwargs: Any) -> T:
+        with span(name, **{"agent.node": name, "agent.retry_count": state.get("retry_count", 0)}) as current:
+            result = await node(state, *args, **kwargs)
+            if isinstance(result, dict) and result.get("response_type") == "error":
+                current.set_attribute("agent.error", result.get("error_message"))
+            return result
+    return wrapper
+
+
+def stage_timings(root: Span | _NoopSpan) -> Optional[dict[str, float]]:
+    """
+    Milliseconds per stage under `root` (finished spans summed by name, so
+    retries add up), plus "total" so far. None when tracing is disabled.
+
+        { "load_schema": 41.2, "schema.load": 38.0, "generate_sql": 1830.5,
+          "llm.call": 1822.1, "classify_and_validate": 2.1, "execute_query": 12.7,
+          "format_results": 0.4, "total": 1889.6 }
+    """
+    if not isinstance(root, Span):
+        return None
+    totals: dict[str, float] = defaultdict(float)
+    for child in root.trace.spans:
+        if child is not root and child.end_ns is not None and child.start_ns >= root.start_ns:
+            totals[child.name] += child.duration_ms
+    timings = {name: round(ms, 1) for name, ms in totals.items()}
+    timings["total"] = round(root.duration_ms, 1)
+    return timings
+
+
+def _trace_id_for(request_id: Optional[str]) -> str:
+    """The request ID itself when it is a 32-hex / UUID value, else a hash of it; random without one."""
+    if not request_id:
+        return secrets.token_hex(16)
+    compact = request_id.replace("-", "").lower()
+    if _HEX_ID.fullmatch(compact) and compact.strip("0"):
+        return compact
+    return hashlib.sha256(request_id.encode()).hexdigest()[:32]
+
+
+# ---------------------------------------------------------------------------
+# Export — OTLP/JSON from a background thread
+# ---------------------------------------------------------------------------
+_export_queue: "queue.Queue[Optional[_Trace]]" = queue.Queue(maxsize=_EXPORT_QUEUE_SIZE)
+_exporter_thread: Optional[threading.Thread] = None
+_file_lock = threading.Lock()
+
+
+def _finish_trace(trace: _Trace) -> None:
+    with _lock:
+        _stats["spans"]         += len(trace.spans)
+        _stats["dropped_spans"] += trace.dropped
+    if TRACE_EXPORTER not in ("file", "otlp"):
+        return
+    _ensure_exporter()
+    try:
+        _export_queue.put_nowait(trace)
+    except queue.Full:
+        with _lock:
+            _stats["dropped_traces"] += 1
+
+
+def _ensure_exporter() -> None:
+    global _exporter_thread
+    with _lock:
+        if _exporter_thread is None or not _exporter_thread.is_alive():
+            _exporter_thread = threading.Thread(target=_export_loop, name="trace-exporter", daemon=True)
+            _exporter_thread.start()
+
+
+def _export_loop() -> None:
+    while True:
+        trace = _export_queue.get()
+        if trace is None:
+            return
+        try:
+            _export(trace)
+            with _lock:
+                _stats["exported"] += 1
+        except Exception as exc:
+            with _lock:
+                _stats["export_errors"] += 1
+            logger.warning(f"[Tracing] Export to {TRACE_EXPORTER} failed: {exc}")
+
+
+def _export(trace: _Trace) -> None:
+    payload = json.dumps(to_otlp_json(trace), separators=(",", ":"), default=str)
+    if TRACE_EXPORTER == "file":
+        with _file_lock, open(TRACE_EXPORT_PATH, "a", encoding="utf-8") as handle:
+            handle.write(payload + "\n")
+    else:
+        response = httpx.post(
+            TRACE_OTLP_ENDPOINT,
+            content = payload,
+            headers = {"Content-Type": "application/json"},
+            timeout = _EXPORT_TIMEOUT_S,
+        )
+        response.raise_for_status()
+
+
+def shutdown_tracing(timeout_s: float = 5.0) -> None:
+    """Export the traces still queued; called from main.lifespan on shutdown."""
+    thread = _exporter_thread
+    if thread is None or not thread.is_alive():
+        return
+    try:
+        _export_queue.put(None, timeout=timeout_s)
+    except queue.Full:
+        return
+    thread.join(timeout_s)
+
+
+def to_otlp_json(trace: _Trace) -> dict[str, Any]:
+    """One trace as an OTLP/JSON ExportTraceServiceRequest."""
+    spans = []
+    for item in trace.spans:
+        if item.end_ns is None:
+            continue  # e.g. a cancelled hedge still unwinding; never exported half-open
+        record = {
+            "traceId":           item.trace_id,
+            "spanId":            item.span_id,
+            "name":              item.name,
+            "kind":              item.kind,
+            "startTimeUnixNano": str(item.start_ns),
+            "endTimeUnixNano":   str(item.end_ns),
+            "attributes":        _otlp_attributes(item.attributes),
+            "status":            (
+                {"code": _STATUS_ERROR, "message": item.error} if item.error else {"code": _STATUS_OK}
+            ),
+        }
+        if item.parent_id:
+            record["parentSpanId"] = item.parent_id
+        if item.events:
+            record["events"] = [
+                {"timeUnixNano": str(at), "name": name, "attributes": _otlp_attributes(attrs)}
+                for at, name, attrs in item.events
+            ]
+        spans.append(record)
+
+    return {"resourceSpans": [{
+        "resource":   {"attributes": _otlp_attributes({"service.name": TRACE_SERVICE_NAME})},
+        "scopeSpans": [{"scope": {"name": "talk2tables.ai_agent"}, "spans": spans}],
+    }]}
+
+
+def _otlp_attributes(attributes: dict[str, Any]) -> list[dict[str, Any]]:
+    encoded = []
+    for key, value in attributes.items():
+        if isinstance(value, bool):
+            wrapped = {"boolValue": value}
+        elif isinstance(value, int):
+            wrapped = {"intValue": str(value)}   # OTLP/JSON encodes int64 as a string
+        elif isinstance(value, float):
+            wrapped = {"doubleValue": value}
+        else:
+            wrapped = {"stringValue": str(value)}
+        encoded.append({"key": key, "value": wrapped})
+    return encoded
+
+
+# ---------------------------------------------------------------------------
+# Statistics (per process, shown on GET /health)
+# ---------------------------------------------------------------------------
+_stats: Counter = Counter()
+_lock  = threading.Lock()
+
+
+def get_tracing_stats() -> dict[str, Any]:
+    """
+    Returns:
+        { "enabled": True, "exporter": "otlp", "traces": 120, "spans": 1460,
+          "exported": 118, "export_errors": 2, "dropped_traces": 0, "dropped_spans": 0 }
+    """
+    with _lock:
+        return {
+            "enabled":        TRACING_ENABLED,
+            "exporter":       TRACE_EXPORTER,
+            "traces":         _stats["traces"],
+            "spans":          _stats["spans"],
+            "exported":       _stats["exported"],
+            "export_errors":  _stats["export_errors"],
+            "dropped_traces": _stats["dropped_traces"],
+            "dropped_spans":  _stats["dropped_spans"],
+        }
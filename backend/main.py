@@ -3,10 +3,12 @@ Talk2Tables — FastAPI Application Entry Point
 ==============================================
 Bootstraps the FastAPI app with:
   - CORS middleware         (React frontend on port 3000/5173)
+  - Request ID + tracing    (X-Request-ID, one trace per /api request)
   - JWT Auth middleware
   - Route registration      (query, auth, admin, schema_docs)
   - Database startup checks
   - LangGraph agent warmup
+  - Background schema warmer (pre-reflects known target databases)
   - UX4G-compliant error responses
 
 Run (development):
@@ -24,6 +26,7 @@ from __future__ import annotations
 import logging
 import os
 import time
+import uuid
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, Request, status
@@ -36,6 +39,11 @@ load_dotenv()
 
 # ── Internal imports ──────────────────────────────────────────────────────────
 from ai_agent import get_agent               # Pre-warms the LangGraph agent
+from ai_agent import dispose_all_engines, get_pool_stats, get_schema_cache_stats, get_doc_cache_stats
+from ai_agent import get_query_cache_stats, get_llm_usage_stats, get_rate_limit_stats, get_fast_path_stats
+from ai_agent import shutdown_reflection_executor, aclose_llm_clients, get_breaker_states, get_hedging_stats
+from ai_agent import start_schema_warmer, stop_schema_warmer, get_warmer_status, get_sql_repair_stats
+from ai_agent import bind_request_id, span, shutdown_tracing, get_tracing_stats, KIND_SERVER
 from ai_agent.routes_query import router as query_router
 
 # ---------------------------------------------------------------------------
@@ -75,7 +83,11 @@ async def lifespan(app: FastAPI):
     llm_provider = os.getenv("LLM_PROVIDER", "auto (openrouter → groq → gemini → ollama)")
     logger.info(f"✅  LLM Provider preference: {llm_provider}")
 
-    # 3. Log environment
+    # 3. Pre-reflect known target databases in the background (does not delay startup)
+    if start_schema_warmer():
+        logger.info("✅  Schema warmer started.")
+
+    # 4. Log environment
     debug_mode = os.getenv("DEBUG", "false").lower() == "true"
     logger.info(f"✅  Debug mode: {debug_mode}")
     logger.info(f"✅  Docs available at: http://localhost:8000/docs")
@@ -86,6 +98,19 @@ async def lifespan(app: FastAPI):
     # ── SHUTDOWN ──────────────────────────────────────────────────────────
     logger.info("Talk2Tables Backend — Shutting down gracefully.")
 
+    # Stop the schema warmer and reflection workers, then close pooled connections to every target database
+    await stop_schema_warmer()
+    shutdown_reflection_executor()
+    disposed = dispose_all_engines()
+    logger.info(f"✅  Disposed {disposed} target DB engine(s).")
+
+    # Close the shared keep-alive HTTP clients of the LLM providers
+    closed = await aclose_llm_clients()
+    logger.info(f"✅  Closed {closed} LLM HTTP client(s).")
+
+    # Export the traces still queued for the trace exporter
+    shutdown_tracing()
+
 
 # ---------------------------------------------------------------------------
 # FastAPI App Instance
@@ -126,14 +151,27 @@ logger.info(f"CORS enabled for: {_cors_origins}")
 
 # ---------------------------------------------------------------------------
 # Request Timing Middleware — adds X-Response-Time header (useful for perf)
+# and X-Request-ID (the client's, or a new one); /api requests are traced
+# under it (ai_agent/tracing.py), so their spans can be found by that ID
 # ---------------------------------------------------------------------------
 
 @app.middleware("http")
 async def add_response_time_header(request: Request, call_next):
-    t_start  = time.perf_counter()
-    response = await call_next(request)
+    request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex
+    bind_request_id(request_id)
+
+    t_start = time.perf_counter()
+    if request.url.path.startswith("/api/"):
+        with span(f"{request.method} {request.url.path}", kind=KIND_SERVER, **{
+            "http.method": request.method, "http.route": request.url.path,
+        }) as root:
+            response = await call_next(request)
+            root.set_attribute("http.status_code", response.status_code)
+    else:
+        response = await call_next(request)
     elapsed  = (time.perf_counter() - t_start) * 1000
     response.headers["X-Response-Time"] = f"{elapsed:.0f}ms"
+    response.headers["X-Request-ID"]    = request_id
     return response
 
 # ---------------------------------------------------------------------------
@@ -183,11 +221,28 @@ async def health_check():
     """
     Lightweight liveness probe.
     Docker Compose healthcheck and Kubernetes readiness probe call this.
+    Also reports target DB connection pool usage, schema / doc / query cache
+    and fast-path counters, local SQL repair success rates, per-connection
+    schema warm/cold status, LLM circuit breaker states, hedging win rates,
+    per-provider prompt / cached token counts, LLM request queue /
+    throttling counters and trace export counters.
     """
     return {
-        "status":  "ok",
-        "service": "talk2tables-backend",
-        "version": "2.0.0",
+        "status":          "ok",
+        "service":         "talk2tables-backend",
+        "version":         "2.0.0",
+        "db_pools":        get_pool_stats(),
+        "schema_cache":    get_schema_cache_stats(),
+        "doc_cache":       get_doc_cache_stats(),
+        "query_cache":     get_query_cache_stats(),
+        "fast_path":       get_fast_path_stats(),
+        "sql_repair":      get_sql_repair_stats(),
+        "schema_warmer":   get_warmer_status(),
+        "llm_breakers":    get_breaker_states(),
+        "llm_hedging":     get_hedging_stats(),
+        "llm_usage":       get_llm_usage_stats(),
+        "llm_rate_limits": get_rate_limit_stats(),
+        "tracing":         get_tracing_stats(),
     }
 
 
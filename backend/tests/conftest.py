@@ -0,0 +1,94 @@
+"""
+Talk2Tables — Test Fixtures
+============================
+Offline test setup: every test runs against the deterministic mock LLM
+(LLM_PROVIDER=mock) and a throwaway SQLite database, so the suite needs no
+network, no API keys and no MySQL / PostgreSQL server.
+
+The environment is configured before ai_agent is imported, because its
+modules read their settings at import time.
+
+Run from backend/:  python -m pytest -q
+
+Author  : Member 1 (Backend Lead)
+Project : Talk2Tables — Diploma Final Year Project
+"""
+
+from __future__ import annotations
+
+import os
+
+os.environ["LLM_PROVIDER"]               = "mock"
+os.environ["LLM_STREAMING"]              = "false"
+os.environ["LLM_HEDGING"]                = "false"
+os.environ["SCHEMA_SNAPSHOT_STORE_PATH"] = ""        # No store file outside tmp_path
+os.environ["SCHEMA_WARMER_ENABLED"]      = "false"
+os.environ["TRACE_EXPORTER"]             = "none"
+
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from ai_agent import invalidate_query_cache, invalidate_schema_cache
+
+SAMPLE_SCHEMA = """
+CREATE TABLE sensors (
+    sensor_id     INTEGER PRIMARY KEY,
+    sensor_name   TEXT NOT NULL,
+    zone          TEXT NOT NULL,
+    status        TEXT NOT NULL,
+    temperature   REAL,
+    installed_at  DATETIME
+);
+CREATE TABLE sensor_readings (
+    reading_id    INTEGER PRIMARY KEY,
+    sensor_id     INTEGER NOT NULL REFERENCES sensors (sensor_id),
+    value         REAL NOT NULL,
+    recorded_at   DATETIME NOT NULL
+);
+CREATE TABLE technicians (
+    technician_id INTEGER PRIMARY KEY,
+    name          TEXT NOT NULL,
+    shift         TEXT
+);
+"""
+
+SAMPLE_ROWS = {
+    "sensors": [
+        (1, "S-101", "A", "active",   41.5, "2024-01-10 08:00:00"),
+        (2, "S-102", "B", "active",   55.0, "2024-02-11 09:30:00"),
+        (3, "S-201", "B", "inactive", 62.3, "2024-03-12 10:15:00"),
+        (4, "S-202", "C", "active",   38.9, "2024-04-13 11:45:00"),
+    ],
+    "sensor_readings": [
+        (1, 1, 40.1, "2024-05-01 00:00:00"),
+        (2, 2, 54.7, "2024-05-01 00:05:00"),
+        (3, 3, 61.0, "2024-05-01 00:10:00"),
+    ],
+    "technicians": [
+        (1, "Asha", "day"),
+        (2, "Ravi", "night"),
+    ],
+}
+
+
+@pytest.fixture
+def sqlite_url(tmp_path: Path) -> str:
+    """SQLAlchemy URL of a fresh SQLite database with the sample schema and rows."""
+    path = tmp_path / "plant.db"
+    with sqlite3.connect(path) as conn:
+        conn.executescript(SAMPLE_SCHEMA)
+        for table, rows in SAMPLE_ROWS.items():
+            marks = ", ".join("?" * len(rows[0]))
+            conn.executemany(f"INSERT INTO {table} VALUES ({marks})", rows)
+    return f"sqlite:///{path}"
+
+
+@pytest.fixture(autouse=True)
+def _isolated_caches():
+    """Process-wide caches must not leak answers from one test into the next."""
+    invalidate_query_cache()
+    yield
+    invalidate_query_cache()
+    invalidate_schema_cache()
@@ -0,0 +1,36 @@
+"""Schema doc chunk index — what fits in the per-question doc budget."""
+
+from __future__ import annotations
+
+import pytest
+
+from ai_agent import doc_index
+from ai_agent.doc_index import DocCorpus
+
+_DOCS = [
+    (f"manual_{d}.pdf", "\n\n".join(
+        f"Section {d}.{p}: the {word} table records readings for line {p}. " * 4
+        for p, word in enumerate(["boiler", "turbine", "chiller", "pump", "valve", "sensor"])
+    ))
+    for d in range(4)
+]
+
+
+def test_default_budget_matches_the_old_cap():
+    assert doc_index.DOC_CONTEXT_BUDGET_CHARS == 8_000
+
+
+@pytest.mark.parametrize("budget", [120, 400, 900, 2_000, 5_000])
+@pytest.mark.parametrize("question", ["turbine readings", "pump line", None])
+def test_rendered_context_stays_within_the_budget(budget, question):
+    corpus  = DocCorpus(_DOCS, version=(4, "2024-05-01"))
+    context = corpus.select(question, budget)
+    assert len(context) <= budget
+    assert context.startswith("--- From: manual_")
+
+
+def test_omitted_note_counts_against_the_budget():
+    corpus  = DocCorpus(_DOCS, version=(4, "2024-05-01"))
+    context = corpus.select("turbine readings", 900)
+    assert context.endswith("less relevant doc excerpts omitted]")
+    assert len(context) <= 900
@@ -0,0 +1,73 @@
+"""Template fast path — questions answered without the LLM."""
+
+from __future__ import annotations
+
+import pytest
+
+from ai_agent.fast_path import match_fast_path
+from ai_agent.schema_manager import load_schema_snapshot
+
+
+@pytest.fixture
+def snapshot(sqlite_url):
+    return load_schema_snapshot(sqlite_url, "sqlite")
+
+
+@pytest.mark.parametrize("question, rule, sql", [
+    ("show all sensors",
+     "select_all", "SELECT * FROM sensors LIMIT 1000"),
+    ("list sensors where zone is 'B'",
+     "select_where", "SELECT * FROM sensors WHERE zone = 'B' LIMIT 1000"),
+    ("show sensors where temperature is 55",
+     "select_where", "SELECT * FROM sensors WHERE temperature = 55 LIMIT 1000"),
+    ("list sensors where status is active",
+     "select_where", "SELECT * FROM sensors WHERE status = 'active' LIMIT 1000"),
+    ("list sensors where sensor_name is \"north, inlet\"",
+     "select_where", "SELECT * FROM sensors WHERE sensor_name = 'north, inlet' LIMIT 1000"),
+    ("show technicians sorted by name desc",
+     "select_ordered", "SELECT * FROM technicians ORDER BY name DESC LIMIT 1000"),
+    ("latest 2 sensor readings",
+     "latest_n", "SELECT * FROM sensor_readings ORDER BY recorded_at DESC LIMIT 2"),
+    ("how many technicians are there?",
+     "count", "SELECT COUNT(*) AS total FROM technicians"),
+    ("count sensors by zone",
+     "count_by", "SELECT zone, COUNT(*) AS total FROM sensors GROUP BY zone ORDER BY total DESC LIMIT 1000"),
+])
+def test_rules(snapshot, question, rule, sql):
+    assert match_fast_path(question, snapshot, "sqlite") == {"rule": rule, "sql": sql}
+
+
+@pytest.mark.parametrize("dialect, sql", [
+    ("mssql",  "SELECT TOP 1000 * FROM sensors"),
+    ("oracle", "SELECT * FROM sensors FETCH FIRST 1000 ROWS ONLY"),
+])
+def test_dialect_row_limit(snapshot, dialect, sql):
+    assert match_fast_path("show all sensors", snapshot, dialect)["sql"] == sql
+
+
+@pytest.mark.parametrize("question", [
+    "show readings",                               # Only part of sensor_readings
+    "show all pumps",                              # No such table
+    "list sensors where colour is 'red'",          # No such column
+    "show sensors where status is not active",
+    "show sensors where temperature is above 50",    # Comparisons are not equality
+    "show sensors where temperature is over 50",
+    "show sensors where temperature is at least 50",
+    "show sensors where temperature is at most 50",
+    "show sensors where temperature is higher than 50",
+    "show sensors where installed_at is before 2024-01-01",
+    "show sensors where installed_at is since 2024",
+    "show sensors where status is active or inactive",  # Lists
+    "show sensors where zone is 'B' or 'C'",
+    "show sensors where zone is A, B",
+    "show sensors where zone is null",
+    "show sensors in A",                               # Leftover words in a slot
+    "show all sensors in B",
+    "how many sensors in C",
+    "show sensors is",
+    "count sensors by zone and status",
+    "show the first sensor",                       # One row or ten?
+    "which sensors failed calibration last week",
+])
+def test_uncertain_questions_go_to_the_llm(snapshot, question):
+    assert match_fast_path(question, snapshot, "sqlite") is None
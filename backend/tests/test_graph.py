@@ -0,0 +1,137 @@
+"""Agent graph — routing after repair, and end-to-end runs on the mock LLM."""
+
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+from langgraph.graph import END
+
+from ai_agent import graph, run_agent
+from ai_agent.graph import MAX_RETRIES, route_after_execute, route_after_repair
+
+_INVALID = {"is_valid": False, "operation_type": "UNKNOWN", "error": "bad", "sanitized_sql": None, "risk_level": "high"}
+_SELECT  = {"is_valid": True, "operation_type": "SELECT", "error": None, "sanitized_sql": "SELECT 1", "risk_level": "safe"}
+
+
+# ---------------------------------------------------------------------------
+# Routing
+# ---------------------------------------------------------------------------
+
+def test_repaired_sql_is_validated_again():
+    assert route_after_repair({"validation_result": None, "sql_repair_attempted": True}) == "classify_and_validate"
+
+
+def test_unrepairable_validation_failure_retries_the_llm():
+    state = {"validation_result": _INVALID, "sql_repair_attempted": True, "retry_count": 0}
+    assert route_after_repair(state) == "retry_generate"
+
+
+def test_unrepairable_validation_failure_ends_after_max_retries():
+    state = {"validation_result": _INVALID, "sql_repair_attempted": True, "retry_count": MAX_RETRIES}
+    assert route_after_repair(state) == END
+
+
+def test_unrepairable_execution_failure_ends():
+    state = {"validation_result": _SELECT, "sql_repair_attempted": True, "response_type": "error"}
+    assert route_after_repair(state) == END
+
+
+def test_execution_failure_is_repaired_once():
+    state = {"validation_result": _SELECT, "response_type": "error", "sql_repair_attempted": False}
+    assert route_after_execute(state) == "repair_sql"
+    assert route_after_execute({**state, "sql_repair_attempted": True}) == END
+
+
+# ---------------------------------------------------------------------------
+# End to end — LLM_PROVIDER=mock against SQLite
+# ---------------------------------------------------------------------------
+
+def _run(sqlite_url: str, question: str, role: str = "viewer") -> dict:
+    return asyncio.run(run_agent(
+        natural_language_query = question,
+        db_connection_string   = sqlite_url,
+        connection_id          = "conn-test",
+        user_id                = "user-test",
+        user_role              = role,
+        chat_history           = [],
+    ))
+
+
+def test_select_through_the_mock_llm(sqlite_url):
+    result = _run(sqlite_url, "which zone and status does each sensor have")
+    assert result["response_type"] == "results"
+    assert result["sql_source"] == "llm"
+    assert result["final_response"]["sql"] == "SELECT zone, status FROM sensors LIMIT 1000"
+    assert result["final_response"]["row_count"] == 4
+
+
+def test_second_ask_is_served_from_the_cache(sqlite_url):
+    _run(sqlite_url, "which zone and status does each sensor have")
+    again = _run(sqlite_url, "Which zone and status does each sensor have?")
+    assert again["sql_source"] == "cache"
+    assert again["final_response"]["row_count"] == 4
+
+
+def test_fast_path_skips_the_llm(sqlite_url):
+    result = _run(sqlite_url, "count sensors by zone")
+    assert result["sql_source"] == "fast_path"
+    assert result["final_response"]["results"][0] == {"zone": "B", "total": 2}
+
+
+def test_write_returns_a_preview(sqlite_url):
+    result = _run(sqlite_url, "delete technician 2", role="admin")
+    assert result["response_type"] == "preview"
+    assert result["final_response"]["sql"] == "DELETE FROM technicians WHERE technician_id = 2"
+
+
+def test_write_is_refused_for_viewers(sqlite_url):
+    result = _run(sqlite_url, "delete technician 2")
+    assert result["response_type"] == "error"
+    assert "does not have permission" in result["final_response"]["error_message"]
+    assert result["final_response"]["retry_count"] == MAX_RETRIES
+
+
+def test_unknown_table_asks_for_clarification(sqlite_url):
+    result = _run(sqlite_url, "what is the weather forecast")
+    assert result["response_type"] == "clarification"
+    assert result["final_response"]["question"].startswith("Which table")
+
+
+class _ScriptedProvider:
+    """Returns the given outputs in order and counts the calls."""
+    model          = "scripted"
+    context_tokens = 32_000
+
+    def __init__(self, *outputs: str):
+        self.outputs = list(outputs)
+        self.calls   = 0
+
+    async def agenerate_sql(self, system_prompt, user_query, chat_history, on_progress=None, **_):
+        self.calls += 1
+        return self.outputs.pop(0), "scripted"
+
+
+@pytest.fixture
+def scripted(monkeypatch):
+    def install(*outputs: str) -> _ScriptedProvider:
+        provider = _ScriptedProvider(*outputs)
+        monkeypatch.setattr(graph, "get_llm_provider", lambda: provider)
+        return provider
+    return install
+
+
+def test_prose_around_the_sql_is_repaired_without_a_retry(sqlite_url, scripted):
+    provider = scripted("Here is the query:\n```sql\nSELECT sensor_name FROM sensors WHERE zone = 'B'\n```\nDone.")
+    result   = _run(sqlite_url, "names of sensors in zone B")
+    assert result["response_type"] == "results"
+    assert result["final_response"]["row_count"] == 2
+    assert provider.calls == 1
+
+
+def test_stacked_query_goes_to_the_llm_retry(sqlite_url, scripted):
+    provider = scripted("SELECT 1; DROP TABLE sensors", "SELECT COUNT(*) AS n FROM sensors")
+    result   = _run(sqlite_url, "number of sensor rows please")
+    assert result["response_type"] == "results"
+    assert result["final_response"]["results"] == [{"n": 4}]
+    assert provider.calls == 2
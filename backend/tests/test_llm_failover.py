@@ -0,0 +1,138 @@
+"""Call-time failover — which errors fail over, count on a breaker, or surface."""
+
+from __future__ import annotations
+
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from ai_agent import circuit_breaker, llm_provider
+from ai_agent.llm_provider import FailoverLLMProvider, LLMProvider, _record_queue_wait
+
+
+class _Provider(LLMProvider):
+    """Raises the given error, or answers with SELECT 1."""
+    model = "stub"
+
+    def __init__(self, name: str, error: Exception | None = None):
+        self._name = name
+        self.error = error
+        self.calls = 0
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    def generate_sql(self, system_prompt, user_query, chat_history):
+        self.calls += 1
+        if self.error is not None:
+            raise self.error
+        return "SELECT 1", self.name
+
+    async def agenerate_sql(self, system_prompt, user_query, chat_history, on_progress=None, db_dialect=None):
+        return self.generate_sql(system_prompt, user_query, chat_history)
+
+
+def _http_error(status: int) -> httpx.HTTPStatusError:
+    request = httpx.Request("POST", "https://llm.invalid/v1/chat/completions")
+    return httpx.HTTPStatusError(f"HTTP {status}", request=request, response=httpx.Response(status, request=request))
+
+
+@pytest.fixture(autouse=True)
+def _fresh_breakers(monkeypatch):
+    monkeypatch.setattr(circuit_breaker, "_breakers", {})
+
+
+def _window(name: str) -> int:
+    return circuit_breaker.get_breaker(name).snapshot()["window_calls"]
+
+
+def _error_rate(name: str) -> float:
+    return circuit_breaker.get_breaker(name).snapshot()["error_rate"]
+
+
+@pytest.mark.parametrize("error", [
+    _http_error(500), _http_error(503), _http_error(429), _http_error(408),
+    httpx.ConnectError("refused"), httpx.ReadTimeout("slow"),
+])
+def test_outages_fail_over_and_count_on_the_breaker(error):
+    failing, backup = _Provider("primary", error), _Provider("backup")
+    result = asyncio.run(FailoverLLMProvider([failing, backup]).agenerate_sql("system", "q", []))
+    assert result == ("SELECT 1", "backup")
+    assert _error_rate("primary") == 1.0
+
+
+@pytest.mark.parametrize("status", [400, 401, 403, 404, 413, 422])
+def test_client_errors_surface_without_failover_or_breaker(status):
+    failing, backup = _Provider("primary", _http_error(status)), _Provider("backup")
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(FailoverLLMProvider([failing, backup]).agenerate_sql("system", "q", []))
+    with pytest.raises(httpx.HTTPStatusError):
+        FailoverLLMProvider([failing, backup]).generate_sql("system", "q", [])
+    assert backup.calls == 0
+    assert _window("primary") == 0
+
+
+def test_a_bad_prompt_never_opens_the_breakers():
+    providers = [_Provider("primary", _http_error(400)), _Provider("backup", _http_error(400))]
+    failover  = FailoverLLMProvider(providers)
+    for _ in range(50):
+        with pytest.raises(httpx.HTTPStatusError):
+            failover.generate_sql("system", "q", [])
+    assert all(state["state"] == "closed" for state in circuit_breaker.get_breaker_states())
+
+
+def test_malformed_response_fails_over_without_counting():
+    failing, backup = _Provider("primary", KeyError("choices")), _Provider("backup")
+    assert FailoverLLMProvider([failing, backup]).generate_sql("system", "q", []) == ("SELECT 1", "backup")
+    assert _window("primary") == 0
+
+
+def test_hedged_responses_are_judged_under_the_request_dialect(monkeypatch):
+    judged: list[str] = []
+
+    def _validate(output, user_role="viewer", db_dialect="mysql"):
+        judged.append(db_dialect)
+        return {"is_valid": True}, output
+
+    monkeypatch.setattr(llm_provider, "LLM_HEDGING_ENABLED", True)
+    monkeypatch.setattr(llm_provider, "validate_sql", _validate)
+    failover = FailoverLLMProvider([_Provider("primary"), _Provider("backup")])
+    result   = asyncio.run(failover.agenerate_sql("system", "q", [], db_dialect="mssql"))
+    assert result == ("SELECT 1", "primary")
+    assert judged == ["mssql"]
+
+
+class _QueuedProvider(_Provider):
+    """Waits QUEUE_S in its rate limiter queue, then answers at once."""
+    QUEUE_S = 0.2
+
+    def generate_sql(self, system_prompt, user_query, chat_history):
+        queued = time.perf_counter()
+        time.sleep(self.QUEUE_S)
+        _record_queue_wait(queued)
+        return super().generate_sql(system_prompt, user_query, chat_history)
+
+    async def agenerate_sql(self, system_prompt, user_query, chat_history, on_progress=None, db_dialect=None):
+        queued = time.perf_counter()
+        await asyncio.sleep(self.QUEUE_S)
+        _record_queue_wait(queued)
+        return super().generate_sql(system_prompt, user_query, chat_history)
+
+
+@pytest.mark.parametrize("mode", ["sync", "async", "hedged"])
+def test_latency_is_measured_from_admission(monkeypatch, mode):
+    monkeypatch.setattr(llm_provider, "_latencies", llm_provider.defaultdict(list))
+    monkeypatch.setattr(llm_provider, "_queue_waits", llm_provider.defaultdict(list))
+    monkeypatch.setattr(llm_provider, "LLM_HEDGING_ENABLED", mode == "hedged")
+    monkeypatch.setattr(circuit_breaker, "LLM_BREAKER_SLOW_CALL_S", _QueuedProvider.QUEUE_S / 2)
+    failover = FailoverLLMProvider([_QueuedProvider("primary"), _Provider("backup")])
+    if mode == "sync":
+        failover.generate_sql("system", "q", [])
+    else:
+        asyncio.run(failover.agenerate_sql("system", "q", []))
+    assert llm_provider._latencies["primary"][-1] < _QueuedProvider.QUEUE_S / 2
+    assert llm_provider._queue_waits["primary"][-1] >= _QueuedProvider.QUEUE_S * 0.9
+    assert circuit_breaker.get_breaker("primary").snapshot()["slow_rate"] == 0.0
@@ -0,0 +1,97 @@
+"""NL→SQL query cache — exact keys and paraphrase (semantic) reuse."""
+
+from __future__ import annotations
+
+import pytest
+
+from ai_agent.query_cache import (
+    QUERY_CACHE_SEMANTIC_ENABLED, find_similar_sql, get_cached_sql, make_cache_key, make_scope_key,
+    store_sql,
+)
+
+SCOPE = make_scope_key("conn-1", "schema-hash", "sqlite", "viewer", [])
+
+
+def _key(question: str, **overrides) -> str:
+    args = dict(
+        natural_language_query=question, schema_hash="schema-hash", doc_context=None,
+        db_dialect="sqlite", user_role="viewer", chat_history=[],
+    )
+    return make_cache_key(**{**args, **overrides})
+
+
+def _store(question: str, sql: str) -> None:
+    store_sql(_key(question), sql, "mock/rule-based", natural_language_query=question, scope=SCOPE)
+
+
+def test_exact_hit_ignores_case_spacing_and_trailing_punctuation():
+    _store("Show sensors overdue for calibration", "SELECT 1")
+    assert get_cached_sql(_key("  show SENSORS  overdue for calibration?")) ["sql"] == "SELECT 1"
+
+
+@pytest.mark.parametrize("overrides", [
+    {"schema_hash": "other-schema"},
+    {"db_dialect": "mysql"},
+    {"user_role": "admin"},
+    {"chat_history": [{"role": "user", "content": "only zone B"}]},
+])
+def test_exact_key_changes_with_context(overrides):
+    _store("show all sensors", "SELECT 1")
+    assert get_cached_sql(_key("show all sensors", **overrides)) is None
+
+
+semantic = pytest.mark.skipif(not QUERY_CACHE_SEMANTIC_ENABLED, reason="semantic cache needs NumPy")
+
+
+@semantic
+@pytest.mark.parametrize("cached, asked", [
+    ("list all sensors in zone B", "show me all the sensors in zone B"),
+    ("sensors overdue for calibration", "which sensors are overdue for calibration"),
+])
+def test_paraphrase_hit(cached, asked):
+    _store(cached, "SELECT 1")
+    hit = find_similar_sql(SCOPE, asked)
+    assert hit is not None and hit[1]["sql"] == "SELECT 1"
+
+
+@semantic
+@pytest.mark.parametrize("cached, asked", [
+    ("list all sensors in zone B", "list all sensors in zone C"),         # Different literal
+    ("show sensor S-201",           "show sensor S-202"),
+    ("list all sensors in zone B", "average technician shift length"),   # Unrelated
+    ("list sensors that are active", "list sensors that are not active"),  # Negation
+    ("pumps that are running",        "pumps that are not running"),
+    ("pumps that are running",        "pumps that aren't running"),
+    ("sensors without a zone",        "sensors with a zone"),
+    ("top sensors by temperature",    "bottom sensors by temperature"),     # Direction
+    ("readings before the outage",    "readings after the outage"),
+    ("list sensors on the packaging line that are active",                # One word differs
+     "list sensors on the packaging line that are inactive"),
+    ("night shift technicians",       "day shift technicians"),
+    ("sensor readings grouped by month", "sensor readings grouped by week"),
+    ("show sensors in zone a with status active", "show sensors in zone b with status active"),
+])
+def test_paraphrase_miss(cached, asked):
+    _store(cached, "SELECT 1")
+    assert find_similar_sql(SCOPE, asked) is None
+
+
+@semantic
+def test_paraphrase_never_crosses_scope():
+    _store("list all sensors in zone B", "SELECT 1")
+    other = make_scope_key("conn-2", "schema-hash", "sqlite", "viewer", [])
+    assert find_similar_sql(other, "list all sensors in zone B") is None
+
+
+@semantic
+def test_matching_polarity_still_hits():
+    _store("list sensors that are not active", "SELECT 1")
+    hit = find_similar_sql(SCOPE, "show me the sensors that are not active")
+    assert hit is not None and hit[1]["sql"] == "SELECT 1"
+
+
+@semantic
+def test_a_contraction_reads_as_not():
+    _store("pumps that are not running", "SELECT 1")
+    hit = find_similar_sql(SCOPE, "pumps that aren't running")
+    assert hit is not None and hit[1]["sql"] == "SELECT 1"
@@ -0,0 +1,77 @@
+"""Schema relevance index — cached per schema and doc corpus, not per question."""
+
+from __future__ import annotations
+
+import pytest
+
+from ai_agent import schema_index, schema_manager
+from ai_agent.doc_index import DocCorpus
+from ai_agent.schema_cache import SchemaSnapshot
+
+# A catalog larger than SCHEMA_PRUNE_BUDGET_CHARS, so questions are pruned
+_TABLES = {
+    f"plant_table_{i}": {
+        "columns": [{"name": f"metric_{i}_{j}", "type": "INTEGER", "nullable": True, "default": None} for j in range(12)],
+        "pk": [], "fks": {}, "indexes": [],
+    }
+    for i in range(40)
+}
+_DOCS = [
+    ("manual.pdf", "\n\n".join(
+        f"plant_table_{i} stores the {word} log for line {i}."
+        for i, word in enumerate(["boiler", "turbine", "chiller", "pump", "valve"] * 8)
+    )),
+]
+
+
+@pytest.fixture
+def snapshot() -> SchemaSnapshot:
+    return schema_manager._snapshot_from_payload({
+        "schema_text":  schema_manager._render_schema(list(_TABLES), _TABLES, "sqlite"),
+        "table_names":  list(_TABLES),
+        "tables":       _TABLES,
+        "content_hash": "catalog-v1",
+        "db_dialect":   "sqlite",
+    }, "fp", "sqlite")
+
+
+@pytest.fixture(autouse=True)
+def _empty_index_cache():
+    schema_index._index_cache.clear()
+    yield
+    schema_index._index_cache.clear()
+
+
+def test_one_index_per_corpus_whatever_the_question(snapshot):
+    assert len(snapshot["schema_text"]) > schema_manager.SCHEMA_PRUNE_BUDGET_CHARS
+    corpus = DocCorpus(_DOCS, version=(1, "2024-05-01"))
+    for question in ("boiler readings", "turbine log", "chiller status", "pump and valve history"):
+        excerpt = corpus.select(question, 200)
+        assert excerpt != corpus.full_text()
+        schema_manager.render_schema_context(snapshot, question, doc_corpus=corpus)
+    assert len(schema_index._index_cache) == 1
+
+
+def test_synonyms_come_from_the_whole_corpus(snapshot):
+    corpus = DocCorpus(_DOCS, version=(1, "2024-05-01"))
+    pruned = schema_manager.render_schema_context(snapshot, "turbine log", doc_corpus=corpus)
+    assert pruned.startswith("TABLE: plant_table_1\n")
+
+
+def test_a_new_corpus_version_builds_a_new_index(snapshot):
+    schema_manager.render_schema_context(snapshot, "boiler", doc_corpus=DocCorpus(_DOCS, (1, "a")))
+    schema_manager.render_schema_context(snapshot, "boiler", doc_corpus=DocCorpus(_DOCS, (1, "a")))
+    changed = [("manual.pdf", _DOCS[0][1] + "\n\nplant_table_0 also stores the furnace log.")]
+    schema_manager.render_schema_context(snapshot, "boiler", doc_corpus=DocCorpus(changed, (2, "b")))
+    assert len(schema_index._index_cache) == 2
+
+
+def test_schemas_within_the_old_cap_are_sent_whole():
+    tables = dict(list(_TABLES.items())[:12])
+    text   = schema_manager._render_schema(list(tables), tables, "sqlite")
+    assert 6_000 < len(text) <= schema_manager.MAX_SCHEMA_CHARS
+    small  = schema_manager._snapshot_from_payload({
+        "schema_text": text, "table_names": list(tables), "tables": tables,
+        "content_hash": "catalog-small", "db_dialect": "sqlite",
+    }, "fp", "sqlite")
+    assert schema_manager.render_schema_context(small, "turbine log") == text
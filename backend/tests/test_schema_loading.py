@@ -0,0 +1,54 @@
+"""Non-blocking schema loading — single-flight de-duplication of reflections."""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from ai_agent import schema_manager
+
+
+@pytest.fixture
+def reflections(monkeypatch):
+    """Replace the blocking load with a slow fake that records its force_refresh flags."""
+    calls: list[bool] = []
+    lock  = threading.Lock()
+
+    def _load(connection_string, db_dialect, force_refresh=False):
+        with lock:
+            calls.append(force_refresh)
+        time.sleep(0.05)
+        return {"forced": force_refresh}
+
+    monkeypatch.setattr(schema_manager, "load_schema_snapshot", _load)
+    return calls
+
+
+def _gather(*force_flags: bool) -> list:
+    async def run():
+        tasks = []
+        for force in force_flags:
+            tasks.append(asyncio.ensure_future(
+                schema_manager.aload_schema_snapshot("sqlite:///plant.db", "sqlite", force_refresh=force)
+            ))
+            await asyncio.sleep(0.01)  # Each caller arrives while the first is in flight
+        return await asyncio.gather(*tasks)
+    return asyncio.run(run())
+
+
+def test_concurrent_loads_share_one_reflection(reflections):
+    assert _gather(False, False, False) == [{"forced": False}] * 3
+    assert reflections == [False]
+
+
+def test_forced_refresh_does_not_join_a_normal_load(reflections):
+    assert _gather(False, True) == [{"forced": False}, {"forced": True}]
+    assert reflections == [False, True]
+
+
+def test_normal_load_joins_a_forced_refresh(reflections):
+    assert _gather(True, False) == [{"forced": True}, {"forced": True}]
+    assert reflections == [True]
@@ -0,0 +1,75 @@
+"""Schema snapshot store — location and interplay with the schema cache TTL."""
+
+from __future__ import annotations
+
+import os
+import time
+
+import pytest
+
+from ai_agent import schema_manager
+from ai_agent.schema_cache import SchemaCache
+from ai_agent.schema_store import _DEFAULT_STORE_PATH, SchemaSnapshotStore
+
+
+def test_default_path_does_not_depend_on_the_working_directory():
+    backend = os.path.dirname(os.path.dirname(os.path.abspath(schema_manager.__file__)))
+    assert os.path.isabs(_DEFAULT_STORE_PATH)
+    assert _DEFAULT_STORE_PATH == os.path.join(backend, "data", "schema_snapshots.db")
+
+
+def test_store_directory_is_created(tmp_path):
+    store = SchemaSnapshotStore(str(tmp_path / "nested" / "snapshots.db"))
+    store.save("sqlite:///x.db", "fp", {"db_dialect": "sqlite"})
+    loaded = store.load("sqlite:///x.db", "fp")
+    assert loaded["db_dialect"] == "sqlite" and loaded["saved_at"] <= time.time()
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = SchemaSnapshotStore(str(tmp_path / "snapshots.db"))
+    monkeypatch.setattr(schema_manager, "_snapshot_store", store)
+    monkeypatch.setattr(schema_manager, "_schema_cache", SchemaCache())
+    return store
+
+
+def test_a_cold_worker_loads_from_the_store(sqlite_url, store, monkeypatch):
+    schema_manager.load_schema_snapshot(sqlite_url, "sqlite")
+    monkeypatch.setattr(schema_manager, "_schema_cache", SchemaCache())   # Another worker
+
+    schema_manager.load_schema_snapshot(sqlite_url, "sqlite")
+    assert store.stats()["hits"] == 1
+    assert schema_manager._schema_cache.stats()["full_reflections"] == 0
+
+
+def test_ttl_expiry_reflects_again_and_skips_the_store(sqlite_url, store):
+    first = schema_manager.load_schema_snapshot(sqlite_url, "sqlite")
+    schema_manager._schema_cache.ttl_s = -1                               # Every entry is expired
+
+    again = schema_manager.load_schema_snapshot(sqlite_url, "sqlite")
+    stats = schema_manager._schema_cache.stats()
+    assert stats["expired"] == 1
+    assert stats["full_reflections"] == 2
+    assert stats["incremental_refreshes"] == 0
+    assert store.stats()["hits"] == 0
+    assert again["content_hash"] == first["content_hash"]
+
+
+def test_a_stored_snapshot_keeps_its_age(sqlite_url, store, monkeypatch):
+    schema_manager.load_schema_snapshot(sqlite_url, "sqlite")
+    monkeypatch.setattr(schema_manager, "_schema_cache", SchemaCache())   # Restart, five minutes later
+    monkeypatch.setattr(time, "time", lambda real=time.time: real() + 300)
+
+    loaded = schema_manager.load_schema_snapshot(sqlite_url, "sqlite")
+    assert time.monotonic() - loaded["loaded_at"] >= 300
+    assert store.stats()["hits"] == 1
+
+
+def test_a_stored_snapshot_older_than_the_ttl_is_reflected_again(sqlite_url, store, monkeypatch):
+    schema_manager.load_schema_snapshot(sqlite_url, "sqlite")
+    cache = SchemaCache()
+    monkeypatch.setattr(schema_manager, "_schema_cache", cache)
+    monkeypatch.setattr(time, "time", lambda real=time.time: real() + cache.ttl_s + 60)
+
+    schema_manager.load_schema_snapshot(sqlite_url, "sqlite")
+    assert cache.stats()["full_reflections"] == 1
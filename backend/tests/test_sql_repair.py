@@ -0,0 +1,60 @@
+"""Local SQL repair — deterministic fixes tried before an LLM retry."""
+
+from __future__ import annotations
+
+import pytest
+
+from ai_agent.sql_repair import repair_sql
+
+
+@pytest.mark.parametrize("raw, fixes, sql", [
+    ("```sql\nSELECT * FROM sensors\n```",
+     ["code_fence"], "SELECT * FROM sensors"),
+    ("Here is the query:\n```sql\nSELECT zone FROM sensors;\n```\nIt lists the zones.",
+     ["code_fence"], "SELECT zone FROM sensors;"),
+    ("Here is the query: SELECT * FROM sensors",
+     ["leading_prose"], "SELECT * FROM sensors"),
+    ("SELECT * FROM sensors WHERE zone = 'B'; This filters zone B.",
+     ["trailing_prose"], "SELECT * FROM sensors WHERE zone = 'B'"),
+    ("SELECT *\nFROM sensors\n\nWHERE zone = 'B'\n\nThis returns zone B sensors.",
+     ["trailing_prose"], "SELECT *\nFROM sensors\n\nWHERE zone = 'B'"),
+])
+def test_fixes(raw, fixes, sql):
+    repaired = repair_sql(raw, "sqlite", "viewer")
+    assert repaired is not None
+    assert repaired["fixes"] == fixes
+    assert repaired["sql"] == sql
+    assert repaired["validation"]["operation_type"] == "SELECT"
+
+
+@pytest.mark.parametrize("dialect, raw, sql", [
+    ("mssql",  "SELECT * FROM sensors LIMIT 5",       "SELECT TOP 5 * FROM sensors"),
+    ("oracle", "SELECT * FROM sensors LIMIT 5",       "SELECT * FROM sensors FETCH FIRST 5 ROWS ONLY"),
+    ("sqlite", "SELECT TOP 5 * FROM sensors",         "SELECT * FROM sensors LIMIT 5"),
+    ("mysql",  "SELECT * FROM sensors FETCH FIRST 5 ROWS ONLY", "SELECT * FROM sensors LIMIT 5"),
+])
+def test_dialect_limit(dialect, raw, sql):
+    repaired = repair_sql(raw, dialect, "viewer", origin="execution")
+    assert repaired is not None and repaired["fixes"] == ["dialect_limit"]
+    assert repaired["sql"] == sql
+
+
+def test_write_op_keeps_its_directive():
+    repaired = repair_sql("WRITE_OP: Sure: DELETE FROM sensors WHERE sensor_id = 3", "sqlite", "admin")
+    assert repaired is not None
+    assert repaired["sql"] == "WRITE_OP: DELETE FROM sensors WHERE sensor_id = 3"
+    assert repaired["validation"]["operation_type"] == "WRITE_OP"
+
+
+@pytest.mark.parametrize("raw, role", [
+    ("SELECT * FROM sensors; DROP TABLE sensors", "viewer"),     # Stacked statement, not prose
+    ("SELECT * FROM sensors; DELETE FROM sensors", "admin"),
+    ("UPDATE sensors SET status='x';\nSELECT * FROM sensors", "viewer"),
+    ("DELETE FROM sensors WHERE zone = 'B'\nSELECT COUNT(*) FROM sensors", "viewer"),
+    ("DELETE FROM sensors WHERE zone = 'B'\nSELECT COUNT(*) FROM sensors", "admin"),
+    ("Here you go: DELETE FROM sensors", "admin"),               # Never turns into an unconfirmed write
+    ("```sql\nDROP TABLE sensors\n```", "admin"),
+    ("SELECT * FROM sensors", "viewer"),                         # Nothing to fix
+])
+def test_refuses(raw, role):
+    assert repair_sql(raw, "sqlite", role) is None
@@ -0,0 +1,39 @@
+"""SQL validator — the row limit it adds to SELECTs, per dialect."""
+
+from __future__ import annotations
+
+import pytest
+
+from ai_agent.sql_validator import validate_sql
+
+
+@pytest.mark.parametrize("dialect, sql, sanitized", [
+    ("sqlite",     "SELECT * FROM sensors;",        "SELECT * FROM sensors LIMIT 1000"),
+    ("mysql",      "SELECT zone FROM sensors",      "SELECT zone FROM sensors LIMIT 1000"),
+    ("postgresql", "SELECT zone FROM sensors",      "SELECT zone FROM sensors LIMIT 1000"),
+    ("mssql",      "SELECT * FROM sensors;",        "SELECT TOP 1000 * FROM sensors"),
+    ("mssql",      "select distinct zone from sensors", "select distinct TOP 1000 zone from sensors"),
+    ("oracle",     "SELECT zone FROM sensors ORDER BY zone",
+                   "SELECT zone FROM sensors ORDER BY zone FETCH FIRST 1000 ROWS ONLY"),
+])
+def test_row_limit_uses_the_dialect_syntax(dialect, sql, sanitized):
+    result, _ = validate_sql(sql, user_role="viewer", db_dialect=dialect)
+    assert result["is_valid"]
+    assert result["sanitized_sql"] == sanitized
+
+
+@pytest.mark.parametrize("dialect, sql", [
+    ("mssql",  "SELECT TOP 5 * FROM sensors"),
+    ("oracle", "SELECT * FROM sensors FETCH FIRST 5 ROWS ONLY"),
+    ("sqlite", "SELECT * FROM sensors LIMIT 5"),
+])
+def test_an_existing_row_limit_is_kept(dialect, sql):
+    result, _ = validate_sql(sql, user_role="viewer", db_dialect=dialect)
+    assert result["sanitized_sql"] == sql
+
+
+def test_mssql_cte_is_left_to_the_fetch_cap():
+    sql = "WITH z AS (SELECT zone FROM sensors) SELECT * FROM z"
+    result, _ = validate_sql(sql, user_role="viewer", db_dialect="mssql")
+    assert result["is_valid"]
+    assert result["sanitized_sql"] == sql
@@ -0,0 +1,94 @@
+"""Streamed LLM output — where _StreamAssembler ends the statement."""
+
+from __future__ import annotations
+
+import pytest
+
+from ai_agent.llm_provider import _StreamAssembler
+
+
+def _assemble(output: str, step: int = 3) -> _StreamAssembler:
+    """Feed output in small deltas, as a streaming provider would."""
+    assembler = _StreamAssembler()
+    for i in range(0, len(output), step):
+        if assembler.feed(output[i:i + step]):
+            break
+    return assembler
+
+
+@pytest.mark.parametrize("step", [1, 3, 64])
+def test_stops_at_the_statement_terminator(step):
+    assembler = _assemble("SELECT * FROM sensors;\nThis lists every sensor.", step)
+    assert assembler.complete
+    assert assembler.directive == "SQL"
+    assert assembler.text == "SELECT * FROM sensors;"
+
+
+def test_ignores_semicolons_in_literals_and_comments():
+    output = "SELECT * FROM sensors -- a; b\nWHERE zone = 'B;C' /* ; */;\nDone."
+    assembler = _assemble(output)
+    assert assembler.complete
+    assert assembler.text == output[:output.index("*/;") + 3]
+
+
+def test_clarify_runs_to_the_end_of_the_stream():
+    output = "CLARIFY: Which zone do you mean; A or B?"
+    assembler = _assemble(output)
+    assert not assembler.complete
+    assert assembler.directive == "CLARIFY"
+    assert assembler.text == output
+
+
+def test_without_a_terminator_the_whole_stream_is_kept():
+    assembler = _assemble("SELECT * FROM sensors")
+    assert not assembler.complete
+    assert assembler.text == "SELECT * FROM sensors"
+
+
+@pytest.mark.parametrize("step", [1, 3, 64])
+def test_prose_before_a_fence_keeps_the_fenced_statement(step):
+    output = "Here's the query you need:\n```sql\nSELECT zone FROM sensors\n```\nIt groups nothing."
+    assembler = _assemble(output, step)
+    assert assembler.complete
+    assert assembler.directive == "SQL"
+    assert assembler.text == "Here's the query you need:\n```sql\nSELECT zone FROM sensors\n"
+
+
+@pytest.mark.parametrize("step", [1, 3, 64])
+def test_plain_fence_ends_at_the_closing_fence(step):
+    output = "```\nSELECT zone FROM sensors\n```\nThis lists zones."
+    assembler = _assemble(output, step)
+    assert assembler.complete
+    assert assembler.text == "```\nSELECT zone FROM sensors\n"
+
+
+def test_semicolon_inside_a_string_literal_does_not_end_the_statement():
+    output = "```sql\nSELECT * FROM sensors WHERE sensor_name = 'A;B';\n```"
+    assembler = _assemble(output)
+    assert assembler.complete
+    assert assembler.text == "```sql\nSELECT * FROM sensors WHERE sensor_name = 'A;B';"
+
+
+def test_prose_without_a_fence_is_never_cut_short():
+    output = "Sure; the sensors table holds zone and status"
+    assembler = _assemble(output)
+    assert not assembler.complete
+    assert assembler.text == output
+
+
+def test_write_op_followed_by_prose_stops_at_the_terminator():
+    assembler = _assemble("WRITE_OP: DELETE FROM technicians WHERE technician_id = 2;\nThis removes Ravi.")
+    assert assembler.complete
+    assert assembler.directive == "WRITE_OP"
+    assert assembler.text == "WRITE_OP: DELETE FROM technicians WHERE technician_id = 2;"
+
+
+def test_write_op_with_prose_then_fence_keeps_the_statement():
+    output = (
+        "WRITE_OP: This deletes technician 2; confirm first.\n"
+        "```sql\nDELETE FROM technicians WHERE technician_id = 2;\n```"
+    )
+    assembler = _assemble(output)
+    assert assembler.complete
+    assert assembler.directive == "WRITE_OP"
+    assert assembler.text.endswith("```sql\nDELETE FROM technicians WHERE technician_id = 2;")
@@ -0,0 +1,64 @@
+"""Token-budgeted prompt assembly — what is trimmed first."""
+
+from __future__ import annotations
+
+from ai_agent.token_budget import COMPLETION_RESERVE, estimate_tokens, plan_prompt
+
+SCHEMA  = "\n\n".join(f"TABLE: table_{i}\n  - id INTEGER PK\n  - name TEXT" for i in range(40))
+DOCS    = "\n\n".join(f"Doc excerpt {i}: " + "calibration interval notes " * 20 for i in range(10))
+HISTORY = [
+    turn
+    for i in range(6)
+    for turn in (
+        {"role": "user",      "content": f"question {i} " + "about sensors " * 30},
+        {"role": "assistant", "content": f"[SQL] SELECT * FROM table_{i}"},
+    )
+]
+
+
+def _plan(context_tokens: int, **overrides):
+    args = dict(
+        db_dialect="sqlite", schema_context=SCHEMA, doc_context=DOCS, chat_history=HISTORY,
+        user_message="show all sensors", model="mock", context_tokens=context_tokens,
+    )
+    return plan_prompt(**{**args, **overrides})
+
+
+def _untrimmed_total() -> int:
+    return _plan(1_000_000)["tokens"]["total"]
+
+
+def test_everything_fits():
+    plan = _plan(1_000_000)
+    assert plan["trimmed"] == []
+    assert plan["chat_history"] == HISTORY
+    assert SCHEMA in plan["system_prompt"] and "Doc excerpt 9" in plan["system_prompt"]
+
+
+def test_older_history_goes_first():
+    full = _untrimmed_total()
+    plan = _plan(full + COMPLETION_RESERVE - 50)
+    assert plan["trimmed"] == ["history"]
+    assert plan["chat_history"][-2:] == HISTORY[-2:]
+    assert "Doc excerpt 9" in plan["system_prompt"]
+    assert plan["tokens"]["total"] <= plan["budget"]
+
+
+def test_docs_go_before_the_newest_exchange_and_schema():
+    full    = _untrimmed_total()
+    history = sum(estimate_tokens(t["content"], "mock") + 4 for t in HISTORY[:-2])
+    plan    = _plan(full - history + COMPLETION_RESERVE - 200)
+    assert plan["trimmed"] == ["history", "docs"]
+    assert plan["chat_history"] == HISTORY[-2:]
+    assert SCHEMA in plan["system_prompt"]
+    assert "Doc excerpt 0" in plan["system_prompt"] and "Doc excerpt 9" not in plan["system_prompt"]
+
+
+def test_schema_is_trimmed_last_and_from_its_end():
+    plan = _plan(COMPLETION_RESERVE + 1500)
+    assert plan["trimmed"] == ["history", "docs", "schema"]
+    assert plan["chat_history"] == []
+    assert "TABLE: table_0\n" in plan["system_prompt"]
+    assert "TABLE: table_39\n" not in plan["system_prompt"]
+    assert plan["tokens"]["total"] <= plan["budget"]
+    assert "show all sensors" not in plan["system_prompt"]  # The question is sent as the user message